@@ -1,99 +1,49 @@
-import pdfplumber
-import re
-import pandas as pd
+import argparse
 import os
+import sys
+
+# La extracción vive en "INTERFAZ_PLANILLA PAGOS/extraccion_pagos.py" (compartida con el
+# pipeline PDFs -> plantilla); este script solo genera el consolidado de una carpeta.
+PAGOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "INTERFAZ_PLANILLA PAGOS")
+if PAGOS_DIR not in sys.path:
+    sys.path.insert(0, PAGOS_DIR)
+# Módulos compartidos del proyecto (crp_usme/modules)
+CRP_USME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crp_usme")
+if CRP_USME_DIR not in sys.path:
+    sys.path.insert(0, CRP_USME_DIR)
+from manifiesto_pagos import actualizar_consolidado, registrar_tiempos, vigilar
+from registro_pagos import configurar_consola
+from modules.ocr import set_ocr_enabled
 
 # Carpeta con los PDFs
 folder = r"C:\RICHARD\FDL\Usme\2026\Pagos\Febrero\ENTREGA_3"
-rows = []
-
-def limpiar_numero(valor):
-    """Convierte texto con puntos/comas a entero"""
-    return int(valor.replace(".", "").replace(",", ""))
-
-for file in os.listdir(folder):
-    if file.endswith(".pdf"):
-        pdf_path = os.path.join(folder, file)
-        with pdfplumber.open(pdf_path) as pdf:
-            texto = "\n".join([page.extract_text() for page in pdf.pages])
-
-            datos = {
-                "Contrato No": None,
-                "Contratista": None,
-                "NIT o CC": None,
-                "Pago No": None,
-                "Valor Bruto": None,
-                "Base Reteica": None,
-                "Reteica %": None,
-                "Reteica Valor": None,
-                "Total Descuentos": 0,
-                "Neto a Pagar": None
-            }
-
-            # Contrato No
-            contrato = re.search(r"CONTRATO No\.?\s*(CPS\s*\d+-\d+)", texto)
-            if contrato:
-                datos["Contrato No"] = contrato.group(1)
-
-            # Contratista
-            contratista = re.search(r"CONTRATISTA:\s*(.+)", texto)
-            if contratista:
-                datos["Contratista"] = contratista.group(1).strip()
-
-            # NIT o CC
-            nit = re.search(r"NIT\. o C\.C\.\s*([\d\.\-]+)", texto)
-            if nit:
-                datos["NIT o CC"] = nit.group(1)
-
-            # Pago No
-            pago = re.search(r"PAGO No\.\s*(\d+)", texto)
-            if pago:
-                datos["Pago No"] = int(pago.group(1))
-
-            # Valor Bruto
-            valor_bruto = re.search(r"VALOR BRUTO.*?\$ ?([\d\.,]+)", texto)
-            if valor_bruto:
-                bruto_raw = limpiar_numero(valor_bruto.group(1))
-                datos["Valor Bruto"] = bruto_raw * 1_000_000 if bruto_raw < 1000 else bruto_raw
-
-            # Reteica
-            base_reteica = re.search(r"Reteica.*?\$ ?([\d\.,]+)", texto)
-            if base_reteica:
-                datos["Base Reteica"] = limpiar_numero(base_reteica.group(1))
-
-            porcentaje_reteica = re.search(r"Reteica.*?(\d+[\.,]?\d*%)", texto)
-            if porcentaje_reteica:
-                datos["Reteica %"] = porcentaje_reteica.group(1)
-
-            valor_reteica = re.search(r"Reteica.*?\$ ?([\d\.,]+)$", texto, re.MULTILINE)
-            if valor_reteica:
-                datos["Reteica Valor"] = limpiar_numero(valor_reteica.group(1))
-                datos["Total Descuentos"] += datos["Reteica Valor"]
-
-            # Otras retenciones (ejemplo: Retefuente, ReteIVA, etc.)
-            otras_retenciones = re.findall(r"(Retefuente.*?|ReteIva).*?\$ ?([\d\.,]+)", texto)
-            for _, valor in otras_retenciones:
-                if valor.strip() not in ["-", ""]:
-                    datos["Total Descuentos"] += limpiar_numero(valor)
-
-            # Total Descuentos
-            descuentos = re.search(r"TOTAL DESCUENTOS.*?\$ ?([\d\.,]+)", texto)
-            if descuentos:
-                datos["Total Descuentos"] = limpiar_numero(descuentos.group(1))
-
-            # Neto a Pagar
-            neto = re.search(r"NETO A PAGAR.*?\$ ?([\d\.,]+)", texto)
-            if neto:
-                datos["Neto a Pagar"] = limpiar_numero(neto.group(1))
-
-            rows.append(datos)
-            
-
-# Exportar a Excel
-df = pd.DataFrame(rows)
-output_path = os.path.join(folder, "consolidado_pagos_usme_FEB2026.xlsx")
-df.to_excel(output_path, index=False)
-
-print("✅ Consolidado exportado correctamente a Excel:", output_path)
-
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Consolidado de pagos de una carpeta de PDFs (solo extrae los nuevos).")
+    parser.add_argument("carpeta", nargs="?", default=folder, help="Carpeta con los PDFs")
+    parser.add_argument("--salida", default="consolidado_pagos_usme_FEB2026.xlsx",
+                        help="Consolidado de salida (ruta, o nombre dentro de la carpeta)")
+    parser.add_argument("--completo", action="store_true", help="Ignora el manifiesto y vuelve a extraer todos los PDFs")
+    parser.add_argument("--vigilar", action="store_true", help="Sigue revisando la carpeta y agrega los PDFs que lleguen")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto: núcleos; 1 = sin pool)")
+    parser.add_argument("--intervalo", type=float, default=5.0, help="Segundos entre revisiones (--vigilar)")
+    parser.add_argument("--ocr", action="store_true", help="Lee con OCR (Tesseract) las páginas escaneadas sin texto")
+    args = parser.parse_args()
+
+    configurar_consola()
+    if args.ocr:
+        set_ocr_enabled(True)
+    # Exportar a Excel
+    output_path = os.path.join(args.carpeta, args.salida)
+    if args.vigilar:
+        if args.completo:
+            actualizar_consolidado(args.carpeta, output_path, completo=True, workers=args.workers)
+        vigilar(args.carpeta, output_path, intervalo=args.intervalo, workers=args.workers)
+        sys.exit(0)
+
+    resultado = actualizar_consolidado(args.carpeta, output_path, completo=args.completo, workers=args.workers)
+    registrar_tiempos(resultado)
+    print("✅ Consolidado exportado correctamente a Excel:", output_path)
+    if resultado.errores:
+        print(f"⚠ {len(resultado.errores)} PDF(s) con error: ver la hoja 'Errores' del consolidado")
+    sys.exit(1 if resultado.errores else 0)
@@ -0,0 +1,100 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Optional
+
+import pandas as pd
+
+from columnas_pagos import PerfilConsolidado, ResolucionColumnas, resolver_columnas
+
+
+# ============================================================
+# Caché del consolidado leído (por sesión de Streamlit)
+# ------------------------------------------------------------
+# La clave es el SHA-256 de los bytes subidos: mismo archivo ->
+# mismo DataFrame, sin volver a pasar por pd.read_excel. Se expulsa
+# el consolidado usado hace más tiempo (LRU) al superar la cantidad
+# de entradas o la memoria máxima.
+# ============================================================
+
+
+def huella(contenido: bytes) -> str:
+    return hashlib.sha256(contenido).hexdigest()
+
+
+@dataclass
+class ConsolidadoLeido:
+    """Consolidado ya leído. `df` no se modifica: preparar_plantilla trabaja sobre una copia."""
+    huella: str
+    df: pd.DataFrame
+    bytes_memoria: int
+    # perfil -> columnas resueltas
+    _columnas: Dict[str, ResolucionColumnas] = field(default_factory=dict, repr=False)
+
+    def columnas(self, perfil: PerfilConsolidado) -> ResolucionColumnas:
+        if perfil.nombre not in self._columnas:
+            self._columnas[perfil.nombre] = resolver_columnas(self.df.columns, perfil)
+        return self._columnas[perfil.nombre]
+
+
+class CacheConsolidados:
+    """LRU de consolidados leídos, limitada por entradas y por memoria (MB)."""
+
+    def __init__(self, capacidad: int = 4, max_mb: float = 256):
+        self.capacidad = capacidad
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.aciertos = 0
+        self.fallos = 0
+        self._entradas: "OrderedDict[str, ConsolidadoLeido]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entradas)
+
+    def __contains__(self, contenido: bytes) -> bool:
+        return huella(contenido) in self._entradas
+
+    @property
+    def bytes_memoria(self) -> int:
+        return sum(e.bytes_memoria for e in self._entradas.values())
+
+    def obtener(
+        self,
+        contenido: bytes,
+        leer: Callable[[bytes], Optional[pd.DataFrame]],
+    ) -> Optional[ConsolidadoLeido]:
+        """
+        Consolidado de `contenido`; solo llama a `leer` si no está en caché.
+        Un consolidado que no se pudo leer (None) no se guarda.
+        """
+        clave = huella(contenido)
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is not None:
+                self._entradas.move_to_end(clave)
+                self.aciertos += 1
+                return entrada
+
+        df = leer(contenido)
+        if df is None:
+            return None
+        entrada = ConsolidadoLeido(clave, df, int(df.memory_usage(deep=True).sum()))
+
+        with self._lock:
+            self.fallos += 1
+            self._entradas[clave] = entrada
+            self._entradas.move_to_end(clave)
+            self._expulsar()
+        return entrada
+
+    def _expulsar(self) -> None:
+        # Siempre se conserva la entrada más reciente, aunque sola supere la memoria
+        while len(self._entradas) > 1 and (
+            len(self._entradas) > self.capacidad or self.bytes_memoria > self.max_bytes
+        ):
+            self._entradas.popitem(last=False)
+
+    def limpiar(self) -> None:
+        with self._lock:
+            self._entradas.clear()
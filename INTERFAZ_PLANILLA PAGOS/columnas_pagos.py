@@ -0,0 +1,259 @@
+import re
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+
+# ============================================================
+# Resolución de columnas del consolidado de pagos
+# ------------------------------------------------------------
+# Cada campo lógico (identificación, valor bruto, RP Doc, ...) se
+# resuelve UNA vez por firma de encabezados a las columnas concretas
+# del consolidado. El recorrido por filas usa acceso directo.
+# ============================================================
+
+Regla = Callable[[str], bool]
+
+
+def _contiene(*palabras: str) -> Regla:
+    """Todas las palabras aparecen en el nombre (minúsculas)."""
+    return lambda col: all(p in col.lower() for p in palabras)
+
+
+def _alguna(*palabras: str) -> Regla:
+    """Alguna de las palabras aparece en el nombre (minúsculas)."""
+    return lambda col: any(p in col.lower() for p in palabras)
+
+
+def _exacto(*nombres: str) -> Regla:
+    """Nombre exacto (sin espacios extremos, mayúsculas)."""
+    nombres = {n.upper() for n in nombres}
+    return lambda col: col.strip().upper() in nombres
+
+
+def _o(*reglas: Regla) -> Regla:
+    return lambda col: any(r(col) for r in reglas)
+
+
+@dataclass(frozen=True)
+class Campo:
+    nombre: str
+    # Reglas en orden de prioridad: primero todas las columnas que cumplen
+    # la regla 1 (en orden del archivo), luego las de la regla 2, etc.
+    reglas: Tuple[Regla, ...]
+    # True: por fila se toma la primera candidata con dato (comportamiento original
+    # de identificación, RP Doc, banco, cuenta y tipo cta).
+    # False: se usa solo la primera columna que coincide, tenga o no dato.
+    primero_no_nulo: bool = False
+    # Limpieza opcional aplicada al valor no nulo
+    limpiar: Optional[Callable] = None
+
+
+@dataclass(frozen=True)
+class PerfilConsolidado:
+    nombre: str
+    campos: Tuple[Campo, ...]
+    # Texto columna Z: "Pago No. N del X al Y" (consolidado de extracción) en lugar de "10 PAGO <asignación>"
+    texto_periodo: bool = False
+    # "importe_retencion" es el total de descuentos (Reteica + retefuente, estampillas, ...):
+    # la validación de retención usa el campo "reteica_valor" y el débito se cuadra con
+    # "neto_pagar" + total de descuentos
+    importe_total_descuentos: bool = False
+
+
+def _limpiar_base(val) -> float:
+    # Quitar $, espacios, puntos de miles → float
+    limpio = re.sub(r'[^\d,]', '', str(val)).replace(',', '.')
+    try:
+        return float(limpio)
+    except ValueError:
+        return 0
+
+
+def _a_float(val) -> float:
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return 0
+
+
+def _normalizar_pct(val) -> str:
+    # Formato "0,966%" para que haga match en la tabla de equivalencias
+    s = str(val).strip().replace('.', ',')
+    if not s.endswith('%'):
+        s = s + '%'
+    return s
+
+
+_CAMPOS_COMUNES = (
+    Campo("valor_bruto", (_contiene('valor', 'bruto'),)),
+    Campo("contrato", (_contiene('contrato'),)),
+    Campo("codigo_bco", (lambda c: _alguna('código', 'codigo')(c) and 'bco' in c.lower(),), primero_no_nulo=True),
+    Campo("no_cuenta", (_contiene('no', 'cuenta'),), primero_no_nulo=True),
+    Campo("tipo_cta", (_contiene('tipo', 'cta'),), primero_no_nulo=True),
+    Campo("contratista", (_contiene('contratista'),)),
+)
+
+# Consolidado "ajustado a plantilla" (generador_plantilla / app_pagos_usme)
+PERFIL_GENERADOR = PerfilConsolidado(
+    nombre="generador",
+    campos=(
+        Campo("identificacion", (_alguna('identific', 'nit', 'c.c', 'documento', 'cedula', 'id'),), primero_no_nulo=True),
+        Campo("base_retencion", (lambda c: 'base' in c.lower() and _alguna('retencion', 'reteica')(c),)),
+        Campo("importe_retencion", (_o(
+            lambda c: 'importe' in c.lower() and _alguna('retencion', 'reteica')(c),
+            _contiene('reteica', 'valor'),
+        ),)),
+        Campo("rp_doc", (_alguna('rp', 'doc', 'presupuestal'),), primero_no_nulo=True),
+        Campo("reteica_pct", (lambda c: c == "Reteica %", _contiene('reteica')), limpiar=str),
+        Campo("pago_no", (_exacto('PAGO NO', 'PAGO NO.'),), primero_no_nulo=True),
+    ) + _CAMPOS_COMUNES,
+)
+
+# Consolidado de la extracción de PDFs (plantilla_pagos_deepseek)
+PERFIL_EXTRACCION = PerfilConsolidado(
+    nombre="extraccion",
+    campos=(
+        # NO incluir 'documento' ni 'id' suelto para evitar match con "Documento No."
+        Campo("identificacion", (_o(
+            _exacto('NIT_CC', 'NIT/CC', 'NIT', 'CC'),
+            _alguna('nit_cc', 'cedula', 'identificacion'),
+        ),), primero_no_nulo=True),
+        Campo("base_retencion", (_exacto('BASE RETEICA'),), limpiar=_limpiar_base),
+        # Monto retenido real en pesos (todos los descuentos)
+        Campo("importe_retencion", (_exacto('TOTAL DESCUENTOS'),), limpiar=_a_float),
+        # Solo la ReteICA (validación base x tarifa)
+        Campo("reteica_valor", (_exacto('RETEICA VALOR', 'RETEICA_VALOR', 'VALOR_RETEICA'),), limpiar=_a_float),
+        # Neto a pagar del certificado (cuadre: valor bruto = neto + descuentos)
+        Campo("neto_pagar", (_exacto('NETO A PAGAR', 'NETO_A_PAGAR', 'NETO'),), limpiar=_a_float),
+        # NO usar 'doc' suelto — evita match con "Documento No."
+        Campo("rp_doc", (_o(
+            _exacto('RP DOC', 'RP DOC PRESUPUESTAL', 'RP_DOC', 'PRESUPUESTAL'),
+            lambda c: 'presupuestal' in c.lower() or ('rp' in c.lower() and 'doc' in c.lower()),
+        ),), primero_no_nulo=True),
+        Campo("reteica_pct", (
+            lambda c: c == 'Pct_Reteica', lambda c: c == 'Valor Reteica', _contiene('reteica'),
+        ), limpiar=_normalizar_pct),
+        Campo("del", (_exacto('DEL'),), primero_no_nulo=True),
+        Campo("al", (_exacto('AL'),), primero_no_nulo=True),
+        Campo("pago_no", (_exacto('PAGO NO.'),), primero_no_nulo=True),
+    ) + _CAMPOS_COMUNES,
+    texto_periodo=True,
+    importe_total_descuentos=True,
+)
+
+PERFILES = {p.nombre: p for p in (PERFIL_GENERADOR, PERFIL_EXTRACCION)}
+
+
+@lru_cache(maxsize=256)
+def _resolver_posiciones(nombre_perfil: str, encabezados: Tuple[str, ...]):
+    """
+    Campo -> (posiciones candidatas, coincidencias de la regla ganadora),
+    cacheado por firma de encabezados.
+    """
+    perfil = PERFILES[nombre_perfil]
+    resultado = []
+    for campo in perfil.campos:
+        posiciones = []
+        ganadora = 0
+        for regla in campo.reglas:
+            nuevas = [i for i, col in enumerate(encabezados) if i not in posiciones and regla(col)]
+            if nuevas and not ganadora:
+                ganadora = len(nuevas)
+            posiciones.extend(nuevas)
+        resultado.append((campo.nombre, tuple(posiciones), ganadora))
+    return tuple(resultado)
+
+
+@dataclass
+class ResolucionColumnas:
+    perfil: PerfilConsolidado
+    columnas: Dict[str, Tuple] = field(default_factory=dict)
+    # Columnas que cumplen la regla de mayor prioridad (más de una = ambigüedad)
+    empates: Dict[str, int] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self._campos = {c.nombre: c for c in self.perfil.campos}
+
+    def tiene(self, campo: str) -> bool:
+        return bool(self.columnas.get(campo))
+
+    def columna(self, campo: str):
+        cols = self.columnas.get(campo) or ()
+        return cols[0] if cols else None
+
+    def faltantes(self) -> List[str]:
+        return [c.nombre for c in self.perfil.campos if not self.columnas.get(c.nombre)]
+
+    def ambiguos(self) -> Dict[str, Tuple]:
+        # Solo es ambiguo un campo de columna única con varias coincidencias en su
+        # regla de mayor prioridad; en los de "primero no nulo" las demás son respaldo por fila.
+        return {
+            c.nombre: self.columnas[c.nombre][:self.empates[c.nombre]]
+            for c in self.perfil.campos
+            if not c.primero_no_nulo and self.empates.get(c.nombre, 0) > 1
+        }
+
+    def avisos(self) -> List[str]:
+        lineas = []
+        for c in self.perfil.campos:
+            cols = self.columnas.get(c.nombre) or ()
+            if cols and c.primero_no_nulo and len(cols) > 1:
+                lineas.append(f"✓ {c.nombre}: {list(cols)} (en orden, primera con dato)")
+            elif cols:
+                lineas.append(f"✓ {c.nombre}: '{cols[0]}'")
+        for nombre, cols in self.ambiguos().items():
+            lineas.append(f"⚠ {nombre}: ambiguo, se usa '{cols[0]}' (también coinciden {list(cols[1:])})")
+        for nombre in self.faltantes():
+            lineas.append(f"⚠ {nombre}: sin columna en el consolidado, se usará el valor por defecto")
+        return lineas
+
+    def serie(self, df: pd.DataFrame, campo: str):
+        """Columna completa del campo (con limpieza), o None si no hay columna."""
+        col = self.columna(campo)
+        if col is None:
+            return None
+        spec = self._campos[campo]
+        return df[col].apply(spec.limpiar) if spec.limpiar else df[col]
+
+    def serie_valor(self, df: pd.DataFrame, campo: str, defecto=None) -> pd.Series:
+        """
+        Equivalente vectorizado de `valor` para todas las filas: primera candidata
+        con dato (o solo la primera columna), limpieza sobre los no nulos y
+        `defecto` donde no hay dato.
+        """
+        cols = list(self.columnas.get(campo) or ())
+        spec = self._campos[campo]
+        if not cols:
+            return pd.Series([defecto] * len(df), index=df.index, dtype=object)
+        if spec.primero_no_nulo and len(cols) > 1:
+            serie = df[cols].astype(object).bfill(axis=1).iloc[:, 0]
+        else:
+            serie = df[cols[0]].astype(object)
+        con_dato = serie.notna()
+        if spec.limpiar:
+            serie = serie.copy()
+            serie[con_dato] = serie[con_dato].map(spec.limpiar)
+        return serie.where(con_dato, defecto)
+
+    def valor(self, row, campo: str, defecto=None):
+        """Valor del campo en la fila, con acceso directo a las columnas resueltas."""
+        cols = self.columnas.get(campo) or ()
+        spec = self._campos[campo]
+        for col in (cols if spec.primero_no_nulo else cols[:1]):
+            v = row[col]
+            if pd.notna(v):
+                return spec.limpiar(v) if spec.limpiar else v
+        return defecto
+
+
+def resolver_columnas(columnas, perfil: PerfilConsolidado = PERFIL_GENERADOR) -> ResolucionColumnas:
+    columnas = list(columnas)
+    posiciones = _resolver_posiciones(perfil.nombre, tuple(str(c) for c in columnas))
+    return ResolucionColumnas(
+        perfil=perfil,
+        columnas={nombre: tuple(columnas[i] for i in pos) for nombre, pos, _ in posiciones},
+        empates={nombre: n for nombre, _, n in posiciones},
+    )
@@ -1,525 +1,774 @@
-import pandas as pd
+import logging
+import io
+import os
 import re
+import sys
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment
 from datetime import datetime
 
-def procesar_pagos_consolidado():
-    # Ruta de entrada y salida
-    ruta_entrada = r"C:\RICHARD\FDL\Usme\2026\Pruebas_pagos\consolidado_pagos_usme_2026AJUSTADOAPLANTILLA.xlsx"
-    ruta_destino = r"C:\RICHARD\FDL\Usme\2026\Pruebas_pagos\V1_PLANTILLA_PAGOS_DEEPSEEK.xlsx"
-    
-    # Obtener fecha actual en formato YYYYMMDD
-    fecha_actual = datetime.now().strftime("%Y%m%d")
-    print(f"📅 Fecha actual para columnas C y F: {fecha_actual}")
-    
-    # Leer el archivo consolidado
-    print(f"Leyendo archivo: {ruta_entrada}")
+from cache_consolidado import CacheConsolidados
+from historial_pagos import claves_pago, componentes_clave, marcar_duplicados, registrar_pagos
+from columnas_pagos import PERFIL_GENERADOR, PerfilConsolidado, ResolucionColumnas, resolver_columnas
+from tarifas_reteica import TablaReteica, cargar_tabla_reteica
+from validacion_pagos import COLUMNAS_INCONSISTENCIAS, ERRORES_CUADRE, contar_inconsistencias, validar_bloques
+from registro_pagos import LOGGER_PAGOS, EventoLog, configurar_consola, corrida_aislada
+
+# Módulos compartidos del proyecto (crp_usme/modules)
+CRP_USME_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crp_usme")
+if CRP_USME_DIR not in sys.path:
+    sys.path.insert(0, CRP_USME_DIR)
+from modules.archive import archive_run
+from modules.output_index import index_entries
+
+logger = logging.getLogger(LOGGER_PAGOS)
+logger.setLevel(logging.DEBUG)
+
+# Ruta de entrada y salida por defecto (ejecución directa del script)
+RUTA_ENTRADA = r"C:\RICHARD\FDL\Usme\2026\Pruebas_pagos\consolidado_pagos_usme_2026AJUSTADOAPLANTILLA.xlsx"
+RUTA_DESTINO = r"C:\RICHARD\FDL\Usme\2026\Pruebas_pagos\V1_PLANTILLA_PAGOS_DEEPSEEK.xlsx"
+
+# Encabezados exactos de la plantilla
+HEADERS = [
+    'Tipo Registro P', 'Clave Contab.', 'Codigo de la cuenta', 'Tipo Ident',
+    'No Identificación', 'Indicador CME', 'Cuenta contable', 'importe',
+    'Indicador de IVA', 'RP Doc Presupuestal', 'Posc Doc Pres', 'Pros Pre',
+    'Programa de financiación', 'Fondo', 'Centro Gestor', 'Centro de costo',
+    'Centro Beneficio', 'Orden CO', 'Elemento PEP', 'Grafo', 'Area funcional',
+    'Segmento', 'Fecha Base', 'Condicion de Pago', 'Asignación', 'Texto',
+    'Bloqueo Pago', 'Receptor Alternativo', 'Tipo Ident', 'No Identificación',
+    'Via de Pago', 'Banco Propio', 'Id Cta', 'Ref 1', 'Ref 2', 'Referencia Pago',
+    'Código Bco', 'No Cuenta', 'Tipo Cta', 'Tipo de retenciones',
+    'Indicador de retención', 'Base imponible de retención', 'Importe de retención'
+]
+
+# Anchos de columnas
+ANCHOS = {
+    'A': 3, 'B': 3, 'C': 12, 'D': 3, 'E': 15, 'F': 12, 'G': 12, 'H': 10,
+    'I': 3, 'J': 20, 'K': 25, 'L': 8, 'M': 25, 'N': 8, 'O': 12, 'P': 12,
+    'Q': 15, 'R': 8, 'S': 12, 'T': 8, 'U': 15, 'V': 10, 'W': 10, 'X': 15,
+    'Y': 12, 'Z': 30, 'AA': 12, 'AB': 20, 'AC': 3, 'AD': 15, 'AE': 10, 'AF': 12,
+    'AG': 8, 'AH': 8, 'AI': 8, 'AJ': 15, 'AK': 10, 'AL': 20, 'AM': 8, 'AN': 20,
+    'AO': 20, 'AP': 25, 'AQ': 20
+}
+
+
+# Contrato "CPS-054-2025" -> primer y segundo grupo de dígitos
+_CONTRATO_RE = r'^\D*(\d+)(?:\D+(\d+))?'
+# Sufijo " NIT. 123.456" / " C.C. 1.234" al final del nombre del contratista
+_SUFIJO_ID_RE = r'\s*(?:NIT\.|C\.C\.)\s*[\d\.,\s]+$'
+
+
+def _texto_o_defecto(serie: pd.Series, defecto: pd.Series):
+    """str(valor).strip(); vacío -> valor por defecto. Devuelve (serie, máscara de defecto)."""
+    texto = serie.astype(str).str.strip()
+    vacio = serie.isna() | (texto == "")
+    return texto.where(~vacio, defecto), vacio
+
+
+def _entero_o_texto(v) -> str:
+    try:
+        return str(int(v))
+    except (TypeError, ValueError):
+        return str(v).strip()
+
+
+def construir_bloques(
+    df: pd.DataFrame,
+    columnas: ResolucionColumnas,
+    perfil: PerfilConsolidado,
+    fecha_actual: str,
+    indicador_defecto: str = "39",
+):
+    """
+    Calcula con operaciones de Series todos los campos derivados de cada pago y
+    arma el arreglo (3N x 43) con los bloques C / P40 / P31 intercalados.
+    Requiere df["Indicador_Calculado"] (tarifa Reteica % -> indicador) y, si existe,
+    usa df["Indicador_Ambiguo"] (tarifa con varios indicadores posibles).
+
+    Devuelve (datos, filas): un DataFrame con un registro por pago y sus
+    códigos de problema, y el arreglo de filas listo para escribir.
+    """
+    n = len(df)
+    pago = pd.Series(np.arange(1, n + 1), index=df.index)
+    numero = pago.astype(str)
+
+    datos = pd.DataFrame({"Pago": pago})
+    problemas = {}
+
+    # 1. No Identificación (para P31)
+    datos["No Identificación"], problemas["NO_IDENTIFICACION_POR_DEFECTO"] = _texto_o_defecto(
+        columnas.serie_valor(df, "identificacion"), "ID" + numero.str.zfill(4)
+    )
+
+    # 2-4. Valor Bruto, Base e Importe de retención
+    valor_bruto = columnas.serie_valor(df, "valor_bruto", 0)
+    base_retencion = columnas.serie_valor(df, "base_retencion", 0)
+    importe_retencion = columnas.serie_valor(df, "importe_retencion", 0)
+
+    # 5. RP Doc Presupuestal
+    datos["RP Doc Presupuestal"], problemas["RP_DOC_POR_DEFECTO"] = _texto_o_defecto(
+        columnas.serie_valor(df, "rp_doc"), "50009973" + numero.str.zfill(2)
+    )
+
+    # 6. Asignación (número contrato): "054-2025" con los dos primeros grupos de dígitos
+    if columnas.tiene("contrato"):
+        contrato = columnas.serie_valor(df, "contrato", "").astype(str).str.strip()
+        grupos = contrato.str.extract(_CONTRATO_RE)
+        asignacion = grupos[0].fillna("") + ("-" + grupos[1]).fillna("")
+    else:
+        asignacion = pd.Series("", index=df.index)
+    datos["Asignación"], problemas["ASIGNACION_POR_DEFECTO"] = _texto_o_defecto(
+        asignacion, numero.str.zfill(3) + "-2025"
+    )
+
+    # 7-9. Código Banco, No Cuenta y Tipo Cta
+    codigo_bco, _ = _texto_o_defecto(columnas.serie_valor(df, "codigo_bco", ""), "051")
+    datos["Código Bco"] = codigo_bco.str.zfill(3)
+    datos["No Cuenta"], _ = _texto_o_defecto(columnas.serie_valor(df, "no_cuenta", ""), "0550488435468647")
+    datos["Tipo Cta"], _ = _texto_o_defecto(columnas.serie_valor(df, "tipo_cta", ""), "02")
+
+    # Pago No del contratista (clave del historial de pagos)
+    pago_no = columnas.serie_valor(df, "pago_no", "").map(_entero_o_texto)
+    datos["Pago No"] = pago_no
+
+    # 10. Texto columna Z
+    if perfil.texto_periodo:
+        # "Pago No. 7 del 01/12/2025 al 31/12/2025"
+        del_val = columnas.serie_valor(df, "del", "").astype(str).str.strip()
+        al_val = columnas.serie_valor(df, "al", "").astype(str).str.strip()
+        texto_z = ("Pago No. " + pago_no + " del " + del_val + " al " + al_val).str.strip()
+    else:
+        texto_z = "10 PAGO " + datos["Asignación"]
+
+    # Nombre del contratista (columna K de la fila C)
+    if columnas.tiene("contratista"):
+        nombre = columnas.serie_valor(df, "contratista", "").astype(str).str.strip()
+        nombre_limpio = nombre.str.replace(_SUFIJO_ID_RE, "", regex=True).str.strip()
+        datos["Contratista"] = nombre_limpio.where(nombre_limpio != "", "CONTRATISTA " + numero)
+    else:
+        datos["Contratista"] = ""
+
+    # Indicador según Reteica %
+    indicador = df["Indicador_Calculado"]
+    sin_indicador = indicador.isna() | (indicador.astype(str) == "")
+    problemas["INDICADOR_RETEICA_POR_DEFECTO"] = sin_indicador
+    if "Indicador_Ambiguo" in df:
+        problemas["INDICADOR_RETEICA_AMBIGUO"] = df["Indicador_Ambiguo"].astype(bool)
+    datos["Indicador de retención"] = indicador.astype(object).where(~sin_indicador, indicador_defecto)
+
+    datos["Valor Bruto"] = valor_bruto
+    datos["Reteica %"] = df["Reteica %"]
+    datos["Base imponible de retención"] = base_retencion
+    datos["Importe de retención"] = importe_retencion
+    # Monto ReteICA que valida base x tarifa: el importe, salvo que el importe sea el
+    # total de descuentos (entonces la columna ReteICA propia; NaN sin ella)
+    if perfil.importe_total_descuentos:
+        datos["Reteica Valor"] = pd.to_numeric(columnas.serie_valor(df, "reteica_valor"), errors="coerce")
+        # Crédito independiente del débito para el cuadre: neto + descuentos del certificado (NaN sin neto)
+        datos["Neto + descuentos"] = (
+            pd.to_numeric(columnas.serie_valor(df, "neto_pagar"), errors="coerce")
+            + pd.to_numeric(importe_retencion, errors="coerce")
+        )
+    else:
+        datos["Reteica Valor"] = pd.to_numeric(importe_retencion, errors="coerce").fillna(0)
+
+    # Códigos de problema por pago ("A;B"), vacío si no hubo valores por defecto
+    codigos = pd.Series("", index=df.index)
+    for codigo, mascara in problemas.items():
+        codigos = codigos.where(~mascara, codigos + ";" + codigo)
+    datos["Problemas"] = codigos.str.lstrip(";")
+
+    # ===== Bloques C / P40 / P31 intercalados =====
+    def col(serie):
+        return np.asarray(serie, dtype=object)
+
+    filas = np.full((3 * n, len(HEADERS)), None, dtype=object)
+    fila_c, fila_p40, fila_p31 = filas[0::3], filas[1::3], filas[2::3]
+
+    # FILA C
+    fila_c[:, 0:8] = ['C', None, fecha_actual, 'KR', '1001', fecha_actual, '', 'COP']
+    fila_c[:, 1] = col(pago)
+    fila_c[:, 9] = col(datos["Asignación"])
+    fila_c[:, 10] = col(datos["Contratista"])
+
+    # FILA P40
+    fila_p40[:, 0:5] = ['P', 40, '5111809000', '', '']
+    fila_p40[:, 7] = col(valor_bruto)
+    fila_p40[:, 8] = 'WB'
+    fila_p40[:, 9] = col(datos["RP Doc Presupuestal"])
+    fila_p40[:, 10] = 1
+    fila_p40[:, 25] = col(texto_z)
+
+    # FILA P31
+    fila_p31[:, 0:2] = ['P', 31]
+    fila_p31[:, 3] = 'CC'
+    fila_p31[:, 4] = col(datos["No Identificación"])
+    fila_p31[:, 6] = '2401010100'
+    fila_p31[:, 7] = col(valor_bruto)
+    fila_p31[:, 23] = '0051'
+    fila_p31[:, 24] = col(datos["Asignación"])
+    fila_p31[:, 25] = col(texto_z)
+    fila_p31[:, 36] = col(datos["Código Bco"])
+    fila_p31[:, 37] = col(datos["No Cuenta"])
+    fila_p31[:, 38] = col(datos["Tipo Cta"])
+    # Tipo de retenciones / Indicador de retención
+    fila_p31[:, 39] = col(datos["Indicador de retención"])
+    fila_p31[:, 40] = col(datos["Indicador de retención"])
+    # Base imponible e Importe de retención
+    fila_p31[:, 41] = col(base_retencion)
+    fila_p31[:, 42] = col(importe_retencion)
+
+    return datos.reset_index(drop=True), filas
+
+
+@dataclass
+class ResumenPlantilla:
+    """Estadísticas de la plantilla generada, calculadas en memoria al generarla."""
+    ruta_destino: str
+    fecha_actual: str
+    # Versión de la tabla de tarifas Reteica usada
+    version_tarifas: str = ""
+    total_pagos: int = 0
+    total_filas: int = 0
+    total_c: int = 0
+    c_con_fecha: int = 0
+    total_p40: int = 0
+    p40_con_rp_doc: int = 0
+    total_p31: int = 0
+    p31_con_tipo_ret: int = 0
+    p31_con_ind_ret: int = 0
+    p31_con_base: int = 0
+    p31_con_importe: int = 0
+    # Indicador de retención -> número de filas P31 que lo usan
+    indicadores: Dict[str, int] = field(default_factory=dict)
+    # Código de problema -> número de pagos con valor por defecto
+    defectos: Dict[str, int] = field(default_factory=dict)
+    # Primeras filas (hasta 3 bloques) para la verificación de columnas críticas
+    muestra: List[dict] = field(default_factory=list)
+    # Hoja "Inconsistencias": una fila por pago con errores (cuadre, duplicado) o valores por defecto
+    inconsistencias: Optional[pd.DataFrame] = None
+
+    @property
+    def errores_validacion(self) -> int:
+        return contar_inconsistencias(self.inconsistencias)[0]
+
+    @staticmethod
+    def porcentaje(parte: int, total: int) -> float:
+        return parte / total * 100 if total else 0.0
+
+
+def _con_dato(valores: np.ndarray, vacios) -> np.ndarray:
+    """Máscara de celdas con dato: ni None ni alguno de los valores `vacios`."""
+    serie = pd.Series(valores, dtype=object)
+    return (serie.notna() & ~serie.isin(vacios)).to_numpy()
+
+
+def resumir_plantilla(
+    filas: np.ndarray,
+    datos: pd.DataFrame,
+    fecha_actual: str,
+    ruta_destino: str,
+    version_tarifas: str = "",
+    inconsistencias: Optional[pd.DataFrame] = None,
+) -> ResumenPlantilla:
+    """Calcula la verificación y las estadísticas a partir del arreglo de filas (sin releer la hoja)."""
+    tipo = filas[:, 0] if len(filas) else np.array([], dtype=object)
+    clave = filas[:, 1] if len(filas) else np.array([], dtype=object)
+    es_c = tipo == 'C'
+    es_p40 = (tipo == 'P') & (clave == 40)
+    es_p31 = (tipo == 'P') & (clave == 31)
+    c, p40, p31 = filas[es_c], filas[es_p40], filas[es_p31]
+
+    indicadores = pd.Series(p31[:, 39], dtype=object)
+    indicadores = indicadores[indicadores.notna() & (indicadores != "")].astype(str).value_counts()
+
+    defectos = {}
+    if len(datos):
+        codigos = datos["Problemas"].str.split(";").explode()
+        defectos = codigos[codigos != ""].value_counts().to_dict()
+
+    muestra = []
+    for i, fila in enumerate(filas[:9]):
+        muestra.append({
+            "fila": i + 2,
+            "tipo_fila": ("C", "P40", "P31")[i % 3],
+            "A": fila[0], "B": fila[1], "C": fila[2], "E": fila[4], "F": fila[5], "J": fila[9],
+            "AN": fila[39], "AO": fila[40], "AP": fila[41], "AQ": fila[42],
+        })
+
+    return ResumenPlantilla(
+        ruta_destino=ruta_destino,
+        fecha_actual=fecha_actual,
+        version_tarifas=version_tarifas,
+        total_pagos=len(datos),
+        total_filas=len(filas) + 1,
+        total_c=int(es_c.sum()),
+        c_con_fecha=int((c[:, 2] == fecha_actual).sum()),
+        total_p40=int(es_p40.sum()),
+        p40_con_rp_doc=int(_con_dato(p40[:, 9], ['', ' ']).sum()),
+        total_p31=int(es_p31.sum()),
+        p31_con_tipo_ret=int(_con_dato(p31[:, 39], ['', ' ']).sum()),
+        p31_con_ind_ret=int(_con_dato(p31[:, 40], ['', ' ']).sum()),
+        p31_con_base=int(_con_dato(p31[:, 41], [0, '']).sum()),
+        p31_con_importe=int(_con_dato(p31[:, 42], [0, '']).sum()),
+        indicadores=dict(sorted(indicadores.items())),
+        defectos=defectos,
+        muestra=muestra,
+        inconsistencias=inconsistencias,
+    )
+
+
+def registrar_resumen(resumen: ResumenPlantilla, log: logging.Logger = logger) -> None:
+    """Registra la verificación de columnas críticas (DEBUG) y las estadísticas (INFO)."""
+    pct = ResumenPlantilla.porcentaje
+
+    log.debug(f"VERIFICACIÓN DE COLUMNAS CRÍTICAS - fecha usada en columnas C y F: {resumen.fecha_actual}")
+    esperados = {
+        "C": (resumen.fecha_actual, resumen.fecha_actual, "1001", "Asignación"),
+        "P40": ("5111809000", "VACÍO", "VACÍO", "RP Doc"),
+        "P31": ("VACÍO", "VACÍO", "DATOS", "VACÍO"),
+    }
+    for m in resumen.muestra:
+        c_esperado, f_esperado, e_esperado, j_esperado = esperados[m["tipo_fila"]]
+        detalle = (
+            f"Fila {m['fila']:2d} ({m['tipo_fila']}): A='{m['A']}', B={m['B']} | "
+            f"C='{m['C']}' (esperado {c_esperado}) | F='{m['F']}' (esperado {f_esperado}) | "
+            f"E='{m['E']}' (esperado {e_esperado}) | J='{m['J']}' (esperado {j_esperado})"
+        )
+        if m["tipo_fila"] == "P31":
+            detalle += f" | AN='{m['AN']}' AO='{m['AO']}' AP={m['AP']} AQ={m['AQ']}"
+        log.debug(detalle)
+
+    r = resumen
+    log.info(f"Filas C: {r.total_c}, con fecha actual en C: {r.c_con_fecha} ({pct(r.c_con_fecha, r.total_c):.1f}%)")
+    log.info(f"Filas P40: {r.total_p40}, con RP Doc en J: {r.p40_con_rp_doc} ({pct(r.p40_con_rp_doc, r.total_p40):.1f}%)")
+    log.info(
+        f"Filas P31: {r.total_p31}, con datos en "
+        f"AN: {r.p31_con_tipo_ret} ({pct(r.p31_con_tipo_ret, r.total_p31):.1f}%), "
+        f"AO: {r.p31_con_ind_ret} ({pct(r.p31_con_ind_ret, r.total_p31):.1f}%), "
+        f"AP: {r.p31_con_base} ({pct(r.p31_con_base, r.total_p31):.1f}%), "
+        f"AQ: {r.p31_con_importe} ({pct(r.p31_con_importe, r.total_p31):.1f}%)"
+    )
+    if r.indicadores:
+        log.info("📊 Indicadores de retención usados: " + ", ".join(
+            f"{indicador}: {count}" for indicador, count in r.indicadores.items()
+        ))
+    errores, advertencias = contar_inconsistencias(r.inconsistencias)
+    if errores:
+        log.error(f"✗ {errores} pago(s) con errores de cuadre o duplicados (ver hoja Inconsistencias)")
+    if advertencias:
+        log.info(f"ℹ {advertencias} pago(s) solo con valores por defecto (hoja Inconsistencias)")
+    log.info(f"✓ Archivo generado: {r.ruta_destino} ({r.total_pagos} pagos, {r.total_filas} filas)")
+
+
+def escribir_hoja1(destino, filas, inconsistencias: Optional[pd.DataFrame] = None) -> None:
+    """
+    Escribe la plantilla (Hoja1, 43 columnas) en modo write-only: cada fila se
+    agrega completa con ws.append y los estilos se fijan por columna, sin
+    mantener en memoria el árbol de celdas de openpyxl.
+    Con `inconsistencias` agrega la hoja "Inconsistencias" (como en la plantilla CRP).
+    `destino` puede ser una ruta o un objeto tipo archivo (BytesIO).
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Hoja1")
+
+    # Anchos y alineación izquierda a nivel de columna (celdas vacías)
+    izquierda = Alignment(horizontal='left')
+    for col, ancho in ANCHOS.items():
+        ws.column_dimensions[col].width = ancho
+        ws.column_dimensions[col].alignment = izquierda
+
+    negrita = Font(bold=True)
+    encabezado = []
+    for header in HEADERS:
+        celda = WriteOnlyCell(ws, value=header)
+        celda.font = negrita
+        encabezado.append(celda)
+    ws.append(encabezado)
+
+    # Celdas con valor: el estilo de celda prevalece sobre el de columna en Excel,
+    # por eso llevan su propia alineación (openpyxl la registra una sola vez).
+    for fila in filas:
+        valores = []
+        for valor in fila:
+            if valor is None:
+                valores.append(None)
+                continue
+            celda = WriteOnlyCell(ws, value=valor)
+            celda.alignment = izquierda
+            valores.append(celda)
+        ws.append(valores)
+
+    if inconsistencias is not None:
+        ws_inc = wb.create_sheet("Inconsistencias")
+        encabezado = []
+        for header in inconsistencias.columns:
+            celda = WriteOnlyCell(ws_inc, value=header)
+            celda.font = negrita
+            encabezado.append(celda)
+        ws_inc.append(encabezado)
+        for fila in inconsistencias.itertuples(index=False):
+            ws_inc.append([None if pd.isna(v) or v == "" else v for v in fila])
+
+    wb.save(destino)
+
+@dataclass
+class PlantillaPreparada:
+    """Bloques de la plantilla ya calculados, antes de escribir el Excel."""
+    datos: pd.DataFrame
+    filas: np.ndarray
+    fecha_actual: str
+    version_tarifas: str = ""
+    # Resultado de validar_bloques (hoja "Inconsistencias")
+    inconsistencias: Optional[pd.DataFrame] = None
+
+
+def leer_consolidado(ruta_entrada, log: Optional[logging.Logger] = None) -> Optional[pd.DataFrame]:
+    """Lee el consolidado (ruta u objeto tipo archivo). None si no se pudo leer."""
+    log = log or logger
+    nombre_entrada = ruta_entrada if isinstance(ruta_entrada, str) else getattr(ruta_entrada, "name", "(en memoria)")
+
+    log.info(f"Leyendo archivo: {nombre_entrada}")
     try:
         df = pd.read_excel(ruta_entrada)
-        print(f"✓ Archivo leído: {len(df)} filas")
-        
-        # Mostrar las columnas que realmente tiene el archivo
-        print(f"\nColumnas en el archivo:")
-        for i, col in enumerate(df.columns, 1):
-            print(f"  {i:2d}. {col}")
-        
+        log.info(f"✓ Archivo leído: {len(df)} filas")
+
+        # Columnas que realmente tiene el archivo
+        log.debug("Columnas en el archivo: " + ", ".join(f"{i}. {col}" for i, col in enumerate(df.columns, 1)))
+
     except Exception as e:
-        print(f"✗ Error al leer: {e}")
-        return
-    
-    # ===== TABLA DE EQUIVALENCIAS RETECA % -> INDICADOR =====
-    # Esto es exactamente lo que me diste, sin cambios
-    equivalencias = {
-        "0,100%": "01",
-        "0,050%": "02",
-        "0,200%": "03",
-        "0,100%": "05",
-        "0,110%": "06",
-        "0,050%": "07",
-        "2,000%": "08",
-        "2,000%": "09",
-        "0,350%": "10",
-        "0,400%": "11",
-        "1,000%": "12",
-        "0,010%": "13",
-        "0,100%": "14",
-        "0,150%": "15",
-        "0,250%": "16",
-        "0,350%": "17",
-        "0,600%": "18",
-        "0,200%": "19",
-        "0,250%": "20",
-        "1,000%": "21",
-        "1,100%": "22",
-        "0,350%": "23",
-        "0,600%": "24",
-        "0,700%": "26",
-        "0,400%": "27",
-        "0,100%": "28",
-        "0,200%": "29",
-        "0,350%": "30",
-        "0,400%": "31",
-        "0,600%": "32",
-        "1,104%": "33",
-        "1,380%": "34",
-        "0,414%": "35",
-        "0,690%": "36",
-        "0,700%": "37",
-        "0,800%": "38",
-        "0,966%": "39",
-        "1,500%": "40",
-        "0,250%": "41",
-        "0,500%": "42",
-        "0,712%": "86",
-        "0,766%": "87",
-        "0,866%": "88",
-        "0,998%": "89",
-        "1,014%": "91",
-        "1,200%": "92",
-        "1,214%": "R5",
-        "1,400%": "94",
-        "0,760%": "R3",
-        "0,736%": "96",
-        "1,030%": "97",
-        "1,062%": "R4",
-        "1,176%": "98",
-        "1,254%": "99"
-    }
-    
+        log.error(f"✗ Error al leer: {e}")
+        return None
+    return df
+
+
+def preparar_plantilla(
+    df: pd.DataFrame,
+    perfil: PerfilConsolidado = PERFIL_GENERADOR,
+    log: Optional[logging.Logger] = None,
+    tabla_reteica: Optional[TablaReteica] = None,
+    columnas: Optional[ResolucionColumnas] = None,
+    nombre_salida: Optional[str] = None,
+) -> Optional[PlantillaPreparada]:
+    """
+    Consolidado (DataFrame) -> bloques C / P40 / P31, sin escribir nada.
+    `columnas` permite reutilizar una resolución ya hecha (consolidado en caché).
+    `nombre_salida`: al regenerar una plantilla con el mismo nombre, sus propios
+    pagos del historial no cuentan como duplicados.
+    None si no se pudo cargar la tabla de tarifas Reteica.
+    """
+    log = log or logger
+    df = df.copy()
+
+    # Obtener fecha actual en formato YYYYMMDD
+    fecha_actual = datetime.now().strftime("%Y%m%d")
+    log.info(f"📅 Fecha actual para columnas C y F: {fecha_actual}")
+
+    # ===== TABLA DE TARIFAS RETEICA % -> INDICADOR (tarifas_reteica.json) =====
+    try:
+        tabla_reteica = tabla_reteica or cargar_tabla_reteica()
+    except (OSError, ValueError, KeyError) as e:
+        log.error(f"✗ No se pudo cargar la tabla de tarifas Reteica: {e}")
+        return None
+    log.info(f"📋 Tabla de tarifas Reteica versión {tabla_reteica.version} ({len(tabla_reteica.aplicado)} tarifas)")
+
+    # Resolver UNA vez las columnas de cada campo lógico (cacheado por firma de encabezados)
+    columnas = columnas or resolver_columnas(df.columns, perfil)
+    log.debug(f"🔎 Columnas resueltas (perfil '{perfil.nombre}')")
+    for aviso in columnas.avisos():
+        # "✓ campo: columna" es detalle; "⚠ ..." (ambiguo / sin columna) es advertencia
+        log.log(logging.WARNING if aviso.startswith("⚠") else logging.DEBUG, aviso)
+
     # Preparar la columna "Reteica %" para mapeo
-    # Asegurar que esté en string y con formato correcto
-    if "Reteica %" in df.columns:
-        df["Reteica %"] = df["Reteica %"].astype(str)
+    pct = columnas.serie(df, "reteica_pct")
+    if pct is not None:
+        df["Reteica %"] = pct
     else:
-        print("⚠ ADVERTENCIA: No se encontró la columna 'Reteica %' en el archivo consolidado")
-        print("   Se buscarán columnas similares...")
-        # Buscar columnas similares
-        col_reteica = None
-        for col in df.columns:
-            if 'reteica' in str(col).lower():
-                col_reteica = col
-                break
-        
-        if col_reteica:
-            print(f"✓ Usando columna '{col_reteica}' como fuente de porcentajes")
-            df["Reteica %"] = df[col_reteica].astype(str)
-        else:
-            print("✗ No se encontró columna de reteica")
-            df["Reteica %"] = ""
-    
-    # Mapear cada valor de "Reteica %" al indicador correspondiente
-    df["Indicador_Calculado"] = df["Reteica %"].map(equivalencias)
-    
-    # Mostrar algunos ejemplos del mapeo
-    print(f"\n📊 Ejemplos de mapeo Reteica % -> Indicador:")
+        log.warning("✗ No se encontró columna de reteica")
+        df["Reteica %"] = ""
+
+    # Mapear a indicador: un join sobre la tarifa normalizada (valor decimal, no texto)
+    asignacion = tabla_reteica.asignar(df["Reteica %"])
+    df["Indicador_Calculado"] = asignacion["indicador"]
+    df["Indicador_Ambiguo"] = asignacion["ambiguo"]
+    for tarifa, grupo in asignacion[asignacion["ambiguo"]].groupby("clave_tarifa"):
+        log.warning(
+            f"⚠ Tarifa {tarifa / 10000:.3f}% admite los indicadores {grupo['candidatos'].iloc[0]}: "
+            f"se aplica '{grupo['indicador'].iloc[0]}' en {len(grupo)} pago(s)"
+        )
+
+    # Algunos ejemplos del mapeo
     for i in range(min(5, len(df))):
         reteica_val = df.iloc[i]["Reteica %"]
         indicador_val = df.iloc[i]["Indicador_Calculado"]
-        print(f"  Pago {i+1}: '{reteica_val}' -> '{indicador_val}'")
-    
+        log.debug(f"📊 Mapeo Reteica % -> Indicador, pago {i+1}: '{reteica_val}' -> '{indicador_val}'")
+
     # Contar cuántos valores se mapearon correctamente
     mapeados = df["Indicador_Calculado"].notna().sum()
-    print(f"✓ {mapeados}/{len(df)} valores mapeados a indicadores")
-    
-    # Crear archivo Excel de salida
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Hoja1"
-    
-    # Encabezados exactos de la plantilla
-    headers = [
-        'Tipo Registro P', 'Clave Contab.', 'Codigo de la cuenta', 'Tipo Ident',
-        'No Identificación', 'Indicador CME', 'Cuenta contable', 'importe',
-        'Indicador de IVA', 'RP Doc Presupuestal', 'Posc Doc Pres', 'Pros Pre',
-        'Programa de financiación', 'Fondo', 'Centro Gestor', 'Centro de costo',
-        'Centro Beneficio', 'Orden CO', 'Elemento PEP', 'Grafo', 'Area funcional',
-        'Segmento', 'Fecha Base', 'Condicion de Pago', 'Asignación', 'Texto',
-        'Bloqueo Pago', 'Receptor Alternativo', 'Tipo Ident', 'No Identificación',
-        'Via de Pago', 'Banco Propio', 'Id Cta', 'Ref 1', 'Ref 2', 'Referencia Pago',
-        'Código Bco', 'No Cuenta', 'Tipo Cta', 'Tipo de retenciones',
-        'Indicador de retención', 'Base imponible de retención', 'Importe de retención'
-    ]
-    
-    # Escribir encabezados
-    for col_num, header in enumerate(headers, 1):
-        ws.cell(row=1, column=col_num, value=header)
-        ws.cell(row=1, column=col_num).font = Font(bold=True)
-    
-    # Iniciar en fila 2
-    fila_actual = 2
-    
-    # Procesar cada pago del consolidado
-    for idx, row in df.iterrows():
-        pago_num = idx + 1
-        print(f"\n--- Procesando Pago {pago_num} ---")
-        
-        # ===== BUSCAR TODOS LOS DATOS EN EL CONSOLIDADO =====
-        # 1. Buscar No Identificación (columna E en filas P31)
-        no_identificacion = ""
-        
-        # Buscar en diferentes nombres de columnas
-        for col in df.columns:
-            col_lower = str(col).lower()
-            # Buscar cualquier columna que pueda contener identificación
-            if any(word in col_lower for word in ['identific', 'nit', 'c.c', 'documento', 'cedula', 'id']):
-                valor = row[col]
-                if pd.notna(valor):
-                    no_identificacion = str(valor).strip()
-                    print(f"✓ No Identificación encontrado en '{col}': {no_identificacion}")
-                    break
-        
-        # Si no se encontró, usar valor por defecto
-        if not no_identificacion:
-            no_identificacion = f"ID{pago_num:04d}"
-            print(f"⚠ No se encontró No Identificación, usando: {no_identificacion}")
-        
-        # 2. Buscar Valor Bruto
-        valor_bruto = 0
-        for col in df.columns:
-            if 'valor' in str(col).lower() and 'bruto' in str(col).lower():
-                valor_bruto = row[col] if pd.notna(row[col]) else 0
-                print(f"✓ Valor Bruto encontrado en '{col}': {valor_bruto}")
-                break
-        
-        # 3. Buscar Base imponible de retención (columna AP)
-        base_retencion = 0
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if 'base' in col_lower and ('retencion' in col_lower or 'reteica' in col_lower):
-                base_retencion = row[col] if pd.notna(row[col]) else 0
-                print(f"✓ Base imponible de retención encontrada en '{col}': {base_retencion}")
-                break
-        
-        # 4. Buscar Importe de retención (columna AQ)
-        importe_retencion = 0
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if 'importe' in col_lower and ('retencion' in col_lower or 'reteica' in col_lower):
-                importe_retencion = row[col] if pd.notna(row[col]) else 0
-                print(f"✓ Importe de retención encontrado en '{col}': {importe_retencion}")
-                break
-            elif 'reteica' in col_lower and 'valor' in col_lower:
-                importe_retencion = row[col] if pd.notna(row[col]) else 0
-                print(f"✓ Importe de retención (Reteica) encontrado en '{col}': {importe_retencion}")
-                break
-        
-        # 5. Buscar RP Doc Presupuestal (para columna J en filas P40)
-        rp_doc = ""
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if any(word in col_lower for word in ['rp', 'doc', 'presupuestal']):
-                valor = row[col]
-                if pd.notna(valor):
-                    rp_doc = str(valor).strip()
-                    print(f"✓ RP Doc Presupuestal encontrado en '{col}': {rp_doc}")
-                    break
-        
-        # Si no se encontró RP Doc, usar valor por defecto
-        if not rp_doc:
-            rp_doc = f"50009973{pago_num:02d}"
-            print(f"⚠ No se encontró RP Doc Presupuestal, usando: {rp_doc}")
-        
-        # 6. Extraer asignación (número de contrato)
-        asignacion = ""
-        for col in df.columns:
-            if 'contrato' in str(col).lower():
-                contrato = str(row[col]).strip() if pd.notna(row[col]) else ""
-                # Extraer números del contrato
-                numeros = re.findall(r'\d+', contrato)
-                if numeros:
-                    if len(numeros) >= 2:
-                        asignacion = f"{numeros[0]}-{numeros[1]}"
-                    else:
-                        asignacion = numeros[0]
-                print(f"✓ Contrato encontrado en '{col}': {contrato}")
-                print(f"✓ Asignación generada: {asignacion}")
-                break
-        
-        if not asignacion:
-            asignacion = f"{pago_num:03d}-2025"
-            print(f"⚠ Sin contrato, usando asignación por defecto: {asignacion}")
-        
-        # 7. Buscar Código Banco
-        codigo_bco = ""
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if any(word in col_lower for word in ['código', 'codigo']) and 'bco' in col_lower:
-                valor = row[col]
-                if pd.notna(valor):
-                    codigo_bco = str(valor).strip()
-                    print(f"✓ Código Banco encontrado en '{col}': {codigo_bco}")
-                    break
-        
-        if not codigo_bco:
-            codigo_bco = "051"
-            print(f"⚠ No se encontró Código Banco, usando: {codigo_bco}")
-        
-        # 8. Buscar No Cuenta
-        no_cuenta = ""
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if 'no' in col_lower and 'cuenta' in col_lower:
-                valor = row[col]
-                if pd.notna(valor):
-                    no_cuenta = str(valor).strip()
-                    print(f"✓ No Cuenta encontrado en '{col}': {no_cuenta}")
-                    break
-        
-        if not no_cuenta:
-            no_cuenta = "0550488435468647"
-            print(f"⚠ No se encontró No Cuenta, usando: {no_cuenta}")
-        
-        # 9. Buscar Tipo Cta
-        tipo_cta = ""
-        for col in df.columns:
-            col_lower = str(col).lower()
-            if 'tipo' in col_lower and 'cta' in col_lower:
-                valor = row[col]
-                if pd.notna(valor):
-                    tipo_cta = str(valor).strip()
-                    print(f"✓ Tipo Cta encontrado en '{col}': {tipo_cta}")
-                    break
-        
-        if not tipo_cta:
-            tipo_cta = "02"
-            print(f"⚠ No se encontró Tipo Cta, usando: {tipo_cta}")
-        
-        print(f"✓ Valor Bruto: {valor_bruto}")
-        print(f"✓ RP Doc Presupuestal: {rp_doc}")
-        print(f"✓ Base Retención (AP): {base_retencion}")
-        print(f"✓ Importe Retención (AQ): {importe_retencion}")
-        
-        # ===== OBTENER INDICADOR DE RETECA % =====
-        # Esta es la parte NUEVA que agregamos según tu requerimiento
-        indicador_retencion = df.iloc[idx]["Indicador_Calculado"]
-        
-        # Si no se encontró indicador, usar el valor por defecto "39" como estaba antes
-        if pd.isna(indicador_retencion) or not indicador_retencion:
-            indicador_retencion = "39"
-            print(f"⚠ No se encontró indicador para Reteica %, usando por defecto: {indicador_retencion}")
-        else:
-            print(f"✓ Indicador obtenido de Reteica %: {indicador_retencion}")
-        
-        # ===== FILA C (PRIMERA FILA DEL BLOQUE) =====
-        # Fila 2, 5, 8, 11... - COLUMNA E = "1001", COLUMNA C y F = fecha actual
-        ws.cell(row=fila_actual, column=1, value='C')  # A: Tipo Registro P
-        ws.cell(row=fila_actual, column=2, value=pago_num)  # B: Clave Contab.
-        ws.cell(row=fila_actual, column=3, value=fecha_actual)  # C: Codigo de la cuenta = FECHA ACTUAL
-        ws.cell(row=fila_actual, column=4, value='KR')  # D: Tipo Ident = "KR"
-        ws.cell(row=fila_actual, column=5, value='1001')  # E: No Identificación = "1001"
-        ws.cell(row=fila_actual, column=6, value=fecha_actual)  # F: Indicador CME = FECHA ACTUAL
-        ws.cell(row=fila_actual, column=7, value='')  # G: Cuenta contable
-        ws.cell(row=fila_actual, column=8, value='COP')  # H: importe (texto)
-        ws.cell(row=fila_actual, column=10, value=asignacion)  # J: RP Doc Presupuestal
-        
-        # Nombre del contratista (columna K)
-        nombre_contratista = ""
-        for col in df.columns:
-            if 'contratista' in str(col).lower():
-                nombre = str(row[col]).strip() if pd.notna(row[col]) else ""
-                # Limpiar NIT/C.C. del nombre
-                nombre_limpio = re.sub(r'\s*(?:NIT\.|C\.C\.)\s*[\d\.,\s]+$', '', nombre).strip()
-                nombre_contratista = nombre_limpio or f"CONTRATISTA {pago_num}"
-                print(f"✓ Contratista encontrado: {nombre_contratista[:50]}...")
-                break
-        
-        ws.cell(row=fila_actual, column=11, value=nombre_contratista)  # K: Posc Doc Pres
-        
-        # ===== FILA P40 (SEGUNDA FILA DEL BLOQUE) =====
-        # Fila 3, 6, 9, 12... - COLUMNA E = VACÍO, COLUMNA J = RP Doc Presupuestal
-        ws.cell(row=fila_actual+1, column=1, value='P')  # A: Tipo Registro P
-        ws.cell(row=fila_actual+1, column=2, value=40)  # B: Clave Contab.
-        ws.cell(row=fila_actual+1, column=3, value='5111809000')  # C: Codigo de la cuenta
-        ws.cell(row=fila_actual+1, column=4, value='')  # D: Tipo Ident = VACÍO
-        ws.cell(row=fila_actual+1, column=5, value='')  # E: No Identificación = VACÍO
-        ws.cell(row=fila_actual+1, column=8, value=valor_bruto)  # H: importe (número)
-        ws.cell(row=fila_actual+1, column=9, value='WB')  # I: Indicador de IVA
-        ws.cell(row=fila_actual+1, column=10, value=rp_doc)  # J: RP Doc Presupuestal ← IMPORTANTE
-        ws.cell(row=fila_actual+1, column=11, value=1)  # K: Posc Doc Pres
-        ws.cell(row=fila_actual+1, column=26, value=f'10 PAGO {asignacion}')  # Z: Texto
-        
-        # ===== FILA P31 (TERCERA FILA DEL BLOQUE) =====
-        # Fila 4, 7, 10, 13... - COLUMNA E = no_identificacion
-        ws.cell(row=fila_actual+2, column=1, value='P')  # A: Tipo Registro P
-        ws.cell(row=fila_actual+2, column=2, value=31)  # B: Clave Contab.
-        ws.cell(row=fila_actual+2, column=4, value='CC')  # D: Tipo Ident = "CC"
-        ws.cell(row=fila_actual+2, column=5, value=no_identificacion)  # E: No Identificación = DATOS
-        ws.cell(row=fila_actual+2, column=7, value='2401010100')  # G: Cuenta contable
-        ws.cell(row=fila_actual+2, column=8, value=valor_bruto)  # H: importe (número)
-        ws.cell(row=fila_actual+2, column=24, value='0051')  # X: Condicion de Pago
-        ws.cell(row=fila_actual+2, column=25, value=asignacion)  # Y: Asignación
-        ws.cell(row=fila_actual+2, column=26, value=f'10 PAGO {asignacion}')  # Z: Texto
-        ws.cell(row=fila_actual+2, column=37, value=codigo_bco.zfill(3))  # AM: Código Bco
-        ws.cell(row=fila_actual+2, column=38, value=no_cuenta)  # AN: No Cuenta
-        ws.cell(row=fila_actual+2, column=39, value=tipo_cta)  # AO: Tipo Cta
-        
-        # ===== COLUMNAS AN (40) Y AO (41) CON INDICADOR SEGÚN RETECA % =====
-        # ESTO ES LO QUE AGREGAMOS SEGÚN TU REQUERIMIENTO
-        ws.cell(row=fila_actual+2, column=40, value=indicador_retencion)  # AP: Tipo de retenciones
-        ws.cell(row=fila_actual+2, column=41, value=indicador_retencion)  # AQ: Indicador de retención
-        
-        # COLUMNAS IMPORTANTES CON DATOS REALES:
-        ws.cell(row=fila_actual+2, column=42, value=base_retencion)  # AR: Base imponible de retención
-        ws.cell(row=fila_actual+2, column=43, value=importe_retencion)  # AS: Importe de retención
-        
-        print(f"✓ Fila {fila_actual} (C): C='{fecha_actual}', E='1001', F='{fecha_actual}', J='{asignacion}'")
-        print(f"✓ Fila {fila_actual+1} (P40): E='', J='{rp_doc}'")
-        print(f"✓ Fila {fila_actual+2} (P31): E='{no_identificacion}'")
-        print(f"✓ Fila {fila_actual+2} (P31): AN/AO='{indicador_retencion}', AP={base_retencion}, AQ={importe_retencion}")
-        
-        # Avanzar 3 filas para el siguiente pago
-        fila_actual += 3
-    
-    # Ajustar anchos de columnas
-    anchos = {
-        'A': 3, 'B': 3, 'C': 12, 'D': 3, 'E': 15, 'F': 12, 'G': 12, 'H': 10,
-        'I': 3, 'J': 20, 'K': 25, 'L': 8, 'M': 25, 'N': 8, 'O': 12, 'P': 12,
-        'Q': 15, 'R': 8, 'S': 12, 'T': 8, 'U': 15, 'V': 10, 'W': 10, 'X': 15,
-        'Y': 12, 'Z': 30, 'AA': 12, 'AB': 20, 'AC': 3, 'AD': 15, 'AE': 10, 'AF': 12,
-        'AG': 8, 'AH': 8, 'AI': 8, 'AJ': 15, 'AK': 10, 'AL': 20, 'AM': 8, 'AN': 20,
-        'AO': 20, 'AP': 25, 'AQ': 20
-    }
-    
-    for col, ancho in anchos.items():
-        ws.column_dimensions[col].width = ancho
-    
-    # Alinear texto a la izquierda
-    for row in ws.iter_rows(min_row=2):
-        for cell in row:
-            cell.alignment = Alignment(horizontal='left')
-    
-    # Guardar archivo
-    wb.save(ruta_destino)
-    
-    # ===== VERIFICAR COLUMNAS IMPORTANTES =====
-    print(f"\n{'='*60}")
-    print("VERIFICACIÓN DE COLUMNAS CRÍTICAS")
-    print('='*60)
-    
-    print(f"\n📅 Fecha usada en columnas C y F: {fecha_actual}")
-    
-    print("\nPrimeros 3 bloques (9 filas):")
-    print("-" * 80)
-    
-    for fila in range(2, 11):  # Filas 2 a 10
-        valor_c = ws.cell(row=fila, column=3).value  # Columna C (Codigo de la cuenta)
-        valor_f = ws.cell(row=fila, column=6).value  # Columna F (Indicador CME)
-        valor_e = ws.cell(row=fila, column=5).value  # Columna E
-        valor_j = ws.cell(row=fila, column=10).value  # Columna J (RP Doc Presupuestal)
-        valor_an = ws.cell(row=fila, column=40).value  # Columna AN (Tipo de retenciones)
-        valor_ao = ws.cell(row=fila, column=41).value  # Columna AO (Indicador de retención)
-        valor_ap = ws.cell(row=fila, column=42).value  # Columna AP (Base retención)
-        valor_aq = ws.cell(row=fila, column=43).value  # Columna AQ (Importe retención)
-        tipo = ws.cell(row=fila, column=1).value  # Columna A
-        clave = ws.cell(row=fila, column=2).value  # Columna B
-        
-        if (fila - 2) % 3 == 0:  # Fila C (2, 5, 8)
-            tipo_fila = "C"
-            c_esperado = fecha_actual
-            f_esperado = fecha_actual
-            e_esperado = "1001"
-            j_esperado = "Asignación"
-        elif (fila - 2) % 3 == 1:  # Fila P40 (3, 6, 9)
-            tipo_fila = "P40"
-            c_esperado = "5111809000"
-            f_esperado = "VACÍO"
-            e_esperado = "VACÍO"
-            j_esperado = "RP Doc"
-        else:  # Fila P31 (4, 7, 10)
-            tipo_fila = "P31"
-            c_esperado = "VACÍO"
-            f_esperado = "VACÍO"
-            e_esperado = "DATOS"
-            j_esperado = "VACÍO"
-        
-        print(f"Fila {fila:2d} ({tipo_fila}): A='{tipo}', B={clave}")
-        print(f"  Col C: '{valor_c}' (Esperado: {c_esperado})")
-        print(f"  Col F: '{valor_f}' (Esperado: {f_esperado})")
-        print(f"  Col E: '{valor_e}' (Esperado: {e_esperado})")
-        print(f"  Col J (RP Doc): '{valor_j}' (Esperado: {j_esperado})")
-        
-        if tipo_fila == "P31":
-            print(f"  Col AN (Tipo ret): '{valor_an}'")
-            print(f"  Col AO (Ind ret): '{valor_ao}'")
-            print(f"  Col AP (Base): {valor_ap}")
-            print(f"  Col AQ (Importe): {valor_aq}")
-        print()
-    
-    # Estadísticas
-    print(f"\n{'='*60}")
-    print("ESTADÍSTICAS DE DATOS")
-    print('='*60)
-    
-    total_c = 0
-    c_correctas = 0
-    total_p40 = 0
-    j_con_datos = 0
-    total_p31 = 0
-    an_con_datos = 0
-    ao_con_datos = 0
-    ap_con_datos = 0
-    aq_con_datos = 0
-    
-    for fila in range(2, fila_actual):
-        tipo = ws.cell(row=fila, column=1).value
-        clave = ws.cell(row=fila, column=2).value
-        
-        if tipo == 'C':
-            total_c += 1
-            if ws.cell(row=fila, column=3).value == fecha_actual:  # Columna C
-                c_correctas += 1
-        
-        if tipo == 'P' and clave == 40:
-            total_p40 += 1
-            if ws.cell(row=fila, column=10).value not in [None, '', ' ']:  # Columna J
-                j_con_datos += 1
-        
-        if tipo == 'P' and clave == 31:
-            total_p31 += 1
-            if ws.cell(row=fila, column=40).value not in [None, '', ' ']:  # Columna AN
-                an_con_datos += 1
-            if ws.cell(row=fila, column=41).value not in [None, '', ' ']:  # Columna AO
-                ao_con_datos += 1
-            if ws.cell(row=fila, column=42).value not in [None, 0, '']:  # Columna AP
-                ap_con_datos += 1
-            if ws.cell(row=fila, column=43).value not in [None, 0, '']:  # Columna AQ
-                aq_con_datos += 1
-    
-    print(f"Total filas C: {total_c}")
-    print(f"Filas C con fecha actual en columna C: {c_correctas} ({c_correctas/total_c*100:.1f}%)")
-    print(f"\nTotal filas P40: {total_p40}")
-    print(f"Filas P40 con datos en J (RP Doc): {j_con_datos} ({j_con_datos/total_p40*100:.1f}%)")
-    print(f"\nTotal filas P31: {total_p31}")
-    print(f"Filas P31 con datos en AN (Tipo ret): {an_con_datos} ({an_con_datos/total_p31*100:.1f}%)")
-    print(f"Filas P31 con datos en AO (Ind ret): {ao_con_datos} ({ao_con_datos/total_p31*100:.1f}%)")
-    print(f"Filas P31 con datos en AP (Base): {ap_con_datos} ({ap_con_datos/total_p31*100:.1f}%)")
-    print(f"Filas P31 con datos en AQ (Importe): {aq_con_datos} ({aq_con_datos/total_p31*100:.1f}%)")
-    
-    # Estadísticas de indicadores usados
-    indicadores_usados = {}
-    for fila in range(2, fila_actual):
-        if ws.cell(row=fila, column=1).value == 'P' and ws.cell(row=fila, column=2).value == 31:
-            indicador = ws.cell(row=fila, column=40).value
-            if indicador:
-                indicadores_usados[indicador] = indicadores_usados.get(indicador, 0) + 1
-    
-    if indicadores_usados:
-        print(f"\n📊 Indicadores de retención usados:")
-        for indicador, count in sorted(indicadores_usados.items()):
-            print(f"  {indicador}: {count} veces")
-    
-    print(f"\n{'='*60}")
-    print(f"¡ARCHIVO GENERADO EXITOSAMENTE!")
-    print(f"Ubicación: {ruta_destino}")
-    print(f"Total de pagos procesados: {len(df)}")
-    print(f"Total de filas generadas: {fila_actual - 1}")
-    print('='*60)
-    
+    log.info(f"✓ {mapeados}/{len(df)} valores mapeados a indicadores")
+
+    # Bloques C / P40 / P31 de todos los pagos (vectorizado)
+    datos, filas = construir_bloques(df, columnas, perfil, fecha_actual, tabla_reteica.por_defecto)
+
+    # Avisos de valores por defecto (un resumen por tipo en lugar de una línea por pago)
+    for codigo in ("NO_IDENTIFICACION_POR_DEFECTO", "RP_DOC_POR_DEFECTO",
+                   "ASIGNACION_POR_DEFECTO", "INDICADOR_RETEICA_POR_DEFECTO",
+                   "INDICADOR_RETEICA_AMBIGUO"):
+        pagos = datos.loc[datos["Problemas"].str.contains(codigo, regex=False), "Pago"].tolist()
+        if pagos:
+            log.warning(f"⚠ {codigo}: {len(pagos)} pago(s) {pagos[:20]}{' ...' if len(pagos) > 20 else ''}")
+    log.info(f"✓ {len(datos)} pagos → {len(filas)} filas (C/P40/P31)")
+
+    # Pagos ya incluidos en otra plantilla (historial) o repetidos en esta
+    try:
+        datos["Duplicado de"] = marcar_duplicados(datos, os.path.basename(nombre_salida) if nombre_salida else None)
+    except Exception as e:
+        log.warning(f"⚠ No se pudo consultar el historial de pagos: {e}")
+        datos["Duplicado de"] = ""
+    duplicados = datos.loc[datos["Duplicado de"] != "", "Pago"].tolist()
+    if duplicados:
+        log.warning(f"⚠ PAGO_DUPLICADO: {len(duplicados)} pago(s) {duplicados[:20]}{' ...' if len(duplicados) > 20 else ''}")
+    # Sin clave completa (contrato, Pago No, NIT/CC, valor bruto) el pago no se compara
+    # con el historial ni se registra en él
+    componentes = componentes_clave(datos)
+    incompletos = datos.loc[(claves_pago(componentes) == "").to_numpy(), "Pago"].tolist()
+    if incompletos:
+        faltan = {
+            "contrato": (componentes["contrato"] == "").sum(),
+            "Pago No": (componentes["pago_no"] == "").sum(),
+            "NIT/CC": (componentes["identificacion"] == "").sum(),
+            "valor bruto": (~(componentes["valor_bruto"] > 0).fillna(False)).sum(),
+        }
+        faltan = ", ".join(f"{campo} en {int(n)}" for campo, n in faltan.items() if n)
+        log.warning(
+            f"⚠ CLAVE_PAGO_INCOMPLETA: {len(incompletos)} pago(s) sin verificar duplicados (falta {faltan}) "
+            f"{incompletos[:20]}{' ...' if len(incompletos) > 20 else ''}"
+        )
+
+    # Cuadre de cada bloque (débito = crédito, base y retención) antes de escribir
+    inconsistencias = validar_bloques(filas, datos, tabla_reteica)
+    errores, _ = contar_inconsistencias(inconsistencias)
+    for codigo in ERRORES_CUADRE:
+        pagos = inconsistencias.loc[inconsistencias["Problemas"].str.contains(codigo, regex=False), "Pago"].tolist()
+        if pagos:
+            log.warning(f"⚠ {codigo}: {len(pagos)} pago(s) {pagos[:20]}{' ...' if len(pagos) > 20 else ''}")
+    log.info(f"🧮 Validación: {errores} pago(s) con error de {len(datos)}")
+
+    return PlantillaPreparada(datos, filas, fecha_actual, tabla_reteica.version, inconsistencias)
+
+
+def guardar_plantilla(
+    preparada: PlantillaPreparada,
+    ruta_destino,
+    nombre_salida: Optional[str] = None,
+    log: Optional[logging.Logger] = None,
+) -> ResumenPlantilla:
+    """
+    Escribe la plantilla (ruta u objeto tipo archivo) y devuelve su resumen.
+    El historial, el índice y el archivo Parquet se registran aparte, con
+    confirmar_entrega, solo si la plantilla se entrega (descarga no bloqueada).
+    """
+    log = log or logger
+    if nombre_salida is None:
+        nombre_salida = ruta_destino if isinstance(ruta_destino, str) else "plantilla_pagos.xlsx"
+
+    # Guardar archivo (write-only: filas completas, estilos por columna)
+    inconsistencias = preparada.inconsistencias
+    if inconsistencias is None:
+        inconsistencias = pd.DataFrame(columns=COLUMNAS_INCONSISTENCIAS)
+    escribir_hoja1(ruta_destino, preparada.filas, inconsistencias)
+
+    # ===== VERIFICACIÓN Y ESTADÍSTICAS (desde memoria, sin releer la hoja) =====
+    resumen = resumir_plantilla(
+        preparada.filas, preparada.datos, preparada.fecha_actual, nombre_salida,
+        preparada.version_tarifas, inconsistencias,
+    )
+    registrar_resumen(resumen, log)
+
+    return resumen
+
+
+def confirmar_entrega(
+    preparada: PlantillaPreparada,
+    nombre_salida: str,
+    log: Optional[logging.Logger] = None,
+) -> None:
+    """
+    Registra una plantilla entregada en el historial de pagos (duplicados de las
+    entregas siguientes), el índice de búsqueda y el archivo Parquet. Cada registro
+    que falla se avisa en el log sin interrumpir la entrega.
+    """
+    log = log or logger
+    datos = preparada.datos
+
+    # Registros por pago (para el archivo histórico Parquet)
+    registros_pagos = datos[[
+        "Pago", "Contratista", "No Identificación", "Asignación", "RP Doc Presupuestal",
+        "Valor Bruto", "Reteica %", "Indicador de retención", "Base imponible de retención",
+        "Importe de retención", "Código Bco", "No Cuenta", "Tipo Cta",
+    ]]
+    issues_pagos = datos.loc[datos["Problemas"] != "",
+                             ["Pago", "Asignación", "No Identificación", "Problemas"]]
+
+    # Índice de búsqueda: fila C (Asignación), P40 (RP Doc), P31 (No Identificación);
+    # los valores por defecto ("001-2025", "50009973NN", "ID0001") no se indexan
+    entradas_indice = []
+    for campo, columna, defecto, desplazamiento in (
+        ("Contrato", "Asignación", "ASIGNACION_POR_DEFECTO", 0),
+        ("RP Doc", "RP Doc Presupuestal", "RP_DOC_POR_DEFECTO", 1),
+        ("Identificación Beneficiario", "No Identificación", "NO_IDENTIFICACION_POR_DEFECTO", 2),
+    ):
+        reales = ~datos["Problemas"].str.contains(defecto, regex=False).to_numpy(dtype=bool)
+        filas = 2 + 3 * np.flatnonzero(reales) + desplazamiento
+        entradas_indice += [
+            (campo, "Hoja1", valor, fila) for valor, fila in zip(datos[columna].to_numpy()[reales], filas)
+        ]
+
+    # Historial de pagos para detectar duplicados en entregas siguientes
+    try:
+        registrar_pagos(datos, os.path.basename(nombre_salida))
+    except Exception as e:
+        log.warning(f"⚠ No se pudo registrar el historial de pagos: {e}")
+
+    # Índice de búsqueda de plantillas (ruta completa, como CRP y CDP, si se guardó en disco)
+    try:
+        index_entries(nombre_salida, "pagos", entradas_indice)
+    except Exception as e:
+        log.warning(f"⚠ No se pudo indexar la plantilla: {e}")
+
+    # Archivo histórico Parquet
+    try:
+        run_id = archive_run(
+            "pagos", registros_pagos, issues_pagos,
+            salida=nombre_salida,
+            numeric_cols=["Valor Bruto", "Base imponible de retención", "Importe de retención"],
+        )
+        log.info(f"🗄 Corrida archivada en Parquet: {run_id}")
+    except Exception as e:
+        log.warning(f"⚠ No se pudo archivar la corrida en Parquet: {e}")
+
+
+def procesar_pagos_consolidado(
+    ruta_entrada=RUTA_ENTRADA,
+    ruta_destino=RUTA_DESTINO,
+    perfil: PerfilConsolidado = PERFIL_GENERADOR,
+    log: Optional[logging.Logger] = None,
+    nombre_salida: Optional[str] = None,
+    tabla_reteica: Optional[TablaReteica] = None,
+) -> Optional[ResumenPlantilla]:
+    """
+    Genera la plantilla de pagos a partir del consolidado.
+    `ruta_entrada` / `ruta_destino` pueden ser rutas u objetos tipo archivo (BytesIO);
+    con objetos, `nombre_salida` es el nombre que se registra en el índice y el archivo.
+    La plantilla escrita se da por entregada (confirmar_entrega).
+    Devuelve el resumen de la plantilla generada, o None si no se pudo generar.
+    """
+    df = leer_consolidado(ruta_entrada, log)
+    if df is None:
+        return None
+    nombre = nombre_salida or (ruta_destino if isinstance(ruta_destino, str) else None)
+    preparada = preparar_plantilla(df, perfil, log, tabla_reteica, nombre_salida=nombre)
+    if preparada is None:
+        return None
+    resumen = guardar_plantilla(preparada, ruta_destino, nombre_salida, log)
+    confirmar_entrega(preparada, nombre or "plantilla_pagos.xlsx", log)
+    return resumen
+
+
+@dataclass
+class ResultadoPlantilla:
+    """Resultado de una generación en memoria."""
+    excel: Optional[bytes]
+    resumen: Optional[ResumenPlantilla]
+    # Últimos eventos del log (buffer circular) y log completo formateado
+    eventos: List[EventoLog]
+    log_completo: bytes
+    # Conteo por nivel y duración de la corrida
+    log_resumen: Dict[str, object]
+    # Consolidado intermedio (solo si se pidió como salida adicional)
+    consolidado: Optional[bytes] = None
+
+
+def generar_plantilla_bytes(
+    contenido: bytes,
+    nombre_salida: str,
+    perfil: PerfilConsolidado = PERFIL_GENERADOR,
+    capacidad_log: int = 300,
+    cache: Optional[CacheConsolidados] = None,
+    bloquear_con_errores: bool = False,
+) -> ResultadoPlantilla:
+    """
+    Consolidado (bytes) -> plantilla (bytes) sin archivos temporales ni redirección de stdout.
+    Cada llamada usa su propio logger, así que corridas simultáneas (varias sesiones de
+    Streamlit) no mezclan sus eventos.
+    Con `cache`, un consolidado ya leído (mismos bytes) no vuelve a pasar por pd.read_excel.
+    Con `bloquear_con_errores`, si algún pago no cuadra o está duplicado no se entrega el Excel
+    (el resumen conserva las inconsistencias para mostrarlas).
+    """
+    with corrida_aislada(capacidad_log) as (log, registro):
+        salida = io.BytesIO()
+        resumen = None
+        try:
+            preparada = _preparar_contenido(contenido, nombre_salida, perfil, cache, log)
+            if preparada is not None:
+                resumen = guardar_plantilla(preparada, salida, nombre_salida, log)
+        except Exception as e:
+            log.exception(f"❌ Error inesperado: {e}")
+            resumen = None
+        bloqueada = bloquear_con_errores and descarga_bloqueada(resumen, log)
+        if resumen and not bloqueada:
+            confirmar_entrega(preparada, nombre_salida, log)
+        return ResultadoPlantilla(
+            excel=salida.getvalue() if resumen and not bloqueada else None,
+            resumen=resumen,
+            eventos=list(registro.eventos),
+            log_completo=registro.log_completo(),
+            log_resumen=registro.resumen(),
+        )
+
+
+def descarga_bloqueada(resumen: Optional[ResumenPlantilla], log: Optional[logging.Logger] = None) -> bool:
+    """True (y lo registra) si la plantilla tiene pagos con errores (cuadre o duplicado)."""
+    if resumen is None or not resumen.errores_validacion:
+        return False
+    (log or logger).error(
+        f"⛔ Descarga bloqueada: {resumen.errores_validacion} pago(s) no cuadran o están duplicados; "
+        f"corrige el consolidado"
+    )
     return True
 
+
+def _preparar_contenido(
+    contenido: bytes,
+    nombre_salida: str,
+    perfil: PerfilConsolidado,
+    cache: Optional[CacheConsolidados],
+    log: logging.Logger,
+) -> Optional[PlantillaPreparada]:
+    if cache is None:
+        df = leer_consolidado(io.BytesIO(contenido), log)
+        if df is None:
+            return None
+        return preparar_plantilla(df, perfil, log, nombre_salida=nombre_salida)
+    aciertos = cache.aciertos
+    leido = cache.obtener(contenido, lambda c: leer_consolidado(io.BytesIO(c), log))
+    if leido is None:
+        return None
+    if cache.aciertos > aciertos:
+        log.info(f"♻ Consolidado en caché ({leido.huella[:12]}, {len(leido.df)} filas): sin releer el Excel")
+    return preparar_plantilla(leido.df, perfil, log, columnas=leido.columnas(perfil), nombre_salida=nombre_salida)
+
+
 # Ejecutar
 if __name__ == "__main__":
+    configurar_consola()
     print("="*60)
     print("GENERADOR DE PLANTILLA DE PAGOS - CON FECHA ACTUAL Y RETECA %")
     print("="*60)
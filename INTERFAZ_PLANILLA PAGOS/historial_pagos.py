@@ -0,0 +1,171 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Optional
+
+import pandas as pd
+
+
+# ============================================================
+# Historial de pagos generados (control de pagos duplicados)
+# ------------------------------------------------------------
+# Cada bloque de pago escrito en una plantilla queda registrado con
+# la clave contrato | Pago No | NIT/CC | valor bruto (hash SHA-1).
+# Al generar una plantilla nueva, cada pago se busca por su clave:
+# si ya estaba en otra plantilla (o se repite en la misma) se marca
+# con la referencia a la plantilla y fila donde apareció primero.
+# ============================================================
+
+# Junto al índice de salidas y al archivo Parquet (crp_usme/data)
+HISTORIAL_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "crp_usme", "data", "historial_pagos.sqlite"
+)
+
+_LOCK = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pagos (
+    clave          TEXT NOT NULL,
+    contrato       TEXT NOT NULL,
+    pago_no        TEXT NOT NULL,
+    identificacion TEXT NOT NULL,
+    valor_bruto    INTEGER NOT NULL,
+    archivo        TEXT NOT NULL,
+    fila           INTEGER NOT NULL,
+    generado       TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_pagos_clave ON pagos(clave);
+CREATE INDEX IF NOT EXISTS ix_pagos_archivo ON pagos(archivo);
+"""
+
+# SQLite admite hasta 999 parámetros por consulta en versiones antiguas
+_LOTE_CONSULTA = 500
+
+
+def _connect(path: Optional[str] = None) -> sqlite3.Connection:
+    path = path or HISTORIAL_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(_SCHEMA)
+    return con
+
+
+def _texto(serie: pd.Series) -> pd.Series:
+    """1234567.0 -> "1234567"; texto en mayúsculas sin espacios extremos; "" si no hay dato."""
+    def uno(v):
+        if v is None or (isinstance(v, float) and v != v):
+            return ""
+        if isinstance(v, float) and v.is_integer():
+            v = int(v)
+        return str(v).strip().upper()
+    return serie.map(uno)
+
+
+def componentes_clave(datos: pd.DataFrame) -> pd.DataFrame:
+    """
+    Contrato, Pago No, NIT/CC (solo dígitos) y valor bruto (entero) de cada pago.
+    Un componente tomado de un valor por defecto queda vacío: la clave es incompleta.
+    """
+    problemas = datos["Problemas"]
+    contrato = _texto(datos["Asignación"]).where(~problemas.str.contains("ASIGNACION_POR_DEFECTO", regex=False), "")
+    # "1234567.0" (número leído como texto) -> "1234567"; "900.123.456-7" -> "9001234567"
+    identificacion = _texto(datos["No Identificación"]).str.replace(r"\.0+$", "", regex=True)
+    identificacion = identificacion.str.replace(r"\D", "", regex=True)
+    identificacion = identificacion.where(~problemas.str.contains("NO_IDENTIFICACION_POR_DEFECTO", regex=False), "")
+    pago_no = _texto(datos["Pago No"]) if "Pago No" in datos else pd.Series("", index=datos.index)
+    valor = pd.to_numeric(datos["Valor Bruto"], errors="coerce").round()
+    return pd.DataFrame({
+        "contrato": contrato,
+        "pago_no": pago_no,
+        "identificacion": identificacion,
+        "valor_bruto": valor.astype("Int64"),
+    })
+
+
+def claves_pago(componentes: pd.DataFrame) -> pd.Series:
+    """SHA-1 de "contrato|pago_no|identificacion|valor"; "" si la clave está incompleta."""
+    completa = (
+        (componentes["contrato"] != "") & (componentes["pago_no"] != "")
+        & (componentes["identificacion"] != "") & componentes["valor_bruto"].notna()
+        & (componentes["valor_bruto"] > 0).fillna(False)
+    )
+    texto = (
+        componentes["contrato"] + "|" + componentes["pago_no"] + "|"
+        + componentes["identificacion"] + "|" + componentes["valor_bruto"].astype(str)
+    )
+    return texto.map(lambda t: hashlib.sha1(t.encode("utf-8")).hexdigest()).where(completa, "")
+
+
+def buscar_claves(claves, excluir_archivo: Optional[str] = None) -> Dict[str, str]:
+    """
+    Clave -> referencia de la primera plantilla que la contiene ("archivo, fila N, fecha").
+    `excluir_archivo` ignora la plantilla que se está regenerando con el mismo nombre.
+    """
+    claves = sorted({c for c in claves if c})
+    encontrados: Dict[str, str] = {}
+    if not claves:
+        return encontrados
+    with _LOCK:
+        con = _connect()
+        try:
+            for i in range(0, len(claves), _LOTE_CONSULTA):
+                lote = claves[i:i + _LOTE_CONSULTA]
+                filas = con.execute(
+                    f"SELECT clave, archivo, fila, generado FROM pagos "
+                    f"WHERE clave IN ({', '.join('?' * len(lote))}) AND archivo <> ? "
+                    f"ORDER BY generado, archivo, fila",
+                    (*lote, excluir_archivo or ""),
+                ).fetchall()
+                for clave, archivo, fila, generado in filas:
+                    encontrados.setdefault(clave, f"{archivo}, fila {fila} ({generado[:10]})")
+        finally:
+            con.close()
+    return encontrados
+
+
+def marcar_duplicados(datos: pd.DataFrame, archivo: Optional[str] = None) -> pd.Series:
+    """
+    "Duplicado de" por pago: referencia a la plantilla anterior que ya lo contenía,
+    o al primer pago de esta misma plantilla con la misma clave; "" si no es duplicado.
+    """
+    claves = claves_pago(componentes_clave(datos))
+    anteriores = buscar_claves(claves, excluir_archivo=archivo)
+    duplicado = claves.map(lambda c: anteriores.get(c, "") if c else "")
+
+    # Repetidos dentro de la misma plantilla (el mismo PDF dos veces en la entrega)
+    con_clave = claves != ""
+    primero = datos["Pago"].groupby(claves.where(con_clave)).transform("first")
+    repetido = con_clave & claves.duplicated(keep="first")
+    interno = "Pago " + primero.astype("Int64").astype(str) + " de esta plantilla"
+    return duplicado.where(~(repetido & (duplicado == "")), interno)
+
+
+def registrar_pagos(datos: pd.DataFrame, archivo: str) -> int:
+    """
+    Registra los pagos de una plantilla (fila C de cada bloque: 2 + 3i).
+    Reemplaza lo que hubiera registrado antes para ese mismo archivo.
+    """
+    componentes = componentes_clave(datos)
+    claves = claves_pago(componentes)
+    generado = datetime.now().isoformat(timespec="seconds")
+    filas = [
+        (clave, c["contrato"], c["pago_no"], c["identificacion"], int(c["valor_bruto"]), archivo, 2 + 3 * i, generado)
+        for i, (clave, c) in enumerate(zip(claves, componentes.to_dict("records")))
+        if clave
+    ]
+    with _LOCK:
+        con = _connect()
+        try:
+            with con:
+                con.execute("DELETE FROM pagos WHERE archivo = ?", (archivo,))
+                con.executemany(
+                    "INSERT INTO pagos (clave, contrato, pago_no, identificacion, valor_bruto, archivo, fila, generado) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    filas,
+                )
+        finally:
+            con.close()
+    return len(filas)
@@ -0,0 +1,350 @@
+import argparse
+import glob
+import io
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from columnas_pagos import PERFIL_GENERADOR, PERFILES
+from generador_plantilla import (
+    PlantillaPreparada,
+    ResumenPlantilla,
+    confirmar_entrega,
+    descarga_bloqueada,
+    guardar_plantilla,
+    leer_consolidado,
+    preparar_plantilla,
+)
+from historial_pagos import claves_pago, componentes_clave, marcar_duplicados
+from registro_pagos import LOGGER_PAGOS, configurar_consola, corrida_aislada
+from tarifas_reteica import cargar_tabla_reteica
+from validacion_pagos import validar_bloques
+
+
+# ============================================================
+# Modo lote: varios consolidados (ENTREGA_1, ENTREGA_2, ...)
+# ------------------------------------------------------------
+# Cada consolidado se procesa en un proceso del pool. Salida:
+#  - una plantilla por consolidado, o
+#  - una plantilla combinada con "Clave Contab." continua.
+# ============================================================
+
+# Origen de un consolidado: ruta en disco o bytes (archivo subido)
+Origen = Union[str, bytes]
+
+logger = logging.getLogger(LOGGER_PAGOS)
+
+
+@dataclass
+class ResultadoArchivo:
+    """Resultado del procesamiento de un consolidado del lote."""
+    nombre: str
+    ok: bool
+    pagos: int = 0
+    filas: int = 0
+    segundos: float = 0.0
+    error: str = ""
+    # Modo individual: bytes de la plantilla (None si la descarga se bloqueó) y su resumen
+    excel: Optional[bytes] = None
+    resumen: Optional[ResumenPlantilla] = None
+    bloqueada: bool = False
+    # Bloques de la plantilla (para unirlos o confirmar la entrega); no salen de procesar_lote
+    preparada: Optional[PlantillaPreparada] = None
+    log_resumen: Dict[str, object] = field(default_factory=dict)
+    log_completo: bytes = b""
+
+    @property
+    def pagos_por_segundo(self) -> float:
+        return self.pagos / self.segundos if self.segundos else 0.0
+
+
+@dataclass
+class ResultadoLote:
+    archivos: List[ResultadoArchivo]
+    segundos: float
+    # Modo combinado: plantilla única (None si la descarga se bloqueó)
+    combinado: Optional[bytes] = None
+    resumen_combinado: Optional[ResumenPlantilla] = None
+
+    @property
+    def fallidos(self) -> List[ResultadoArchivo]:
+        return [r for r in self.archivos if not r.ok]
+
+    def reporte(self) -> pd.DataFrame:
+        """Una fila por consolidado: estado, pagos, filas, tiempo y pagos/s."""
+        return pd.DataFrame([{
+            "Consolidado": r.nombre,
+            "Estado": "OK" if r.ok else "ERROR",
+            "Pagos": r.pagos,
+            "Filas": r.filas,
+            "Segundos": round(r.segundos, 2),
+            "Pagos/s": round(r.pagos_por_segundo, 1),
+            "Advertencias": r.log_resumen.get("WARNING", 0),
+            "Error": r.error,
+        } for r in self.archivos])
+
+
+def nombre_plantilla(nombre_consolidado: str) -> str:
+    """ENTREGA_1.xlsx -> PLANTILLA_PAGOS_ENTREGA_1.xlsx"""
+    base = os.path.splitext(os.path.basename(nombre_consolidado))[0]
+    return f"PLANTILLA_PAGOS_{base}.xlsx"
+
+
+def _procesar_consolidado(
+    nombre: str, origen: Origen, nombre_perfil: str, combinar: bool, nombre_salida: Optional[str] = None
+) -> ResultadoArchivo:
+    """
+    Trabajo de un proceso del pool (el perfil viaja por nombre: sus reglas no se serializan).
+    `nombre_salida`: plantilla donde terminan los pagos (la combinada, o la propia).
+    """
+    nombre_salida = nombre_salida or nombre_plantilla(nombre)
+    inicio = time.perf_counter()
+    resultado = ResultadoArchivo(nombre=nombre, ok=False)
+    with corrida_aislada(capacidad=50, etiqueta="lote") as (log, registro):
+        try:
+            entrada = io.BytesIO(origen) if isinstance(origen, bytes) else origen
+            df = leer_consolidado(entrada, log)
+            preparada = (
+                preparar_plantilla(df, PERFILES[nombre_perfil], log, nombre_salida=nombre_salida)
+                if df is not None else None
+            )
+            if preparada is None:
+                ultimo_error = next((e.mensaje for e in reversed(registro.eventos) if e.nivel == "ERROR"), "")
+                resultado.error = ultimo_error or "No se pudo procesar el consolidado"
+            else:
+                resultado.ok = True
+                resultado.pagos = len(preparada.datos)
+                resultado.filas = len(preparada.filas)
+                resultado.preparada = preparada
+                if not combinar:
+                    salida = io.BytesIO()
+                    resultado.resumen = guardar_plantilla(preparada, salida, nombre_salida, log)
+                    resultado.excel = salida.getvalue()
+        except Exception as e:
+            log.exception(f"❌ Error inesperado: {e}")
+            resultado.ok = False
+            resultado.error = str(e)
+        resultado.segundos = time.perf_counter() - inicio
+        resultado.log_resumen = registro.resumen()
+        resultado.log_completo = registro.log_completo()
+    return resultado
+
+
+def combinar_plantillas(
+    partes: Sequence[Tuple[str, PlantillaPreparada]],
+    nombre_salida: Optional[str] = None,
+) -> PlantillaPreparada:
+    """
+    Une los bloques de varios consolidados en una sola plantilla.
+    "Clave Contab." (columna B de las filas C) se renumera de forma continua;
+    "Pago" conserva la numeración del consolidado de origen.
+    La validación se repite sobre el conjunto: un pago repetido entre
+    consolidados del mismo lote también es duplicado.
+    """
+    datos, filas = [], []
+    for nombre, preparada in partes:
+        d = preparada.datos.copy()
+        d.insert(0, "Consolidado", os.path.basename(nombre))
+        d["Pago en consolidado"] = d["Pago"]
+        datos.append(d)
+        filas.append(preparada.filas)
+
+    datos = pd.concat(datos, ignore_index=True)
+    filas = np.concatenate(filas) if filas else np.empty((0, 43), dtype=object)
+    consecutivo = np.arange(1, len(datos) + 1)
+    filas[0::3, 1] = consecutivo
+    datos["Pago"] = consecutivo
+
+    try:
+        datos["Duplicado de"] = marcar_duplicados(datos, nombre_salida)
+    except Exception as e:
+        logger.warning(f"⚠ No se pudo consultar el historial de pagos: {e}")
+    inconsistencias = validar_bloques(filas, datos, cargar_tabla_reteica())
+    inconsistencias = datos[["Pago", "Consolidado", "Pago en consolidado"]].merge(inconsistencias, on="Pago")
+    inconsistencias = inconsistencias[["Consolidado", "Pago", *inconsistencias.columns[3:], "Pago en consolidado"]]
+
+    primera = partes[0][1]
+    return PlantillaPreparada(datos, filas, primera.fecha_actual, primera.version_tarifas, inconsistencias)
+
+
+def _entregar_lote(
+    archivos: Sequence[ResultadoArchivo],
+    bloquear_con_errores: bool,
+    carpeta: Optional[str],
+    log: Optional[logging.Logger] = None,
+) -> None:
+    """
+    Modo individual, en el orden del lote: cada consolidado se validó solo contra el
+    historial y contra sí mismo; aquí se marca el pago que ya está en una plantilla
+    entregada antes en el mismo lote (misma clave que marcar_duplicados), se decide el
+    bloqueo y se confirma la entrega. Las plantillas con pagos marcados se validan y
+    escriben de nuevo; los pagos de una plantilla bloqueada no cuentan como entregados.
+    """
+    log = log or logger
+    tabla_reteica = None
+    entregados: Dict[str, str] = {}
+    for r in archivos:
+        if r.excel is None or r.preparada is None:
+            continue
+        preparada = r.preparada
+        datos = preparada.datos
+        claves = claves_pago(componentes_clave(datos))
+        otra = claves.map(lambda c: entregados.get(c, "") if c else "")
+        nuevos = (otra != "") & (datos["Duplicado de"] == "")
+        if nuevos.any():
+            datos["Duplicado de"] = datos["Duplicado de"].where(~nuevos, otra)
+            tabla_reteica = tabla_reteica or cargar_tabla_reteica()
+            preparada.inconsistencias = validar_bloques(preparada.filas, datos, tabla_reteica)
+            salida = io.BytesIO()
+            r.resumen = guardar_plantilla(preparada, salida, nombre_plantilla(r.nombre), log)
+            r.excel = salida.getvalue()
+            log.warning(
+                f"⚠ PAGO_DUPLICADO: {r.nombre}: {int(nuevos.sum())} pago(s) ya están en otra plantilla del lote "
+                f"{datos.loc[nuevos, 'Pago'].tolist()[:20]}"
+            )
+
+        if bloquear_con_errores and descarga_bloqueada(r.resumen, log):
+            r.excel, r.bloqueada = None, True
+            continue
+        confirmar_entrega(preparada, os.path.join(carpeta or "", nombre_plantilla(r.nombre)), log)
+        for clave, pago in zip(claves, datos["Pago"]):
+            if clave:
+                entregados.setdefault(clave, f"Pago {pago} de {nombre_plantilla(r.nombre)}")
+
+
+def procesar_lote(
+    consolidados: Sequence[Tuple[str, Origen]],
+    combinar: bool = False,
+    nombre_combinado: str = "PLANTILLA_PAGOS_COMBINADA.xlsx",
+    nombre_perfil: str = PERFIL_GENERADOR.nombre,
+    workers: Optional[int] = None,
+    al_terminar: Optional[Callable[[ResultadoArchivo], None]] = None,
+    log: Optional[logging.Logger] = None,
+    bloquear_con_errores: bool = False,
+    carpeta: Optional[str] = None,
+) -> ResultadoLote:
+    """
+    Procesa varios consolidados (nombre, ruta o bytes) en paralelo.
+    `workers` <= 1 procesa en el mismo proceso (sin pool).
+    `al_terminar` se llama con cada resultado a medida que termina (progreso).
+    `log` recibe los eventos de la plantilla combinada y de las entregas.
+    Con `bloquear_con_errores` no se entrega una plantilla con pagos que no cuadran
+    o duplicados; solo las entregadas quedan en el historial, el índice y el archivo.
+    `carpeta`: donde se guardan las plantillas (el índice registra la ruta completa).
+    Un pago repetido entre consolidados del lote es duplicado en ambos modos (en el
+    individual, solo si la plantilla anterior se entregó).
+    """
+    inicio = time.perf_counter()
+    workers = workers or min(len(consolidados), os.cpu_count() or 1)
+    resultados: Dict[int, ResultadoArchivo] = {}
+    # En modo combinado los pagos terminan en la plantilla combinada
+    nombre_salida = nombre_combinado if combinar else None
+
+    if workers <= 1 or len(consolidados) <= 1:
+        for i, (nombre, origen) in enumerate(consolidados):
+            resultados[i] = _procesar_consolidado(nombre, origen, nombre_perfil, combinar, nombre_salida)
+            if al_terminar:
+                al_terminar(resultados[i])
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futuros = {
+                pool.submit(_procesar_consolidado, nombre, origen, nombre_perfil, combinar, nombre_salida): i
+                for i, (nombre, origen) in enumerate(consolidados)
+            }
+            for futuro in as_completed(futuros):
+                i = futuros[futuro]
+                try:
+                    resultados[i] = futuro.result()
+                except Exception as e:
+                    # Falla del proceso (no del consolidado): se aísla en su archivo
+                    resultados[i] = ResultadoArchivo(nombre=consolidados[i][0], ok=False, error=str(e))
+                if al_terminar:
+                    al_terminar(resultados[i])
+
+    # Orden de entrada (la numeración combinada sigue el orden de los consolidados)
+    archivos = [resultados[i] for i in range(len(consolidados))]
+    lote = ResultadoLote(archivos=archivos, segundos=0.0)
+
+    if combinar:
+        partes = [(r.nombre, r.preparada) for r in archivos if r.ok and r.preparada is not None]
+        if partes:
+            salida = io.BytesIO()
+            combinada = combinar_plantillas(partes, nombre_combinado)
+            lote.resumen_combinado = guardar_plantilla(combinada, salida, nombre_combinado, log)
+            if not (bloquear_con_errores and descarga_bloqueada(lote.resumen_combinado, log)):
+                lote.combinado = salida.getvalue()
+                confirmar_entrega(combinada, os.path.join(carpeta or "", nombre_combinado), log)
+    else:
+        _entregar_lote(archivos, bloquear_con_errores, carpeta, log)
+    for r in archivos:
+        r.preparada = None
+
+    lote.segundos = time.perf_counter() - inicio
+    return lote
+
+
+def _registrar_reporte(lote: ResultadoLote) -> None:
+    for r in lote.archivos:
+        if r.ok:
+            logger.info(f"✓ {r.nombre}: {r.pagos} pagos, {r.filas} filas en {r.segundos:.2f} s ({r.pagos_por_segundo:.1f} pagos/s)")
+        else:
+            logger.error(f"✗ {r.nombre}: {r.error}")
+    total = sum(r.pagos for r in lote.archivos)
+    logger.info(
+        f"Lote: {len(lote.archivos)} consolidados ({len(lote.fallidos)} con error), "
+        f"{total} pagos en {lote.segundos:.2f} s ({total / lote.segundos if lote.segundos else 0:.1f} pagos/s)"
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Genera plantillas de pagos para varios consolidados en paralelo.")
+    parser.add_argument("consolidados", nargs="+", help="Archivos .xlsx o patrones (ej: ENTREGA_*.xlsx)")
+    parser.add_argument("--salida", default=".", help="Carpeta de salida")
+    parser.add_argument("--combinar", action="store_true", help="Una sola plantilla con Clave Contab. continua")
+    parser.add_argument("--nombre", default="PLANTILLA_PAGOS_COMBINADA.xlsx", help="Nombre de la plantilla combinada")
+    parser.add_argument("--perfil", default=PERFIL_GENERADOR.nombre, choices=sorted(PERFILES))
+    parser.add_argument("--workers", type=int, default=None, help="Procesos en paralelo (por defecto: núcleos)")
+    args = parser.parse_args(argv)
+
+    configurar_consola()
+    rutas = []
+    for patron in args.consolidados:
+        rutas += sorted(glob.glob(patron)) or [patron]
+
+    lote = procesar_lote(
+        [(ruta, ruta) for ruta in rutas],
+        combinar=args.combinar,
+        nombre_combinado=args.nombre,
+        nombre_perfil=args.perfil,
+        workers=args.workers,
+        carpeta=args.salida,
+    )
+
+    os.makedirs(args.salida, exist_ok=True)
+    if args.combinar:
+        if lote.combinado:
+            destino = os.path.join(args.salida, args.nombre)
+            with open(destino, "wb") as f:
+                f.write(lote.combinado)
+            logger.info(f"💾 {destino}")
+    else:
+        for r in lote.archivos:
+            if r.excel:
+                destino = os.path.join(args.salida, nombre_plantilla(r.nombre))
+                with open(destino, "wb") as f:
+                    f.write(r.excel)
+                logger.info(f"💾 {destino}")
+
+    _registrar_reporte(lote)
+    return 1 if lote.fallidos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
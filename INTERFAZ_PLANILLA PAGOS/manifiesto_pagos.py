@@ -0,0 +1,262 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from extraccion_pagos import COLUMNAS_CONSOLIDADO, UMBRAL_CONFIANZA, extraer_pdfs
+from registro_pagos import LOGGER_PAGOS
+import modules.ocr as ocr
+from modules.pdf_engine import ENGINE
+
+
+# ============================================================
+# Consolidado incremental de una carpeta de PDFs de pago
+# ------------------------------------------------------------
+# El manifiesto (JSON junto al consolidado) guarda por PDF su tamaño,
+# mtime, SHA-256 y los campos ya extraídos. En cada corrida solo se
+# extraen los PDFs nuevos o modificados; el consolidado se rearma con
+# los campos guardados de los demás. Un PDF tocado pero con el mismo
+# contenido (mismo hash) no se vuelve a extraer. Los PDFs pendientes se
+# extraen en el pool del motor común (modules/pdf_engine.py); los que
+# fallan van a la hoja "Errores".
+# ============================================================
+
+VERSION_MANIFIESTO = 1
+
+COLUMNAS_ERRORES = ["PDF", "Etapa", "Error"]
+COLUMNAS_REVISAR = ["PDF", "Confianza", "Relectura"]
+
+logger = logging.getLogger(LOGGER_PAGOS)
+
+
+@dataclass
+class ResultadoIncremental:
+    # PDFs extraídos en esta corrida (con o sin error)
+    nuevos: List[str] = field(default_factory=list)
+    modificados: List[str] = field(default_factory=list)
+    sin_cambios: int = 0
+    eliminados: List[str] = field(default_factory=list)
+    # (PDF, etapa, error) de todos los PDFs de la carpeta que no se pudieron extraer
+    errores: List[Tuple[str, str, str]] = field(default_factory=list)
+    # (PDF, confianza, releído) de los PDFs extraídos con confianza bajo UMBRAL_CONFIANZA
+    revisar: List[Tuple[str, float, bool]] = field(default_factory=list)
+    segundos: float = 0.0
+    # Etapa -> segundos: revision (stat + hash) y escritura en el proceso principal;
+    # texto, ocr, campos y relectura sumados sobre todos los PDFs (tiempo de los procesos del pool)
+    tiempos: Dict[str, float] = field(default_factory=dict)
+    consolidado: Optional[pd.DataFrame] = None
+
+    @property
+    def hubo_cambios(self) -> bool:
+        return bool(self.nuevos or self.modificados or self.eliminados)
+
+    @property
+    def pdfs_por_segundo(self) -> float:
+        extraidos = len(self.nuevos) + len(self.modificados)
+        return extraidos / self.segundos if self.segundos else 0.0
+
+    def hoja_errores(self) -> pd.DataFrame:
+        return pd.DataFrame(self.errores, columns=COLUMNAS_ERRORES)
+
+    def hoja_revisar(self) -> pd.DataFrame:
+        return pd.DataFrame(self.revisar, columns=COLUMNAS_REVISAR)
+
+
+def ruta_manifiesto(salida: str) -> str:
+    """consolidado.xlsx -> consolidado.manifiesto.json"""
+    return os.path.splitext(salida)[0] + ".manifiesto.json"
+
+
+def hash_archivo(ruta: str, bloque: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def cargar_manifiesto(ruta: str) -> Dict[str, dict]:
+    """
+    PDF -> {size, mtime_ns, sha256, datos} (o etapa y error en lugar de datos);
+    vacío si no existe o es de otra versión.
+    """
+    try:
+        with open(ruta, "r", encoding="utf-8") as f:
+            contenido = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if contenido.get("version") != VERSION_MANIFIESTO:
+        return {}
+    return contenido.get("archivos", {})
+
+
+def guardar_manifiesto(ruta: str, archivos: Dict[str, dict]) -> None:
+    """Escritura atómica: un corte a mitad no deja el manifiesto a medias."""
+    temporal = ruta + ".tmp"
+    with open(temporal, "w", encoding="utf-8") as f:
+        json.dump({"version": VERSION_MANIFIESTO, "archivos": archivos}, f, ensure_ascii=False, indent=1)
+    os.replace(temporal, ruta)
+
+
+def actualizar_consolidado(
+    folder: str,
+    salida: Optional[str] = None,
+    estable_s: float = 0.0,
+    completo: bool = False,
+    workers: Optional[int] = None,
+) -> ResultadoIncremental:
+    """
+    Extrae solo los PDFs nuevos o modificados de `folder` (en paralelo, ver
+    extraer_pdfs) y reescribe el consolidado `salida` (por defecto
+    consolidado_pagos.xlsx en la misma carpeta), con la hoja "Errores" si algún
+    PDF no se pudo extraer y la hoja "Revisar" si alguno quedó con confianza baja.
+    - `estable_s`: ignora en esta corrida los PDFs modificados hace menos de esos
+      segundos (copias en curso, modo vigilancia).
+    - `completo`: descarta el manifiesto y vuelve a extraer todo.
+    Con OCR habilitado (modules/ocr.py) también se vuelven a extraer los PDFs
+    escaneados que se extrajeron sin OCR.
+    Un PDF con error no se reintenta mientras no cambie (salvo con `completo`).
+    El consolidado solo se reescribe si algo cambió (o si no existe).
+    """
+    inicio = time.perf_counter()
+    salida = salida or os.path.join(folder, "consolidado_pagos.xlsx")
+    manifiesto_path = ruta_manifiesto(salida)
+    anterior = {} if completo else cargar_manifiesto(manifiesto_path)
+    actual: Dict[str, dict] = {}
+    resultado = ResultadoIncremental()
+    tiempos = dict.fromkeys(("revision", "texto", "ocr", "campos", "relectura", "escritura"), 0.0)
+    ahora = time.time()
+
+    presentes = sorted(f for f in os.listdir(folder) if f.endswith(".pdf"))
+    # PDF -> (firma, previo) de los que hay que extraer
+    pendientes: Dict[str, Tuple[dict, Optional[dict]]] = {}
+    for nombre in presentes:
+        ruta = os.path.join(folder, nombre)
+        try:
+            st = os.stat(ruta)
+        except OSError:
+            continue
+        previo = anterior.get(nombre)
+
+        # PDF escaneado extraído sin OCR: con OCR habilitado se vuelve a extraer
+        sin_ocr = bool(previo and previo.get("sin_texto") and not previo.get("paginas_ocr") and ocr.ocr_active())
+        # Mismo tamaño y mtime: se reutiliza lo extraído sin abrir el PDF
+        if previo and not sin_ocr and previo["size"] == st.st_size and previo["mtime_ns"] == st.st_mtime_ns:
+            actual[nombre] = previo
+            resultado.sin_cambios += 1
+            continue
+        if estable_s and ahora - st.st_mtime < estable_s:
+            # Se está copiando: se conserva lo anterior (si había) y se toma en la próxima corrida
+            if previo:
+                actual[nombre] = previo
+            continue
+
+        firma = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha256": hash_archivo(ruta)}
+        if previo and not sin_ocr and previo["sha256"] == firma["sha256"]:
+            # Solo cambió el mtime (copia, touch): mismo contenido, mismo resultado
+            actual[nombre] = {**previo, **firma}
+            resultado.sin_cambios += 1
+            continue
+        pendientes[nombre] = (firma, previo)
+    tiempos["revision"] = time.perf_counter() - inicio
+
+    for extraido in extraer_pdfs([os.path.join(folder, n) for n in pendientes], workers):
+        firma, previo = pendientes[extraido.nombre]
+        tiempos["texto"] += extraido.segundos_texto
+        tiempos["ocr"] += extraido.segundos_ocr
+        tiempos["campos"] += extraido.segundos_campos
+        tiempos["relectura"] += extraido.segundos_relectura
+        if extraido.error:
+            logger.error(f"✗ No se pudo extraer {extraido.nombre} ({extraido.etapa}): {extraido.error}")
+            actual[extraido.nombre] = {**firma, "etapa": extraido.etapa, "error": extraido.error}
+        else:
+            actual[extraido.nombre] = {
+                **firma, "datos": extraido.datos, "confianza": extraido.confianza, "relectura": extraido.relectura,
+                "sin_texto": extraido.paginas_sin_texto, "paginas_ocr": extraido.paginas_ocr,
+            }
+            if extraido.confianza < UMBRAL_CONFIANZA:
+                logger.warning(f"⚠ {extraido.nombre}: confianza {extraido.confianza:.2f}, revisar")
+        (resultado.modificados if previo else resultado.nuevos).append(extraido.nombre)
+        logger.debug(f"{'↻' if previo else '＋'} {extraido.nombre}")
+
+    resultado.eliminados = sorted(set(anterior) - set(presentes))
+    # Orden de la carpeta, sin importar el orden en que terminó cada proceso
+    entradas = [actual[n] for n in presentes if n in actual]
+    resultado.consolidado = pd.DataFrame(
+        [e["datos"] for e in entradas if "datos" in e], columns=COLUMNAS_CONSOLIDADO
+    )
+    resultado.errores = [(n, actual[n]["etapa"], actual[n]["error"]) for n in presentes if "error" in actual.get(n, {})]
+    # Entradas de manifiestos anteriores sin confianza: se consideran confiables
+    resultado.revisar = [
+        (n, actual[n]["confianza"], actual[n]["relectura"]) for n in presentes
+        if actual.get(n, {}).get("confianza", 1.0) < UMBRAL_CONFIANZA
+    ]
+
+    inicio_escritura = time.perf_counter()
+    if resultado.hubo_cambios or completo or not os.path.exists(salida):
+        with pd.ExcelWriter(salida) as writer:
+            resultado.consolidado.to_excel(writer, index=False)
+            if resultado.errores:
+                resultado.hoja_errores().to_excel(writer, sheet_name="Errores", index=False)
+            if resultado.revisar:
+                resultado.hoja_revisar().to_excel(writer, sheet_name="Revisar", index=False)
+    guardar_manifiesto(manifiesto_path, actual)
+    tiempos["escritura"] = time.perf_counter() - inicio_escritura
+
+    resultado.tiempos = tiempos
+    resultado.segundos = time.perf_counter() - inicio
+    logger.info(
+        f"📄 {len(resultado.nuevos)} nuevos, {len(resultado.modificados)} modificados, "
+        f"{resultado.sin_cambios} sin cambios, {len(resultado.eliminados)} eliminados, "
+        f"{len(resultado.errores)} con error ({resultado.segundos:.2f} s) -> {salida}"
+    )
+    return resultado
+
+
+def registrar_tiempos(resultado: ResultadoIncremental) -> None:
+    """PDFs/s y segundos por etapa de una corrida."""
+    extraidos = len(resultado.nuevos) + len(resultado.modificados)
+    logger.info(f"⏱ {extraidos} PDFs extraídos en {resultado.segundos:.2f} s ({resultado.pdfs_por_segundo:.1f} PDFs/s)")
+    if resultado.revisar:
+        logger.info(f"   {len(resultado.revisar)} PDF(s) con confianza baja (hoja 'Revisar')")
+    for etapa, segundos in resultado.tiempos.items():
+        logger.info(f"   {etapa}: {segundos:.2f} s")
+    # Métricas del motor común de extracción (documentos, caché, errores, timeouts)
+    for fila in ENGINE.metrics().to_dict("records"):
+        logger.info(
+            f"   motor [{fila['Tipo']}]: {fila['Documentos']} PDFs, {fila['Aciertos caché']} de caché, "
+            f"{fila['Errores']} con error ({fila['Timeouts']} timeout)"
+        )
+
+
+def vigilar(
+    folder: str,
+    salida: Optional[str] = None,
+    intervalo: float = 5.0,
+    estable_s: float = 2.0,
+    al_actualizar: Optional[Callable[[ResultadoIncremental], None]] = None,
+    max_ciclos: Optional[int] = None,
+    workers: Optional[int] = None,
+) -> None:
+    """
+    Modo vigilancia: revisa la carpeta cada `intervalo` segundos (solo stat de cada
+    archivo si nada cambió) y actualiza el consolidado cuando llegan PDFs nuevos.
+    Termina con Ctrl+C o tras `max_ciclos` revisiones.
+    """
+    logger.info(f"👀 Vigilando {folder} cada {intervalo:g} s (Ctrl+C para terminar)")
+    ciclos = 0
+    try:
+        while max_ciclos is None or ciclos < max_ciclos:
+            resultado = actualizar_consolidado(folder, salida, estable_s=estable_s, workers=workers)
+            if resultado.hubo_cambios and al_actualizar:
+                al_actualizar(resultado)
+            ciclos += 1
+            if max_ciclos is None or ciclos < max_ciclos:
+                time.sleep(intervalo)
+    except KeyboardInterrupt:
+        logger.info("Vigilancia terminada")
@@ -0,0 +1,152 @@
+import argparse
+import io
+import sys
+from typing import Iterable, Optional, Sequence
+
+import pandas as pd
+
+from columnas_pagos import PERFIL_GENERADOR, PerfilConsolidado
+from extraccion_pagos import COLUMNAS_CONSOLIDADO, UMBRAL_CONFIANZA, FuentePDF, nombre_fuente, pdfs_en_carpeta
+from generador_plantilla import (
+    ResultadoPlantilla,
+    confirmar_entrega,
+    descarga_bloqueada,
+    guardar_plantilla,
+    preparar_plantilla,
+)
+from registro_pagos import corrida_aislada
+from modules.doc_router import check_pdf
+from modules.ocr import set_ocr_enabled
+from modules.pdf_engine import ENGINE
+from modules.text_store import store_document
+
+
+# ============================================================
+# PDFs de pago -> plantilla, en memoria
+# ------------------------------------------------------------
+# Cada PDF se extrae y se agrega al consolidado en memoria, que pasa
+# directo al constructor de bloques (sin escribir ni releer Excel).
+# El consolidado es una salida opcional.
+# ============================================================
+
+
+def pdfs_a_plantilla(
+    fuentes: Iterable[FuentePDF],
+    nombre_salida: str,
+    perfil: PerfilConsolidado = PERFIL_GENERADOR,
+    con_consolidado: bool = False,
+    capacidad_log: int = 300,
+    bloquear_con_errores: bool = False,
+    clasificar: bool = True,
+) -> ResultadoPlantilla:
+    """
+    PDFs (rutas o (nombre, bytes)) -> plantilla de pagos (bytes).
+    Un PDF que no se puede leer se registra como error y no detiene la corrida.
+    Con `con_consolidado` también devuelve el consolidado (.xlsx) en `consolidado`.
+    Con `bloquear_con_errores` no entrega la plantilla si algún pago no cuadra o está duplicado.
+    `clasificar=False` si los PDFs ya se separaron por tipo (doc_router.route_pdfs).
+    """
+    with corrida_aislada(capacidad_log, "pdfs") as (log, registro):
+        pagos, errores, rechazados, releidos = [], 0, 0, 0
+        for fuente in fuentes:
+            nombre = nombre_fuente(fuente)
+            try:
+                if isinstance(fuente, str):
+                    with open(fuente, "rb") as f:
+                        fuente = (nombre, f.read())
+            except OSError as e:
+                errores += 1
+                log.error(f"✗ No se pudo extraer {nombre}: {e}")
+                continue
+            # Otro tipo de documento (MEMO CRP, solicitud CDP): se rechaza sin extraer el texto completo
+            procesar, clasificacion = check_pdf(fuente[1], "pagos") if clasificar else (True, None)
+            if not procesar:
+                rechazados += 1
+                log.warning(f"⛔ {nombre}: {clasificacion.motivo('pagos')}")
+                continue
+
+            # Motor común (extractor "pagos"): un PDF repetido en la sesión sale de la caché
+            resultado = ENGINE.extract("pagos", nombre, fuente[1])
+            if resultado.error:
+                errores += 1
+                log.error(f"✗ No se pudo extraer {nombre}: {resultado.error}")
+                continue
+            extraido = resultado.datos
+            if extraido.paginas_ocr:
+                log.info(f"🔎 {nombre}: {extraido.paginas_ocr} página(s) escaneadas leídas con OCR")
+            elif extraido.paginas_sin_texto:
+                log.warning(f"⚠ {nombre}: {extraido.paginas_sin_texto} página(s) sin texto (escaneadas); habilita el OCR")
+            pagos.append(extraido.datos)
+            releidos += extraido.relectura
+            if extraido.confianza < UMBRAL_CONFIANZA:
+                log.warning(f"⚠ {nombre}: confianza {extraido.confianza:.2f} (faltan campos o el neto no cuadra), revisar")
+            else:
+                log.debug(f"✓ PDF extraído: {nombre} (confianza {extraido.confianza:.2f}{', relectura' if extraido.relectura else ''})")
+            # Almacén de textos (búsqueda en Auditoría, re-extracción sin el PDF)
+            try:
+                store_document(resultado.sha256, nombre, "pagos", extraido.paginas, extractor="pdfplumber-text")
+            except Exception as e:
+                log.warning(f"⚠ No se pudo guardar el texto de {nombre}: {e}")
+        log.info(f"📄 {len(pagos)} PDFs extraídos ({errores} con error, {rechazados} de otro tipo, {releidos} releídos)")
+
+        df = pd.DataFrame(pagos, columns=COLUMNAS_CONSOLIDADO)
+        excel, resumen = None, None
+        if pagos:
+            preparada = preparar_plantilla(df, perfil, log, nombre_salida=nombre_salida)
+            if preparada is not None:
+                salida = io.BytesIO()
+                resumen = guardar_plantilla(preparada, salida, nombre_salida, log)
+                if not (bloquear_con_errores and descarga_bloqueada(resumen, log)):
+                    excel = salida.getvalue()
+                    confirmar_entrega(preparada, nombre_salida, log)
+        else:
+            log.error("✗ Ningún PDF se pudo extraer")
+
+        consolidado = None
+        if con_consolidado:
+            buffer = io.BytesIO()
+            df.to_excel(buffer, index=False)
+            consolidado = buffer.getvalue()
+
+        return ResultadoPlantilla(
+            excel=excel,
+            resumen=resumen,
+            eventos=list(registro.eventos),
+            log_completo=registro.log_completo(),
+            log_resumen=registro.resumen(),
+            consolidado=consolidado,
+        )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="PDFs de pago -> plantilla de pagos, sin consolidado intermedio.")
+    parser.add_argument("carpeta", help="Carpeta con los PDFs de pago")
+    parser.add_argument("salida", help="Ruta de la plantilla (.xlsx)")
+    parser.add_argument("--consolidado", default=None, help="Ruta opcional para guardar también el consolidado")
+    parser.add_argument("--ocr", action="store_true", help="Lee con OCR (Tesseract) las páginas escaneadas sin texto")
+    args = parser.parse_args(argv)
+    if args.ocr:
+        set_ocr_enabled(True)
+
+    resultado = pdfs_a_plantilla(
+        pdfs_en_carpeta(args.carpeta), args.salida, con_consolidado=bool(args.consolidado)
+    )
+    for evento in resultado.eventos:
+        if evento.nivel != "DEBUG":
+            print(evento.mensaje)
+
+    if resultado.consolidado:
+        with open(args.consolidado, "wb") as f:
+            f.write(resultado.consolidado)
+        print(f"💾 Consolidado: {args.consolidado}")
+    if not resultado.excel:
+        print("✗ No se generó la plantilla")
+        return 1
+    with open(args.salida, "wb") as f:
+        f.write(resultado.excel)
+    print(f"💾 Plantilla: {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import logging
+import sys
+import tempfile
+import uuid
+from collections import Counter, deque
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Deque, Dict, Iterator, Tuple
+
+
+# ============================================================
+# Log estructurado del generador de pagos
+# ------------------------------------------------------------
+# El generador registra eventos con nivel (DEBUG/INFO/WARNING/ERROR)
+# en el logger "pagos". Una corrida se captura con RegistroCorrida:
+# la UI muestra solo un buffer circular de los últimos eventos y el
+# log completo queda disponible para descarga.
+# ============================================================
+
+LOGGER_PAGOS = "pagos"
+FORMATO = "%(asctime)s - %(levelname)s - %(message)s"
+
+
+@dataclass(frozen=True)
+class EventoLog:
+    momento: datetime
+    nivel: str
+    mensaje: str
+
+    def linea(self) -> str:
+        return f"{self.momento.strftime('%H:%M:%S')} {self.nivel:<7} {self.mensaje}"
+
+
+class RegistroCorrida(logging.Handler):
+    """
+    Handler de una corrida:
+    - `eventos`: últimos `capacidad` eventos (buffer circular, lo que ve la UI)
+    - `conteo`: eventos por nivel
+    - log completo en un SpooledTemporaryFile (en memoria hasta `max_memoria`
+      bytes, luego en disco), para descargarlo sin guardarlo en la sesión.
+    """
+
+    def __init__(self, capacidad: int = 200, nivel: int = logging.DEBUG, max_memoria: int = 1 << 20):
+        super().__init__(nivel)
+        self.eventos: Deque[EventoLog] = deque(maxlen=capacidad)
+        self.conteo: Counter = Counter()
+        self.inicio = datetime.now()
+        self._completo = tempfile.SpooledTemporaryFile(max_size=max_memoria, mode="w+b")
+        self.setFormatter(logging.Formatter(FORMATO))
+
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            evento = EventoLog(datetime.fromtimestamp(record.created), record.levelname, record.getMessage())
+            linea = self.format(record)
+        except Exception:
+            self.handleError(record)
+            return
+        self.eventos.append(evento)
+        self.conteo[record.levelname] += 1
+        self._completo.write((linea + "\n").encode("utf-8"))
+
+    def recientes(self) -> str:
+        return "\n".join(e.linea() for e in self.eventos)
+
+    def resumen(self) -> Dict[str, object]:
+        """Resumen de la corrida: total de eventos, conteo por nivel y duración."""
+        return {
+            "eventos": sum(self.conteo.values()),
+            **{nivel: self.conteo.get(nivel, 0) for nivel in ("DEBUG", "INFO", "WARNING", "ERROR")},
+            "duracion_s": round((datetime.now() - self.inicio).total_seconds(), 2),
+        }
+
+    def log_completo(self) -> bytes:
+        self.acquire()
+        try:
+            self._completo.seek(0)
+            data = self._completo.read()
+            self._completo.seek(0, 2)
+            return data
+        finally:
+            self.release()
+
+    def close(self) -> None:
+        self.acquire()
+        try:
+            self._completo.close()
+        finally:
+            self.release()
+        super().close()
+
+
+@contextmanager
+def registrar_corrida(logger: logging.Logger, capacidad: int = 200) -> Iterator[RegistroCorrida]:
+    """Adjunta un RegistroCorrida al logger durante el bloque `with`."""
+    registro = RegistroCorrida(capacidad)
+    logger.addHandler(registro)
+    try:
+        yield registro
+    finally:
+        logger.removeHandler(registro)
+
+
+@contextmanager
+def corrida_aislada(capacidad: int = 200, etiqueta: str = "corrida") -> Iterator[Tuple[logging.Logger, RegistroCorrida]]:
+    """
+    Logger propio de una corrida (no registrado en logging.getLogger, así que no
+    comparte handlers con otras sesiones/hilos) con su RegistroCorrida.
+    El registro se cierra al salir: leer log_completo() dentro del bloque.
+    """
+    log = logging.Logger(f"{LOGGER_PAGOS}.{etiqueta}.{uuid.uuid4().hex[:8]}", logging.DEBUG)
+    registro = RegistroCorrida(capacidad)
+    log.addHandler(registro)
+    try:
+        yield log, registro
+    finally:
+        log.removeHandler(registro)
+        registro.close()
+
+
+def configurar_consola(nivel: int = logging.INFO) -> None:
+    """Salida por consola para la ejecución directa de los scripts."""
+    logger = logging.getLogger(LOGGER_PAGOS)
+    consola = next((h for h in logger.handlers if getattr(h, "_consola_pagos", False)), None)
+    if consola is None:
+        consola = logging.StreamHandler(sys.stdout)
+        consola.setFormatter(logging.Formatter("%(message)s"))
+        consola._consola_pagos = True
+        logger.addHandler(consola)
+    consola.setLevel(nivel)
+    # Sin generador_plantilla (que lo deja en DEBUG) el logger heredaría WARNING de la raíz
+    if logger.getEffectiveLevel() > nivel:
+        logger.setLevel(nivel)
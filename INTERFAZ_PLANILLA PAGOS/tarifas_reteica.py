@@ -0,0 +1,123 @@
+import json
+import os
+from dataclasses import dataclass
+from decimal import Decimal, InvalidOperation
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import pandas as pd
+
+
+# ============================================================
+# Tabla de tarifas Reteica (%) -> indicador de retención
+# ------------------------------------------------------------
+# Se carga de tarifas_reteica.json (versionada). Cada tarifa se
+# identifica por su valor decimal exacto, en diezmilésimas de punto
+# porcentual (0,966% -> 9660), y no por el texto "0,966%".
+# Una tarifa con varios indicadores debe declarar su "preferido".
+# ============================================================
+
+RUTA_TARIFAS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tarifas_reteica.json")
+
+# Resolución de la clave: diezmilésimas de punto porcentual
+_ESCALA = 10000
+
+
+@dataclass(frozen=True)
+class TablaReteica:
+    version: str
+    por_defecto: str
+    # clave (tarifa * 10000) -> indicadores posibles, en el orden del archivo
+    indicadores: Dict[int, Tuple[str, ...]]
+    # clave -> indicador que se aplica
+    aplicado: Dict[int, str]
+
+    def tabla(self) -> pd.DataFrame:
+        """DataFrame de la tabla (una fila por tarifa), listo para el join."""
+        return pd.DataFrame({
+            "clave_tarifa": pd.array(list(self.aplicado), dtype="Int64"),
+            "indicador": list(self.aplicado.values()),
+            "candidatos": ["/".join(self.indicadores[k]) for k in self.aplicado],
+            "ambiguo": [len(self.indicadores[k]) > 1 for k in self.aplicado],
+        })
+
+    def asignar(self, tarifas: pd.Series) -> pd.DataFrame:
+        """
+        Indicador por fila con un único join sobre la tarifa normalizada.
+        Columnas: clave_tarifa, indicador (NaN si la tarifa no está en la tabla),
+        candidatos ("01/05/14/28") y ambiguo.
+        """
+        claves = pd.DataFrame({"clave_tarifa": clave_tarifa(tarifas)}, index=tarifas.index)
+        resultado = claves.merge(self.tabla(), on="clave_tarifa", how="left")
+        resultado.index = tarifas.index
+        resultado["ambiguo"] = resultado["ambiguo"].fillna(False).astype(bool)
+        resultado["candidatos"] = resultado["candidatos"].fillna("")
+        return resultado
+
+
+def clave_tarifa(tarifas: pd.Series) -> pd.Series:
+    """
+    "0,966%", "0.966", " 0,966 % ", 0.966 -> 9660 (Int64); <NA> si no es una tarifa.
+    Vectorizado: limpieza de texto y conversión numérica sobre toda la columna.
+    """
+    texto = (
+        tarifas.astype(str)
+        .str.strip()
+        .str.replace("%", "", regex=False)
+        .str.replace(" ", "", regex=False)
+        .str.replace(",", ".", regex=False)
+    )
+    numero = pd.to_numeric(texto, errors="coerce")
+    return (numero * _ESCALA).round().astype("Int64")
+
+
+def _clave_decimal(tarifa: str) -> int:
+    try:
+        valor = Decimal(str(tarifa).replace(",", ".")) * _ESCALA
+    except InvalidOperation:
+        raise ValueError(f"Tarifa inválida en la tabla Reteica: {tarifa!r}")
+    if valor != valor.to_integral_value():
+        raise ValueError(f"Tarifa con más de 4 decimales en la tabla Reteica: {tarifa!r}")
+    return int(valor)
+
+
+def _leer_tabla(ruta: str) -> TablaReteica:
+    with open(ruta, "r", encoding="utf-8") as f:
+        config = json.load(f)
+
+    indicadores, aplicado = {}, {}
+    for entrada in config["tarifas"]:
+        clave = _clave_decimal(entrada["tarifa"])
+        if clave in indicadores:
+            raise ValueError(f"Tarifa repetida en la tabla Reteica: {entrada['tarifa']}")
+        posibles = tuple(str(i) for i in entrada["indicadores"])
+        if not posibles:
+            raise ValueError(f"Tarifa {entrada['tarifa']} sin indicadores")
+        if len(posibles) > 1:
+            preferido = entrada.get("preferido")
+            if preferido not in posibles:
+                raise ValueError(
+                    f"Tarifa {entrada['tarifa']} tiene varios indicadores {list(posibles)}: "
+                    f"debe declarar 'preferido' (uno de ellos)"
+                )
+        else:
+            preferido = posibles[0]
+        indicadores[clave] = posibles
+        aplicado[clave] = str(preferido)
+
+    return TablaReteica(
+        version=str(config.get("version", "")),
+        por_defecto=str(config.get("por_defecto", "39")),
+        indicadores=indicadores,
+        aplicado=aplicado,
+    )
+
+
+@lru_cache(maxsize=8)
+def _tabla_cacheada(ruta: str, mtime_ns: int) -> TablaReteica:
+    return _leer_tabla(ruta)
+
+
+def cargar_tabla_reteica(ruta: str = RUTA_TARIFAS) -> TablaReteica:
+    """Tabla de tarifas; se vuelve a leer solo si el archivo cambió (mtime)."""
+    return _tabla_cacheada(ruta, os.stat(ruta).st_mtime_ns)
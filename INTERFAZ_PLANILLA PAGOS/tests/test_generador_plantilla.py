@@ -0,0 +1,83 @@
+# tests/test_generador_plantilla.py
+import io
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generador_plantilla
+import historial_pagos
+from modules import archive, output_index
+
+
+@pytest.fixture(autouse=True)
+def almacenes_temporales(tmp_path, monkeypatch):
+    # Historial, índice y archivo Parquet en una carpeta temporal
+    monkeypatch.setattr(historial_pagos, "HISTORIAL_PATH", str(tmp_path / "historial.sqlite"))
+    monkeypatch.setattr(output_index, "INDEX_PATH", str(tmp_path / "indice.sqlite"))
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path / "archivo"))
+    return tmp_path
+
+
+def _consolidado(importe_reteica, sin=()):
+    df = pd.DataFrame({
+        "Identificación": ["79123456"],
+        "Contrato": ["CPS-054-2025"],
+        "RP Doc Presupuestal": ["5000997301"],
+        "Pago No": [3],
+        "Valor Bruto": [10_000_000],
+        "Base Reteica": [10_000_000],
+        "Importe Reteica": [importe_reteica],
+        "Reteica %": ["0,966%"],
+    }).drop(columns=list(sin))
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _entregas():
+    with historial_pagos._connect() as con:
+        return con.execute("SELECT COUNT(*) FROM pagos").fetchone()[0]
+
+
+def test_plantilla_bloqueada_no_queda_en_el_historial(almacenes_temporales):
+    resultado = generador_plantilla.generar_plantilla_bytes(
+        _consolidado(50_000), "BLOQUEADA.xlsx", bloquear_con_errores=True
+    )
+    assert resultado.excel is None and resultado.resumen.errores_validacion
+    assert _entregas() == 0
+    assert output_index.search("054-2025").empty
+    assert not os.path.exists(archive.ARCHIVE_DIR)
+
+
+def test_plantilla_entregada_queda_en_el_historial():
+    resultado = generador_plantilla.generar_plantilla_bytes(
+        _consolidado(96_600), "ENTREGADA.xlsx", bloquear_con_errores=True
+    )
+    assert resultado.excel is not None
+    assert _entregas() == 1
+    assert not output_index.search("054-2025").empty
+
+
+def test_indice_sin_valores_por_defecto_y_con_ruta_completa(almacenes_temporales):
+    ruta = str(almacenes_temporales / "salidas" / "PLANTILLA.xlsx")
+    generador_plantilla.generar_plantilla_bytes(
+        _consolidado(96_600, sin=("Identificación", "RP Doc Presupuestal")), ruta
+    )
+    # Sin identificación ni RP Doc en el consolidado: "ID0001" y "5000997301" son valores por defecto
+    assert output_index.search("ID0001").empty
+    assert output_index.search("50009973", prefix=True).empty
+    encontrados = output_index.search("054-2025")
+    assert encontrados["archivo"].tolist() == [ruta]
+
+
+def test_consolidado_sin_pago_no_avisa_que_no_verifica_duplicados():
+    resultado = generador_plantilla.generar_plantilla_bytes(_consolidado(96_600, sin=("Pago No",)), "SIN_PAGO_NO.xlsx")
+    assert resultado.excel is not None
+    avisos = [e.mensaje for e in resultado.eventos if "CLAVE_PAGO_INCOMPLETA" in e.mensaje]
+    assert len(avisos) == 1 and "1 pago(s)" in avisos[0] and "Pago No en 1" in avisos[0]
+    # Sin clave no queda en el historial
+    assert _entregas() == 0
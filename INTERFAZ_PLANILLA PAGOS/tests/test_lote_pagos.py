@@ -0,0 +1,76 @@
+# tests/test_lote_pagos.py
+import io
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import historial_pagos
+from lote_pagos import procesar_lote
+from modules import archive, output_index
+
+
+@pytest.fixture(autouse=True)
+def almacenes_temporales(tmp_path, monkeypatch):
+    monkeypatch.setattr(historial_pagos, "HISTORIAL_PATH", str(tmp_path / "historial.sqlite"))
+    monkeypatch.setattr(output_index, "INDEX_PATH", str(tmp_path / "indice.sqlite"))
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path / "archivo"))
+
+
+def _consolidado(*identificaciones, importe_reteica=96_600):
+    n = len(identificaciones)
+    df = pd.DataFrame({
+        "Identificación": list(identificaciones),
+        "Contrato": ["CPS-054-2025"] * n,
+        "RP Doc Presupuestal": ["5000997301"] * n,
+        "Pago No": [3] * n,
+        "Valor Bruto": [10_000_000] * n,
+        "Base Reteica": [10_000_000] * n,
+        "Importe Reteica": [importe_reteica] * n,
+        "Reteica %": ["0,966%"] * n,
+    })
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def test_pago_repetido_entre_consolidados_del_lote():
+    lote = procesar_lote(
+        [("ENTREGA_1.xlsx", _consolidado("79123456")), ("ENTREGA_2.xlsx", _consolidado("80111222", "79123456"))],
+        workers=1,
+    )
+    primero, segundo = lote.archivos
+    assert primero.resumen.errores_validacion == 0
+    assert segundo.resumen.errores_validacion == 1
+    fila = segundo.resumen.inconsistencias.iloc[0]
+    assert "PAGO_DUPLICADO" in fila["Problemas"]
+    assert fila["Duplicado de"] == "Pago 1 de PLANTILLA_PAGOS_ENTREGA_1.xlsx"
+    # La hoja Inconsistencias del Excel entregado también lo muestra
+    hoja = pd.read_excel(io.BytesIO(segundo.excel), sheet_name="Inconsistencias")
+    assert hoja["Problemas"].str.contains("PAGO_DUPLICADO").sum() == 1
+
+
+def test_con_bloqueo_no_se_entrega_la_plantilla_con_el_repetido():
+    lote = procesar_lote(
+        [("ENTREGA_1.xlsx", _consolidado("79123456")), ("ENTREGA_2.xlsx", _consolidado("79123456"))],
+        workers=1, bloquear_con_errores=True,
+    )
+    primero, segundo = lote.archivos
+    assert primero.excel is not None and not primero.bloqueada
+    assert segundo.excel is None and segundo.bloqueada
+
+
+def test_plantilla_bloqueada_no_bloquea_a_las_que_repiten_sus_pagos():
+    # ENTREGA_1 no cuadra (retención distinta de base x tarifa) y no se entrega:
+    # su pago no cuenta como entregado para ENTREGA_2
+    lote = procesar_lote(
+        [("ENTREGA_1.xlsx", _consolidado("79123456", importe_reteica=5)), ("ENTREGA_2.xlsx", _consolidado("79123456"))],
+        workers=1, bloquear_con_errores=True,
+    )
+    primero, segundo = lote.archivos
+    assert primero.excel is None and primero.bloqueada
+    assert segundo.excel is not None and not segundo.bloqueada
+    assert segundo.resumen.errores_validacion == 0
@@ -0,0 +1,72 @@
+# tests/test_validacion_pagos.py
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import generador_plantilla
+from columnas_pagos import PERFIL_EXTRACCION, PERFIL_GENERADOR
+
+
+def _consolidado_extraccion(reteica_valor=True, neto=8_803_400):
+    # Pago con varios descuentos: ReteICA 0,966% de 10.000.000 (96.600) + retefuente y estampillas
+    df = pd.DataFrame({
+        "CONTRATO": ["123-2025"],
+        "NIT_CC": ["79123456"],
+        "VALOR BRUTO": [10_000_000],
+        "BASE RETEICA": [10_000_000],
+        "Pct_Reteica": ["0.966"],
+        "RETEICA VALOR": [96_600],
+        "TOTAL DESCUENTOS": [1_196_600],
+        "NETO A PAGAR": [neto],
+    })
+    return df if reteica_valor else df.drop(columns="RETEICA VALOR")
+
+
+def _problemas(df, perfil, monkeypatch):
+    monkeypatch.setattr(generador_plantilla, "marcar_duplicados", lambda datos, salida=None: pd.Series("", index=datos.index))
+    preparada = generador_plantilla.preparar_plantilla(df, perfil)
+    return ";".join(preparada.inconsistencias["Problemas"])
+
+
+def test_varios_descuentos_valida_solo_la_reteica(monkeypatch):
+    assert "RETENCION_DISTINTA_BASE_X_TARIFA" not in _problemas(_consolidado_extraccion(), PERFIL_EXTRACCION, monkeypatch)
+
+
+def test_reteica_distinta_de_base_x_tarifa_es_error(monkeypatch):
+    df = _consolidado_extraccion()
+    df["RETEICA VALOR"] = 50_000
+    assert "RETENCION_DISTINTA_BASE_X_TARIFA" in _problemas(df, PERFIL_EXTRACCION, monkeypatch)
+
+
+def test_sin_columna_reteica_la_regla_no_aplica(monkeypatch):
+    df = _consolidado_extraccion(reteica_valor=False)
+    assert "RETENCION_DISTINTA_BASE_X_TARIFA" not in _problemas(df, PERFIL_EXTRACCION, monkeypatch)
+
+
+def test_perfil_generador_compara_el_importe(monkeypatch):
+    df = pd.DataFrame({
+        "Identificación": ["79123456"],
+        "Valor Bruto": [10_000_000],
+        "Base Reteica": [10_000_000],
+        "Importe Reteica": [1_196_600],
+        "Reteica %": ["0,966%"],
+    })
+    assert "RETENCION_DISTINTA_BASE_X_TARIFA" in _problemas(df, PERFIL_GENERADOR, monkeypatch)
+
+
+def test_debito_cuadra_con_neto_mas_descuentos(monkeypatch):
+    assert "DEBITO_CREDITO_DESCUADRADO" not in _problemas(_consolidado_extraccion(), PERFIL_EXTRACCION, monkeypatch)
+
+
+def test_debito_distinto_de_neto_mas_descuentos_es_error(monkeypatch):
+    # Neto leído mal del certificado: 10.000.000 != 8.000.000 + 1.196.600
+    df = _consolidado_extraccion(neto=8_000_000)
+    assert "DEBITO_CREDITO_DESCUADRADO" in _problemas(df, PERFIL_EXTRACCION, monkeypatch)
+
+
+def test_sin_neto_solo_se_valida_la_estructura(monkeypatch):
+    df = _consolidado_extraccion().drop(columns="NETO A PAGAR")
+    assert "DEBITO_CREDITO_DESCUADRADO" not in _problemas(df, PERFIL_EXTRACCION, monkeypatch)
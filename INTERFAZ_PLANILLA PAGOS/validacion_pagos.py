@@ -0,0 +1,129 @@
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from tarifas_reteica import TablaReteica, clave_tarifa
+
+
+# ============================================================
+# Validación de cuadre de los bloques de pago (antes de escribir)
+# ------------------------------------------------------------
+# Sobre el arreglo (3N x 43) de filas C / P40 / P31, con operaciones
+# de arreglo para todos los pagos a la vez:
+#  - el débito P40 es mayor que cero y, si el consolidado trae el neto a pagar,
+#    es igual al neto + descuentos del certificado. P40 y P31 llevan el mismo valor
+#    bruto, así que débito = crédito P31 solo protege la estructura del arreglo
+#  - con tarifa Reteica, la base de retención es el valor bruto
+#  - el importe de retención (o el valor ReteICA, si el importe es el total
+#    de descuentos) es base x tarifa (tabla Reteica)
+#  - el pago no está en otra plantilla (historial_pagos)
+# Los valores por defecto del consolidado se agregan como advertencia.
+# ============================================================
+
+# Diferencia máxima aceptada entre importes (pesos), por redondeo
+TOLERANCIA_PESOS = 1.0
+
+ERROR = "ERROR"
+ADVERTENCIA = "ADVERTENCIA"
+
+# Reglas de cuadre (severidad ERROR); los códigos de construir_bloques son ADVERTENCIA
+ERRORES_CUADRE = (
+    "IMPORTE_EN_CERO_O_INVALIDO",
+    "DEBITO_CREDITO_DESCUADRADO",
+    "BASE_RETENCION_DISTINTA_VALOR_BRUTO",
+    "RETENCION_DISTINTA_BASE_X_TARIFA",
+    "PAGO_DUPLICADO",
+)
+
+COLUMNAS_INCONSISTENCIAS = [
+    "Pago", "Asignación", "No Identificación", "Severidad", "Problemas",
+    "Débito P40", "Crédito P31", "Neto + descuentos", "Base imponible de retención", "Reteica %",
+    "Importe de retención", "Retención esperada", "Duplicado de",
+]
+
+
+def _numero(valores: np.ndarray) -> np.ndarray:
+    """Celdas (object) -> float; NaN si no es un número."""
+    return pd.to_numeric(pd.Series(valores, dtype=object), errors="coerce").to_numpy(dtype=float)
+
+
+def validar_bloques(
+    filas: np.ndarray,
+    datos: pd.DataFrame,
+    tabla_reteica: TablaReteica,
+    tolerancia: float = TOLERANCIA_PESOS,
+) -> pd.DataFrame:
+    """
+    Una fila por pago con problemas (columnas COLUMNAS_INCONSISTENCIAS).
+    Severidad ERROR si falla alguna regla de cuadre o el pago está duplicado
+    (datos["Duplicado de"], ver historial_pagos), ADVERTENCIA si solo tiene
+    valores por defecto. Vacío si todos los bloques cuadran.
+    """
+    if not len(datos):
+        return pd.DataFrame(columns=COLUMNAS_INCONSISTENCIAS)
+
+    p40, p31 = filas[1::3], filas[2::3]
+    debito = _numero(p40[:, 7])
+    credito = _numero(p31[:, 7])
+    base = _numero(p31[:, 41])
+    importe = _numero(p31[:, 42])
+
+    # Tarifa de la tabla Reteica (en %), solo para tarifas que están en la tabla
+    clave = clave_tarifa(datos["Reteica %"].reset_index(drop=True))
+    con_tarifa = clave.isin(list(tabla_reteica.aplicado)).to_numpy(dtype=bool)
+    tarifa = clave.astype("Float64").to_numpy(dtype=float, na_value=np.nan) / 10000
+    esperado = np.where(con_tarifa, np.round(base * tarifa / 100), np.nan)
+
+    # Neto + descuentos del consolidado (construir_bloques): NaN sin neto a pagar
+    if "Neto + descuentos" in datos:
+        neto_descuentos = _numero(datos["Neto + descuentos"].to_numpy(dtype=object))
+    else:
+        neto_descuentos = np.full(len(datos), np.nan)
+    descuadre_neto = ~np.isnan(neto_descuentos) & ~(np.abs(debito - neto_descuentos) <= tolerancia)
+
+    # Monto ReteICA (construir_bloques): NaN si el consolidado solo trae el total de
+    # descuentos, y entonces la regla base x tarifa no aplica
+    reteica = _numero(datos["Reteica Valor"].to_numpy(dtype=object)) if "Reteica Valor" in datos else importe
+    valida_reteica = con_tarifa & ~np.isnan(reteica)
+
+    duplicado = datos["Duplicado de"] if "Duplicado de" in datos else pd.Series("", index=datos.index)
+
+    reglas = {
+        "IMPORTE_EN_CERO_O_INVALIDO": ~(debito > 0),
+        "DEBITO_CREDITO_DESCUADRADO": ~(np.abs(debito - credito) <= tolerancia) | descuadre_neto,
+        "BASE_RETENCION_DISTINTA_VALOR_BRUTO": con_tarifa & ~(np.abs(base - debito) <= tolerancia),
+        "RETENCION_DISTINTA_BASE_X_TARIFA": valida_reteica & ~(np.abs(reteica - esperado) <= tolerancia),
+        "PAGO_DUPLICADO": (duplicado != "").to_numpy(dtype=bool),
+    }
+
+    codigos = pd.Series("", index=datos.index)
+    for codigo, mascara in reglas.items():
+        codigos = codigos.where(~mascara, codigos + ";" + codigo)
+    errores = codigos != ""
+    codigos = (codigos + ";" + datos["Problemas"]).str.strip(";")
+
+    inconsistencias = pd.DataFrame({
+        "Pago": datos["Pago"],
+        "Asignación": datos["Asignación"],
+        "No Identificación": datos["No Identificación"],
+        "Severidad": np.where(errores, ERROR, ADVERTENCIA),
+        "Problemas": codigos,
+        "Débito P40": debito,
+        "Crédito P31": credito,
+        "Neto + descuentos": neto_descuentos,
+        "Base imponible de retención": base,
+        "Reteica %": datos["Reteica %"],
+        "Importe de retención": importe,
+        "Retención esperada": esperado,
+        "Duplicado de": duplicado,
+    })
+    return inconsistencias[codigos != ""].reset_index(drop=True)
+
+
+def contar_inconsistencias(inconsistencias: pd.DataFrame) -> Tuple[int, int]:
+    """(pagos con error, pagos solo con advertencias)."""
+    if inconsistencias is None or inconsistencias.empty:
+        return 0, 0
+    errores = int((inconsistencias["Severidad"] == ERROR).sum())
+    return errores, len(inconsistencias) - errores
@@ -8,9 +8,15 @@ import pandas as pd
 from modules.ui import inject_theme, header_brand, security_status_panel
 from modules.auth import authenticate, login_guard, upsert_user, reset_users
 from modules.security import LoginPolicy, now_ts
-from modules.pdf_parser import extract_rows_from_pdf
+import modules.pdf_parser  # registra el extractor "crp" en el motor común
+from modules.pdf_engine import ENGINE
+from modules import ocr
+from modules.doc_router import route_pdfs
 from modules.transform import build_records, fixed_fields
-from modules.reports import build_output_excel, build_audit_excel
+from modules.reports import build_output_excel, build_audit_excel_cached, read_log_cached
+from modules.archive import archive_run
+from modules.output_index import index_dataframe, search, sync_dir
+from modules.text_store import search_text
 
 # -----------------------
 # Configuración
@@ -258,12 +264,38 @@ if "Procesar" in tab_map:
                 all_records = []
                 all_issues = []
 
+                # Lote mezclado: se clasifica completo y cada grupo de otro tipo se informa con su app
+                archivos = [(f.name, f.getvalue()) for f in pdfs]
+                enrutado = route_pdfs(archivos)
+                st.caption(f"📂 Tipos detectados: {enrutado.resumen()}")
+                for aviso in enrutado.avisos("crp"):
+                    st.warning(f"⛔ {aviso}")
+
                 progress = st.progress(0.0)
                 total = len(pdfs)
 
                 for i, f in enumerate(pdfs, start=1):
                     try:
-                        rows = extract_rows_from_pdf(f.read())
+                        data = archivos[i - 1][1]
+                        # Otro tipo de documento (CDP, pagos): se rechaza sin extraer tablas
+                        clasificacion = enrutado.clasificaciones[i - 1]
+                        if not clasificacion.acepta("crp"):
+                            logger.warning(f"PDF rechazado: {f.name} tipo={clasificacion.tipo} puntajes={clasificacion.puntajes}")
+                            all_issues.append({
+                                "Fuente PDF": f.name,
+                                "Fila PDF": 0,
+                                "CDP Original": "",
+                                "No. Compromiso": "",
+                                "Importe": 0,
+                                "Problemas": f"TIPO_DOCUMENTO_{clasificacion.tipo.upper()}",
+                            })
+                            progress.progress(i / total)
+                            continue
+                        # Un PDF ya procesado (mismo contenido) no se vuelve a leer
+                        resultado = ENGINE.extract("crp", f.name, data)
+                        if resultado.error:
+                            raise RuntimeError(resultado.error)
+                        rows = resultado.datos
                         records, issues = build_records(rows, mapa_cdp, fixed, fuente_pdf=f.name)
                         all_records.extend(records)
                         all_issues.extend(issues)
@@ -326,6 +358,24 @@ if "Procesar" in tab_map:
                     out.write(output.getvalue())
                 logger.info(f"Plantilla guardada: {salida}")
 
+                try:
+                    index_dataframe(salida, "Plantilla_CRP", df_final, "crp")
+                except Exception as e:
+                    logger.error(f"No se pudo indexar la plantilla: {e}")
+
+                # Archivo histórico Parquet (no interrumpe la corrida si falla)
+                try:
+                    run_id = archive_run(
+                        "crp", df_final, df_issues,
+                        vigencia=int(fixed["Fecha Final"][-4:]),
+                        salida=salida,
+                        usuario=st.session_state.get("usuario") or "",
+                        numeric_cols=["Importe"],
+                    )
+                    logger.info(f"Corrida archivada: run_id={run_id}")
+                except Exception as e:
+                    logger.error(f"No se pudo archivar la corrida: {e}")
+
             except Exception as e:
                 st.error(f"❌ Error general: {e}")
                 logger.error(str(e))
@@ -343,37 +393,72 @@ if "Auditoría" in tab_map:
 
         st.markdown('<div class="card">', unsafe_allow_html=True)
 
-        accesos_txt = ""
-        alerts_txt = ""
-
         if os.path.exists(LOG_PATH):
-            with open(LOG_PATH, "r", encoding="utf-8", errors="replace") as f:
-                accesos_txt = f.read()
-            st.text_area("accesos.log", accesos_txt, height=280)
+            st.text_area("accesos.log", read_log_cached(LOG_PATH), height=280)
         else:
             st.info("No hay accesos.log aún.")
 
         st.write("")
 
         if os.path.exists(ALERTS_LOG):
-            with open(ALERTS_LOG, "r", encoding="utf-8", errors="replace") as f:
-                alerts_txt = f.read()
-            st.text_area("alerts.log", alerts_txt, height=200)
+            st.text_area("alerts.log", read_log_cached(ALERTS_LOG), height=200)
         else:
             st.info("No hay alerts.log aún.")
 
         st.markdown("</div>", unsafe_allow_html=True)
         st.write("")
 
-        # Descargar auditoría a Excel (solo admin y auditor)
+        # Búsqueda en plantillas históricas (índice persistente)
+        st.markdown("### 🔎 Buscar en plantillas generadas")
+        q = st.text_input(
+            "CDP, CDP Original, No. Compromiso, Identificación, Contrato o RP Doc",
+            key="audit_search",
+        )
+        por_prefijo = st.checkbox("Buscar por prefijo", value=False, key="audit_search_prefix")
+        if q.strip():
+            try:
+                sync_dir(SALIDAS_DIR, "crp")
+                resultados = search(q, prefix=por_prefijo)
+            except Exception as e:
+                st.error(f"Error consultando el índice: {e}")
+            else:
+                if resultados.empty:
+                    st.info("Sin coincidencias en las plantillas indexadas.")
+                else:
+                    resultados["archivo"] = resultados["archivo"].map(os.path.basename)
+                    st.dataframe(resultados, width="stretch")
+        st.write("")
+
+        # Búsqueda de texto completo en los PDFs procesados por las apps (almacén de textos)
+        st.markdown("### 📄 Buscar en el texto de los PDFs procesados")
+        q_texto = st.text_input("Texto o frase (ej: CPS 054-2025)", key="audit_text_search")
+        pipeline_texto = st.selectbox("Documentos", ["Todos", "crp", "cdp", "pagos"], key="audit_text_pipeline")
+        if q_texto.strip():
+            try:
+                resultados = search_text(q_texto, None if pipeline_texto == "Todos" else pipeline_texto)
+            except Exception as e:
+                st.error(f"Error consultando el almacén de textos: {e}")
+            else:
+                if resultados.empty:
+                    st.info("Ningún PDF procesado contiene ese texto.")
+                else:
+                    st.dataframe(resultados.drop(columns=["sha256"]), width="stretch")
+        st.write("")
+
+        # Descargar auditoría a Excel (solo admin y auditor).
+        # El libro se genera solo bajo demanda y queda cacheado por (size, mtime) de los logs.
         if st.session_state.get("role") in ("admin", "auditor"):
-            audit_xlsx = build_audit_excel(accesos_txt, alerts_txt)
-            st.download_button(
-                "📥 Descargar Auditoría (Excel)",
-                audit_xlsx,
-                file_name=f"Auditoria_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            )
+            if st.button("🧾 Preparar Auditoría (Excel)", key="btn_audit_prepare"):
+                st.session_state["audit_ready"] = True
+
+            if st.session_state.get("audit_ready"):
+                audit_xlsx = build_audit_excel_cached(LOG_PATH, ALERTS_LOG)
+                st.download_button(
+                    "📥 Descargar Auditoría (Excel)",
+                    audit_xlsx,
+                    file_name=f"Auditoria_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                )
         else:
             st.info("Tu rol no puede descargar auditoría.")
 
@@ -404,4 +489,16 @@ if "Admin" in tab_map:
                 logger.info(f"Admin actualizó usuario={new_user} role={new_role}")
                 st.success("✅ Usuario actualizado (contraseña hasheada).")
 
-        st.markdown("</div>", unsafe_allow_html=True)
\ No newline at end of file
+        st.markdown("</div>", unsafe_allow_html=True)
+
+        with st.expander("⚙️ Motor de extracción de PDFs"):
+            st.caption("Documentos, aciertos de caché, errores y tiempos por extractor desde que se inició la app.")
+            st.caption(
+                f"OCR de páginas escaneadas: {'habilitado' if ocr.OCR_ENABLED else 'deshabilitado (USME_OCR=1 para habilitarlo)'}"
+                f" · Tesseract {'disponible' if ocr.ocr_available() else 'no instalado'}"
+            )
+            metricas = ENGINE.metrics()
+            if metricas.empty:
+                st.info("Aún no se ha extraído ningún PDF.")
+            else:
+                st.dataframe(metricas, width="stretch")
\ No newline at end of file
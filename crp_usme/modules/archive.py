@@ -0,0 +1,161 @@
+# modules/archive.py
+# Archivo histórico en Parquet de cada corrida (CRP, CDP, pagos).
+#
+# Estructura (particionado estilo hive):
+#   data/archivo/<tabla>/pipeline=<crp|cdp|pagos>/vigencia=<AAAA>/mes=<AAAA-MM>/<run_id>.parquet
+# donde <tabla> es "registros" o "inconsistencias".
+import os
+import uuid
+from datetime import datetime
+from typing import Iterable, Optional
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+ARCHIVE_DIR = os.path.join(DATA_DIR, "archivo")
+
+TABLAS = ("registros", "inconsistencias")
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise RuntimeError("El archivo Parquet requiere pyarrow (pip install pyarrow).") from e
+    return pa, pc, pq
+
+
+def _typed_frame(df: pd.DataFrame, numeric_cols: Iterable[str]) -> pd.DataFrame:
+    """
+    Numéricos declarados y demás numéricos -> float64 (un entero pasa a float con el
+    primer NaN: el esquema queda estable entre corridas); no numéricos -> string.
+    """
+    df = df.copy()
+    numeric_cols = set(numeric_cols)
+    for c in df.columns:
+        if c in numeric_cols:
+            df[c] = pd.to_numeric(df[c], errors="coerce").astype("float64")
+        elif pd.api.types.is_bool_dtype(df[c]) or pd.api.types.is_datetime64_any_dtype(df[c]):
+            continue
+        elif pd.api.types.is_numeric_dtype(df[c]):
+            df[c] = df[c].astype("float64")
+        else:
+            df[c] = df[c].astype("string")
+    return df
+
+
+def _to_table(df: pd.DataFrame, numeric_cols: Iterable[str]):
+    pa, pc, _ = _require_pyarrow()
+    table = pa.Table.from_pandas(_typed_frame(df, numeric_cols), preserve_index=False)
+    # Strings con dictionary encoding: valores muy repetidos (fijos, CDP, PEP, indicadores)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, pc.dictionary_encode(table.column(i)))
+    return table
+
+
+def _unified_schema(pa, esquemas):
+    # Corridas con columnas distintas (o enteros de antes de float64): una sola unión
+    try:
+        return pa.unify_schemas(esquemas, promote_options="permissive")
+    except TypeError:  # pyarrow < 14
+        return pa.unify_schemas(esquemas)
+
+
+def archive_run(
+    pipeline: str,
+    registros,
+    issues=None,
+    vigencia: Optional[int] = None,
+    salida: str = "",
+    usuario: str = "",
+    numeric_cols: Iterable[str] = (),
+) -> Optional[str]:
+    """
+    Agrega los registros finales (y las inconsistencias) de una corrida al archivo Parquet.
+    `registros` / `issues` pueden ser DataFrame o lista de dicts.
+    Devuelve el run_id, o None si no había nada que archivar.
+    """
+    _, _, pq = _require_pyarrow()
+
+    ahora = datetime.now()
+    vigencia = int(vigencia or ahora.year)
+    mes = ahora.strftime("%Y-%m")
+    run_id = f"{ahora.strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+
+    escrito = False
+    for tabla, datos in zip(TABLAS, (registros, issues)):
+        df = datos if isinstance(datos, pd.DataFrame) else pd.DataFrame(datos or [])
+        if df.empty:
+            continue
+
+        df = df.copy()
+        df["run_id"] = run_id
+        df["fecha_proceso"] = pd.Timestamp(ahora)
+        df["archivo_salida"] = os.path.basename(salida or "")
+        df["usuario"] = usuario or ""
+
+        destino = os.path.join(
+            ARCHIVE_DIR, tabla,
+            f"pipeline={pipeline}", f"vigencia={vigencia}", f"mes={mes}",
+        )
+        os.makedirs(destino, exist_ok=True)
+        pq.write_table(
+            _to_table(df, numeric_cols),
+            os.path.join(destino, f"{run_id}.parquet"),
+            compression="snappy",
+        )
+        escrito = True
+
+    return run_id if escrito else None
+
+
+def read_archive(
+    tabla: str = "registros",
+    pipeline: Optional[str] = None,
+    vigencia: Optional[int] = None,
+    mes: Optional[str] = None,
+    columns: Optional[list] = None,
+) -> pd.DataFrame:
+    """
+    Lee el archivo filtrando por partición (solo abre los directorios necesarios)
+    y proyectando únicamente las columnas pedidas.
+    """
+    pa, _, _ = _require_pyarrow()
+    import pyarrow.dataset as ds
+
+    raiz = os.path.join(ARCHIVE_DIR, tabla)
+    if not os.path.isdir(raiz):
+        return pd.DataFrame(columns=columns or [])
+
+    # Cada pipeline tiene su propio esquema: se abre cada subárbol por separado
+    if pipeline is None:
+        pipelines = sorted(
+            d.split("=", 1)[1] for d in os.listdir(raiz) if d.startswith("pipeline=")
+        )
+        partes = [read_archive(tabla, p, vigencia, mes, columns) for p in pipelines]
+        partes = [p for p in partes if not p.empty]
+        return pd.concat(partes, ignore_index=True) if partes else pd.DataFrame(columns=columns or [])
+
+    raiz = os.path.join(raiz, f"pipeline={pipeline}")
+    if not os.path.isdir(raiz):
+        return pd.DataFrame(columns=columns or [])
+
+    # El esquema inferido es el de un solo archivo: se unifica con el de todas las corridas
+    dataset = ds.dataset(raiz, format="parquet", partitioning="hive")
+    esquema = _unified_schema(pa, [dataset.schema] + [f.physical_schema for f in dataset.get_fragments()])
+    dataset = ds.dataset(raiz, schema=esquema, format="parquet", partitioning="hive")
+    filtro = None
+    for campo, valor in (("vigencia", vigencia), ("mes", mes)):
+        if valor is None:
+            continue
+        cond = ds.field(campo) == valor
+        filtro = cond if filtro is None else filtro & cond
+
+    cols = [c for c in columns if c in dataset.schema.names] if columns else None
+    df = dataset.to_table(columns=cols, filter=filtro).to_pandas()
+    df["pipeline"] = pipeline
+    return df.reindex(columns=columns) if columns else df
@@ -0,0 +1,250 @@
+# modules/cdp_parser.py
+# Extracción de las solicitudes de CDP con PyMuPDF (fitz), compartida por la app CDP
+# (plantilla_automatizada_cdp_ene29v1.py) y registrada como extractor "cdp" del motor
+# común (modules/pdf_engine.py).
+import logging
+import re
+from datetime import datetime
+from typing import Tuple
+
+import fitz  # PyMuPDF
+
+import modules.ocr as ocr
+from modules.pdf_engine import ErrorExtraccion, register_extractor
+from modules.text_store import document_hash, store_document
+
+# Versión del extractor (métricas del motor y caché)
+CDP_PARSER_VERSION = "fitz-text-1"
+
+def limpiar_numero(s: str) -> int:
+    if not s or s in ["-", ""]:
+        return 0
+    s = str(s).replace("$", "").replace(" ", "").strip()
+    # eliminar separadores de miles y decimales indiferenciado (heurística)
+    s = s.replace(".", "").replace(",", "")
+    return int(s) if s.isdigit() else 0
+
+def normalizar_texto(texto: str) -> str:
+    if not texto:
+        return ""
+    texto = str(texto).strip()
+    texto = re.sub(r"\s+", " ", texto)
+    return texto
+
+def convertir_pep(numero: str) -> str:
+    numero = str(numero).zfill(5)
+    return f"PM/0005/0101/4599000{numero}"
+
+# Los campos del CDP están en las primeras páginas de la solicitud: se leen hasta
+# esta cantidad de páginas y, si falta algún campo, se lee el documento completo
+PAGINAS_LECTURA_RAPIDA = 3
+CAMPOS_CDP = ("valor", "objeto", "proyecto", "solicitud", "fecha")
+
+def _texto_pagina(page, ordenado: bool = False) -> str:
+    # ordenado=True: bloques de texto en orden de lectura por posición (arriba-abajo,
+    # izquierda-derecha) para la relectura; get_text(sort=True) es mucho más lento
+    try:
+        if ordenado:
+            bloques = sorted((b for b in page.get_text("blocks") if b[6] == 0), key=lambda b: (round(b[1]), b[0]))
+            return "\n".join(b[4].rstrip("\n") for b in bloques)
+        return page.get_text("text") or ""
+    except Exception:
+        return ""
+
+# Palabras clave de los campos (una sola búsqueda por línea, sin .upper())
+_RE_CLAVES_CDP = re.compile(r"VALOR|OBJETO|USME|SOLICITUD N[O°º]|CDP DE FECHA", re.IGNORECASE)
+_RE_VALOR = re.compile(r"([\d\.,]+)")
+_RE_PROYECTO = re.compile(r"\b(\d{4})\b")
+_RE_SOLICITUD = re.compile(r"(\d+)")
+_RE_FECHA_CDP = re.compile(r"(\d{4})/(\d{2})/(\d{2})")
+
+class EscanerCDP:
+    """
+    Máquina de estados de una sola pasada sobre las líneas del CDP (mismas reglas
+    del script original; gana la última coincidencia):
+    - VALOR: el número está en la línea siguiente.
+    - OBJETO: las líneas siguientes hasta la próxima línea con VALOR.
+    - USME (proyecto de 4 dígitos), SOLICITUD No. y CDP DE FECHA: en la misma línea.
+    Las líneas se agregan por página (`agregar`); cada línea se revisa una vez.
+    """
+
+    def __init__(self):
+        self.valor = 0
+        self.objeto = ""
+        self.numero_proyecto = None
+        self.numero_oficio = "No encontrado"
+        self.fecha_oficio = datetime.today().strftime("%d/%m/%Y")
+        self.encontrados = set()
+        # La línea anterior tenía VALOR: esta trae el número
+        self._valor_siguiente = False
+        # Líneas del OBJETO abierto (None: no hay OBJETO sin cerrar)
+        self._objeto_abierto = None
+
+    def agregar(self, lineas) -> None:
+        for line in lineas:
+            if self._valor_siguiente:
+                self._valor_siguiente = False
+                valor_match = _RE_VALOR.search(line)
+                if valor_match:
+                    self.valor = limpiar_numero(valor_match.group(1))
+                    self.encontrados.add("valor")
+
+            claves = {c.upper() for c in _RE_CLAVES_CDP.findall(line)} if line else ()
+            if "VALOR" in claves:
+                self._valor_siguiente = True
+                if self._objeto_abierto is not None:
+                    self._cerrar_objeto()
+            elif self._objeto_abierto is not None:
+                self._objeto_abierto.append(line)
+            if not claves:
+                continue
+
+            if "OBJETO" in claves:
+                # Un OBJETO posterior reemplaza al anterior (abierto o cerrado)
+                self._objeto_abierto = []
+                self.encontrados.add("objeto")
+
+            if "USME" in claves:
+                match = _RE_PROYECTO.search(line)
+                if match:
+                    self.numero_proyecto = match.group(1)
+                    self.encontrados.add("proyecto")
+
+            if claves & {"SOLICITUD NO", "SOLICITUD N°", "SOLICITUD Nº"}:
+                num_match = _RE_SOLICITUD.search(line)
+                if num_match:
+                    self.numero_oficio = num_match.group(1)
+                    self.encontrados.add("solicitud")
+
+            if "CDP DE FECHA" in claves:
+                fecha_match = _RE_FECHA_CDP.search(line)
+                if fecha_match:
+                    self.fecha_oficio = f"{fecha_match.group(3)}/{fecha_match.group(2)}/{fecha_match.group(1)}"
+                    self.encontrados.add("fecha")
+
+    def _cerrar_objeto(self) -> None:
+        self.objeto = normalizar_texto(" ".join(self._objeto_abierto))
+        self._objeto_abierto = None
+
+    @property
+    def confianza(self) -> float:
+        """Fracción de CAMPOS_CDP encontrados (0 a 1)."""
+        return round(len(self.encontrados & set(CAMPOS_CDP)) / len(CAMPOS_CDP), 2)
+
+    @property
+    def completo(self) -> bool:
+        """Todos los CAMPOS_CDP encontrados y ninguno espera líneas que aún no se han leído."""
+        return (
+            self.encontrados.issuperset(CAMPOS_CDP)
+            and not self._valor_siguiente
+            and self._objeto_abierto is None
+        )
+
+    def campos(self) -> dict:
+        """Campos al final del documento (un OBJETO sin VALOR posterior llega hasta el final)."""
+        objeto = self.objeto
+        if self._objeto_abierto is not None:
+            objeto = normalizar_texto(" ".join(self._objeto_abierto))
+        return {
+            "valor": self.valor,
+            "objeto": objeto,
+            "proyecto": self.numero_proyecto,
+            "solicitud": self.numero_oficio,
+            "fecha": self.fecha_oficio,
+        }
+
+def _extraer_cdp(pdf_bytes: bytes, filename: str) -> Tuple[dict, float, str]:
+    """
+    (registro, confianza, estado para el log) de un PDF en bytes, con PyMuPDF (fitz).
+    Lee página a página y se detiene en cuanto tiene todos los campos (hasta
+    PAGINAS_LECTURA_RAPIDA páginas); si falta alguno, recorre el documento completo
+    y, si aún falta, lo relee con el texto ordenado por posición (y con OCR las
+    páginas escaneadas, si está habilitado).
+    """
+    try:
+        # fitz.open puede abrir desde stream de bytes
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    except Exception as e:
+        raise ErrorExtraccion(f"Error abriendo PDF: {e}", "apertura")
+
+    try:
+        total_paginas = doc.page_count
+        escaner = EscanerCDP()
+        textos = []
+        while len(textos) < min(total_paginas, PAGINAS_LECTURA_RAPIDA) and not escaner.completo:
+            textos.append(_texto_pagina(doc[len(textos)]))
+            escaner.agregar(textos[-1].splitlines())
+        # Falta algún campo: se siguen leyendo las páginas restantes con el mismo escáner
+        if not escaner.completo:
+            for num in range(len(textos), total_paginas):
+                textos.append(_texto_pagina(doc[num]))
+                escaner.agregar(textos[-1].splitlines())
+        leidas = len(textos)
+        # Con campos faltantes tras la lectura completa: relectura lenta (texto ordenado
+        # por posición) y se queda la lectura con más campos
+        if escaner.confianza < 1:
+            escaner_lento = EscanerCDP()
+            textos_lentos = [_texto_pagina(doc[num], ordenado=True) for num in range(total_paginas)]
+            for texto in textos_lentos:
+                escaner_lento.agregar(texto.splitlines())
+            if escaner_lento.confianza > escaner.confianza:
+                escaner, textos = escaner_lento, textos_lentos
+        # Solicitud escaneada (páginas sin texto): OCR si está habilitado (modules/ocr.py)
+        if escaner.confianza < 1 and ocr.ocr_active() and ocr.pages_without_text(textos):
+            textos_ocr, _ = ocr.fill_missing_text(pdf_bytes, textos, enabled=True)
+            escaner_ocr = EscanerCDP()
+            for texto in textos_ocr:
+                escaner_ocr.agregar(texto.splitlines())
+            if escaner_ocr.confianza > escaner.confianza:
+                escaner, textos = escaner_ocr, textos_ocr
+        campos = escaner.campos()
+    finally:
+        doc.close()
+
+    # Almacén de textos (búsqueda en Auditoría); solo las páginas leídas
+    try:
+        store_document(document_hash(pdf_bytes), filename, "cdp", textos, paginas_total=total_paginas, extractor="fitz-text")
+    except Exception as e:
+        logging.error(f"No se pudo guardar el texto de {filename}: {e}")
+
+    valor = campos["valor"]
+    numero_proyecto = campos["proyecto"]
+    pep_convertido = convertir_pep(numero_proyecto if numero_proyecto else "0000")
+
+    registro = {
+        "Archivo": filename,
+        "importe Original": valor,
+        "Posición Presupuestal": "10",
+        "Elemento PEP": pep_convertido,
+        "Objeto": campos["objeto"],
+        "Número Oficio": campos["solicitud"],
+        "Fecha Oficio": campos["fecha"]
+    }
+
+    estado = (
+        f"✔️ Proyecto {numero_proyecto if numero_proyecto else 'NO'} → {pep_convertido}, Valor {valor}"
+        f" ({leidas}/{total_paginas} págs., confianza {escaner.confianza:.2f})"
+    )
+    return registro, escaner.confianza, estado
+
+def extraer_cdps_from_bytes(pdf_bytes: bytes, filename: str, log_lines: list) -> list:
+    """
+    Extrae la información esperada desde un PDF en bytes (ver _extraer_cdp).
+    Devuelve una lista con un único diccionario por archivo (misma estructura que el script original)
+    y agrega el estado del archivo a `log_lines`.
+    """
+    try:
+        registro, _, estado = _extraer_cdp(pdf_bytes, filename)
+    except ErrorExtraccion as e:
+        log_lines.append({"Archivo": filename, "Estado": f"❌ {e}"})
+        return []
+    log_lines.append({"Archivo": filename, "Estado": estado})
+    return [registro]
+
+def extract_cdp(nombre: str, pdf_bytes: bytes):
+    """Extractor "cdp" del motor común: ((registro, estado para el log), confianza)."""
+    registro, confianza, estado = _extraer_cdp(pdf_bytes, nombre)
+    return (registro, estado), confianza
+
+# Sin caché: la "Fecha Oficio" por defecto es la fecha del día
+register_extractor("cdp", extract_cdp, CDP_PARSER_VERSION, cacheable=False)
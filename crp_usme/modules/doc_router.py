@@ -0,0 +1,165 @@
+# modules/doc_router.py
+# Clasificación rápida del tipo de documento por la huella de la primera página
+# (palabras clave + líneas de tabla dibujadas) para enrutar cada PDF a su extractor:
+#   crp   -> MEMO con la tabla de compromisos (app CRP, extract_rows_from_pdf)
+#   cdp   -> solicitud de CDP (app CDP, extraer_cdps_from_bytes)
+#   pagos -> certificado de pago (app de pagos, extraer_pago)
+# Un PDF de otro tipo se rechaza antes de extraer tablas o leer el documento completo;
+# un lote mezclado (route_pdfs) se informa por tipo con la app que corresponde a cada grupo.
+import io
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+TIPOS = ("crp", "cdp", "pagos")
+DESCONOCIDO = "desconocido"
+
+# Palabras clave (en mayúsculas) y su peso, buscadas en el texto de la primera página
+HUELLAS = {
+    "crp": (
+        ("MEMORANDO", 2), ("REGISTRO PRESUPUESTAL", 3), ("COMPROMISO", 2),
+        ("BENEFICIARIO", 1), ("CRP", 1),
+    ),
+    "cdp": (
+        ("CDP DE FECHA", 4), ("CERTIFICADO DE DISPONIBILIDAD", 3), ("SOLICITUD N", 2),
+        ("OBJETO", 1), ("USME", 1),
+    ),
+    "pagos": (
+        ("NETO A PAGAR", 4), ("VALOR BRUTO", 3), ("TOTAL DESCUENTOS", 2), ("RETEICA", 2),
+        ("PAGO NO", 2), ("CONTRATISTA:", 1),
+    ),
+}
+
+# Un MEMO de CRP trae la tabla en la primera página: bono por líneas/rectángulos dibujados
+LINEAS_TABLA_CRP = 20
+BONO_TABLA_CRP = 2
+
+# Puntaje mínimo para decidir; por debajo (o empate) el tipo es DESCONOCIDO
+PUNTAJE_MINIMO = 3
+
+NOMBRES_APP = {
+    "crp": "la app CRP (MEMO de compromisos)",
+    "cdp": "la app CDP (solicitudes de CDP)",
+    "pagos": "la app de pagos (certificados de pago)",
+}
+
+
+@dataclass
+class Clasificacion:
+    tipo: str
+    puntajes: Dict[str, int] = field(default_factory=dict)
+    lineas_tabla: int = 0
+    segundos: float = 0.0
+    error: str = ""
+
+    def acepta(self, esperado: str) -> bool:
+        """El extractor `esperado` procesa el PDF: es de su tipo o no se pudo clasificar."""
+        return self.tipo in (esperado, DESCONOCIDO)
+
+    def motivo(self, esperado: str) -> str:
+        return (
+            f"Parece {self.tipo.upper()}, no {esperado.upper()} "
+            f"(puntajes {self.puntajes}); procésalo en {NOMBRES_APP[self.tipo]}"
+        )
+
+
+def _fitz():
+    # PyMuPDF es opcional (lo usa la app CDP): ~1 ms por página frente a pdfplumber
+    try:
+        import fitz
+    except ImportError:
+        return None
+    return fitz
+
+
+def _first_page(pdf_bytes: bytes) -> Tuple[str, int]:
+    """(texto, líneas de tabla dibujadas) de la primera página."""
+    fitz = _fitz()
+    if fitz is not None:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            if not doc.page_count:
+                return "", 0
+            page = doc[0]
+            return page.get_text("text") or "", len(page.get_drawings())
+
+    import pdfplumber
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        if not pdf.pages:
+            return "", 0
+        page = pdf.pages[0]
+        return page.extract_text() or "", len(page.lines) + len(page.rects)
+
+
+def score_text(texto: str, lineas_tabla: int = 0) -> Dict[str, int]:
+    upper = (texto or "").upper()
+    puntajes = {
+        tipo: sum(peso for clave, peso in claves if clave in upper)
+        for tipo, claves in HUELLAS.items()
+    }
+    if lineas_tabla >= LINEAS_TABLA_CRP:
+        puntajes["crp"] += BONO_TABLA_CRP
+    return puntajes
+
+
+def classify_pdf(pdf_bytes: bytes) -> Clasificacion:
+    """Tipo del PDF por su primera página; DESCONOCIDO si no hay texto, es ambiguo o no abre."""
+    inicio = time.perf_counter()
+    try:
+        texto, lineas_tabla = _first_page(pdf_bytes)
+    except Exception as e:
+        return Clasificacion(DESCONOCIDO, segundos=time.perf_counter() - inicio, error=str(e))
+
+    puntajes = score_text(texto, lineas_tabla)
+    ordenados = sorted(puntajes.values(), reverse=True)
+    mejor = max(puntajes, key=puntajes.get)
+    if ordenados[0] < PUNTAJE_MINIMO or ordenados[0] == ordenados[1]:
+        mejor = DESCONOCIDO
+    return Clasificacion(mejor, puntajes, lineas_tabla, time.perf_counter() - inicio)
+
+
+@dataclass
+class LoteEnrutado:
+    """Clasificación de un lote subido (posiblemente mezclado): un PDF por posición."""
+    nombres: List[str]
+    clasificaciones: List[Clasificacion]
+
+    def grupos(self) -> Dict[str, List[str]]:
+        """Tipo -> nombres de los PDFs de ese tipo (crp, cdp, pagos, desconocido)."""
+        grupos: Dict[str, List[str]] = {t: [] for t in (*TIPOS, DESCONOCIDO)}
+        for nombre, clasificacion in zip(self.nombres, self.clasificaciones):
+            grupos[clasificacion.tipo].append(nombre)
+        return grupos
+
+    def resumen(self) -> str:
+        """Ej.: "3 CRP • 2 CDP • 1 PAGOS • 0 sin clasificar"."""
+        grupos = self.grupos()
+        partes = [f"{len(grupos[t])} {t.upper()}" for t in TIPOS]
+        return " • ".join(partes + [f"{len(grupos[DESCONOCIDO])} sin clasificar"])
+
+    def avisos(self, esperado: str) -> List[str]:
+        """Un aviso por cada tipo distinto de `esperado`: cuántos PDFs y en qué app procesarlos."""
+        avisos = []
+        for tipo, nombres in self.grupos().items():
+            if tipo in (esperado, DESCONOCIDO) or not nombres:
+                continue
+            muestra = ", ".join(nombres[:5]) + (" ..." if len(nombres) > 5 else "")
+            avisos.append(f"{len(nombres)} PDF(s) {tipo.upper()} ({muestra}): procésalos en {NOMBRES_APP[tipo]}")
+        return avisos
+
+
+def route_pdfs(archivos: Iterable[Tuple[str, bytes]]) -> LoteEnrutado:
+    """Clasifica un lote de (nombre, bytes) de una vez para separarlo por tipo antes de extraer."""
+    nombres, clasificaciones = [], []
+    for nombre, data in archivos:
+        nombres.append(nombre)
+        clasificaciones.append(classify_pdf(data))
+    return LoteEnrutado(nombres, clasificaciones)
+
+
+def check_pdf(pdf_bytes: bytes, esperado: str) -> Tuple[bool, Optional[Clasificacion]]:
+    """(se procesa, clasificación). Si el clasificador falla, el PDF sigue al extractor."""
+    try:
+        clasificacion = classify_pdf(pdf_bytes)
+    except Exception:
+        return True, None
+    return clasificacion.acepta(esperado), clasificacion
@@ -0,0 +1,228 @@
+# modules/ocr.py
+# OCR opcional de las páginas escaneadas (sin capa de texto) de MEMOs, solicitudes de CDP
+# y certificados de pago, con Tesseract local (pytesseract).
+#  - Opt-in: variable de entorno USME_OCR=1, o set_ocr_enabled(True) (opción --ocr de los scripts).
+#  - Solo las páginas sin texto pasan por OCR; el resto usa el texto del PDF.
+#  - Páginas en paralelo: cada página es un proceso de Tesseract (hilos del pool de OCR).
+#  - Caché (SQLite) por SHA-256 de la imagen de la página: un lote que se vuelve a
+#    procesar no se vuelve a reconocer.
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+CACHE_PATH = os.path.join(DATA_DIR, "ocr_paginas.sqlite")
+
+OCR_ENABLED = os.environ.get("USME_OCR", "") == "1"
+OCR_LANG = os.environ.get("USME_OCR_LANG", "spa")
+OCR_DPI = 300
+# Menos caracteres que esto: la página no tiene capa de texto
+MIN_TEXT_CHARS = 10
+
+_LOCK = threading.Lock()
+logger = logging.getLogger("crp_usme")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ocr_paginas (
+    imagen_sha256 TEXT NOT NULL,
+    idioma        TEXT NOT NULL,
+    texto         TEXT NOT NULL,
+    guardado      TEXT NOT NULL,
+    PRIMARY KEY (imagen_sha256, idioma)
+);
+"""
+
+
+def set_ocr_enabled(enabled: bool = True) -> None:
+    """Activa el OCR en este proceso y en los procesos del pool que se creen después."""
+    global OCR_ENABLED
+    OCR_ENABLED = enabled
+    os.environ["USME_OCR"] = "1" if enabled else "0"
+    # Los resultados en caché del motor se obtuvieron con el otro modo
+    from modules.pdf_engine import ENGINE
+    ENGINE.clear_cache()
+    if enabled and not ocr_available():
+        logger.warning("OCR habilitado pero pytesseract/Tesseract no están instalados: las páginas escaneadas quedan sin texto")
+
+
+@lru_cache(maxsize=1)
+def _pytesseract():
+    # pytesseract (y el ejecutable tesseract) son opcionales: sin ellos no hay OCR
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception:
+        return None
+    return pytesseract
+
+
+def ocr_available() -> bool:
+    return _pytesseract() is not None
+
+
+def ocr_active() -> bool:
+    """OCR habilitado y Tesseract disponible."""
+    return OCR_ENABLED and ocr_available()
+
+
+def _connect(path: Optional[str] = None) -> sqlite3.Connection:
+    path = path or CACHE_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(_SCHEMA)
+    return con
+
+
+def _cached(hashes: Sequence[str], idioma: str) -> Dict[str, str]:
+    if not hashes:
+        return {}
+    with _LOCK:
+        con = _connect()
+        try:
+            marcas = ",".join("?" * len(hashes))
+            rows = con.execute(
+                f"SELECT imagen_sha256, texto FROM ocr_paginas WHERE idioma = ? AND imagen_sha256 IN ({marcas})",
+                (idioma, *hashes),
+            ).fetchall()
+        finally:
+            con.close()
+    return dict(rows)
+
+
+def _store(textos: Dict[str, str], idioma: str) -> None:
+    if not textos:
+        return
+    guardado = datetime.now().isoformat(timespec="seconds")
+    with _LOCK:
+        con = _connect()
+        try:
+            with con:
+                con.executemany(
+                    "INSERT OR REPLACE INTO ocr_paginas (imagen_sha256, idioma, texto, guardado) VALUES (?, ?, ?, ?)",
+                    [(h, idioma, t, guardado) for h, t in textos.items()],
+                )
+        finally:
+            con.close()
+
+
+def pages_without_text(textos: Sequence[Optional[str]]) -> List[int]:
+    """Índices (desde 0) de las páginas sin capa de texto."""
+    return [n for n, texto in enumerate(textos) if len((texto or "").strip()) < MIN_TEXT_CHARS]
+
+
+def _render_pages(pdf_bytes: bytes, paginas: Sequence[int], dpi: int) -> Dict[int, bytes]:
+    """Página -> imagen PNG, renderizadas en el hilo actual (PyMuPDF y pdfplumber no son thread-safe)."""
+    try:
+        import fitz
+    except ImportError:
+        fitz = None
+    imagenes = {}
+    if fitz is not None:
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+            for n in paginas:
+                imagenes[n] = doc[n].get_pixmap(dpi=dpi, colorspace=fitz.csGRAY).tobytes("png")
+        return imagenes
+
+    import pdfplumber
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for n in paginas:
+            buffer = io.BytesIO()
+            pdf.pages[n].to_image(resolution=dpi).original.convert("L").save(buffer, format="PNG")
+            imagenes[n] = buffer.getvalue()
+    return imagenes
+
+
+def _default_workers() -> int:
+    # Dentro de un proceso del pool del motor (modules/pdf_engine.py) los documentos ya
+    # van en paralelo: las páginas se reconocen una a una para no saturar los núcleos
+    if multiprocessing.parent_process() is not None:
+        return 1
+    return os.cpu_count() or 1
+
+
+def _ocr_image(png: bytes, idioma: str) -> str:
+    from PIL import Image
+    pytesseract = _pytesseract()
+    # preserve_interword_spaces: las columnas de las tablas quedan separadas por varios espacios
+    return pytesseract.image_to_string(Image.open(io.BytesIO(png)), lang=idioma, config="-c preserve_interword_spaces=1")
+
+
+def ocr_pages(
+    pdf_bytes: bytes,
+    paginas: Sequence[int],
+    workers: Optional[int] = None,
+    idioma: Optional[str] = None,
+    dpi: int = OCR_DPI,
+) -> Dict[int, str]:
+    """
+    Página (índice desde 0) -> texto reconocido. Las imágenes ya reconocidas salen de
+    la caché; las demás se reconocen en paralelo (`workers`, por defecto núcleos;
+    uno dentro de un proceso del pool del motor).
+    Sin Tesseract devuelve {}.
+    """
+    if not paginas or _pytesseract() is None:
+        return {}
+    idioma = idioma or OCR_LANG
+    imagenes = _render_pages(pdf_bytes, paginas, dpi)
+    hashes = {n: hashlib.sha256(png).hexdigest() for n, png in imagenes.items()}
+    guardados = _cached(list(set(hashes.values())), idioma)
+
+    # Una imagen repetida en el documento se reconoce una sola vez
+    pendientes = {h: imagenes[n] for n, h in hashes.items() if h not in guardados}
+    if pendientes:
+        workers = workers or _default_workers()
+        # El paralelismo es por página: cada Tesseract usa un solo hilo
+        os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+        with ThreadPoolExecutor(max_workers=min(workers, len(pendientes))) as pool:
+            nuevos = dict(zip(pendientes, pool.map(lambda png: _ocr_image(png, idioma), pendientes.values())))
+        _store(nuevos, idioma)
+        guardados.update(nuevos)
+        logger.info(f"OCR: {len(nuevos)} página(s) reconocidas, {len(imagenes) - len(pendientes)} desde caché")
+    return {n: guardados[h] for n, h in hashes.items()}
+
+
+def fill_missing_text(pdf_bytes: bytes, textos: Sequence[Optional[str]], enabled: Optional[bool] = None) -> Tuple[List[str], int]:
+    """
+    (textos con las páginas sin capa de texto reemplazadas por OCR, páginas reconocidas).
+    Sin OCR habilitado (o sin Tesseract) devuelve los textos tal cual.
+    """
+    textos = [t or "" for t in textos]
+    if not (OCR_ENABLED if enabled is None else enabled):
+        return textos, 0
+    vacias = pages_without_text(textos)
+    if not vacias:
+        return textos, 0
+    if _pytesseract() is None:
+        logger.warning(f"OCR habilitado pero Tesseract no está disponible: {len(vacias)} página(s) sin texto")
+        return textos, 0
+    reconocidos = ocr_pages(pdf_bytes, vacias)
+    for n, texto in reconocidos.items():
+        textos[n] = texto
+    return textos, len(reconocidos)
+
+
+_RE_COLUMNAS = re.compile(r"\s{2,}|\t|\|")
+
+
+def rows_from_text(texto: str) -> List[List[str]]:
+    """
+    Filas de tabla a partir del texto OCR: una fila por línea, columnas separadas por
+    dos o más espacios (o | y tabuladores). Las líneas de una sola columna se descartan.
+    """
+    filas = []
+    for linea in (texto or "").splitlines():
+        celdas = [c.strip() for c in _RE_COLUMNAS.split(linea.strip()) if c.strip()]
+        if len(celdas) > 1:
+            filas.append(celdas)
+    return filas
@@ -0,0 +1,203 @@
+# modules/output_index.py
+# Índice persistente (SQLite) de las plantillas generadas por las apps CRP, CDP y pagos.
+# Mapea CDP, CDP Original, No. Compromiso, Identificación Beneficiario, Contrato, RP Doc
+# (y Número Oficio de la plantilla CDP) -> archivo de salida, hoja y fila,
+# para responder búsquedas sin abrir los Excel.
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+INDEX_PATH = os.path.join(DATA_DIR, "indice_salidas.sqlite")
+
+# Encabezado de columna en las plantillas -> campo lógico del índice
+INDEX_COLUMNS = {
+    "CDP": "CDP",
+    "CDP Original": "CDP Original",
+    "No. Compromiso": "No. Compromiso",
+    "Identificación Beneficiario": "Identificación Beneficiario",
+    "No Identificación": "Identificación Beneficiario",
+    "NIT o CC": "Identificación Beneficiario",
+    "Asignación": "Contrato",
+    "Contrato No": "Contrato",
+    "RP Doc Presupuestal": "RP Doc",
+    "Número Oficio": "Número Oficio",
+}
+
+_LOCK = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS valores (
+    valor    TEXT NOT NULL,
+    campo    TEXT NOT NULL,
+    archivo  TEXT NOT NULL,
+    hoja     TEXT NOT NULL,
+    fila     INTEGER NOT NULL,
+    pipeline TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS ix_valores_valor ON valores(valor);
+CREATE TABLE IF NOT EXISTS archivos (
+    archivo   TEXT PRIMARY KEY,
+    pipeline  TEXT NOT NULL DEFAULT '',
+    size      INTEGER,
+    mtime_ns  INTEGER,
+    indexado  TEXT NOT NULL
+);
+"""
+
+
+def normalize_value(v) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, float):
+        if v != v:  # NaN
+            return ""
+        if v.is_integer():
+            v = int(v)
+    s = str(v).strip().upper()
+    return "" if s in ("NAN", "NONE", "NO ENCONTRADO") else s
+
+
+def _connect(path: Optional[str] = None) -> sqlite3.Connection:
+    path = path or INDEX_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(_SCHEMA)
+    return con
+
+
+def _file_signature(path: str) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    return st.st_size, st.st_mtime_ns
+
+
+def index_entries(archivo: str, pipeline: str, entradas: Iterable[Tuple[str, str, object, int]]) -> int:
+    """
+    Registra entradas (campo, hoja, valor, fila) de un archivo de salida.
+    Reemplaza lo que hubiera indexado antes para ese mismo archivo.
+    """
+    filas = []
+    for campo, hoja, valor, fila in entradas:
+        v = normalize_value(valor)
+        if v:
+            filas.append((v, campo, archivo, hoja, int(fila), pipeline))
+
+    size, mtime_ns = _file_signature(archivo)
+    with _LOCK:
+        con = _connect()
+        try:
+            with con:
+                con.execute("DELETE FROM valores WHERE archivo = ?", (archivo,))
+                con.executemany(
+                    "INSERT INTO valores (valor, campo, archivo, hoja, fila, pipeline) VALUES (?, ?, ?, ?, ?, ?)",
+                    filas,
+                )
+                con.execute(
+                    "INSERT OR REPLACE INTO archivos (archivo, pipeline, size, mtime_ns, indexado) VALUES (?, ?, ?, ?, ?)",
+                    (archivo, pipeline, size, mtime_ns, datetime.now().isoformat(timespec="seconds")),
+                )
+        finally:
+            con.close()
+    return len(filas)
+
+
+def _dataframe_entries(hoja: str, df: pd.DataFrame):
+    for col in df.columns:
+        campo = INDEX_COLUMNS.get(str(col).strip())
+        if not campo:
+            continue
+        # fila Excel = índice posicional + 2 (encabezado en la fila 1)
+        for pos, valor in enumerate(df[col].tolist()):
+            yield campo, hoja, valor, pos + 2
+
+
+def index_dataframe(archivo: str, hoja: str, df: pd.DataFrame, pipeline: str) -> int:
+    """Indexa una hoja escrita desde un DataFrame (sin volver a abrir el Excel)."""
+    return index_entries(archivo, pipeline, _dataframe_entries(hoja, df))
+
+
+def index_workbook(path: str, pipeline: str = "") -> int:
+    """Indexa un .xlsx existente leyendo todas sus hojas en modo read_only."""
+    from openpyxl import load_workbook
+
+    def entradas():
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            for ws in wb.worksheets:
+                filas = ws.iter_rows(values_only=True)
+                encabezado = next(filas, None) or ()
+                # Posición -> campo (si un encabezado se repite, se toma la primera aparición)
+                columnas = {}
+                for i, h in enumerate(encabezado):
+                    campo = INDEX_COLUMNS.get(str(h).strip()) if h is not None else None
+                    if campo and campo not in columnas.values():
+                        columnas[i] = campo
+                if not columnas:
+                    continue
+                for n, fila in enumerate(filas, start=2):
+                    for i, campo in columnas.items():
+                        if i < len(fila):
+                            yield campo, ws.title, fila[i], n
+        finally:
+            wb.close()
+
+    return index_entries(path, pipeline, entradas())
+
+
+def sync_dir(folder: str, pipeline: str = "") -> int:
+    """Indexa los .xlsx de una carpeta que sean nuevos o hayan cambiado (size, mtime)."""
+    if not os.path.isdir(folder):
+        return 0
+    with _LOCK:
+        con = _connect()
+        try:
+            conocidos = {a: (s, m) for a, s, m in con.execute("SELECT archivo, size, mtime_ns FROM archivos")}
+        finally:
+            con.close()
+
+    nuevos = 0
+    for nombre in sorted(os.listdir(folder)):
+        if not nombre.lower().endswith(".xlsx") or nombre.startswith("~$"):
+            continue
+        path = os.path.join(folder, nombre)
+        if conocidos.get(path) == _file_signature(path):
+            continue
+        try:
+            index_workbook(path, pipeline)
+            nuevos += 1
+        except Exception:
+            continue
+    return nuevos
+
+
+def search(valor: str, prefix: bool = False, limit: int = 500) -> pd.DataFrame:
+    """Busca un valor (exacto, o por prefijo) en el índice."""
+    v = normalize_value(valor)
+    cols = ["valor", "campo", "archivo", "hoja", "fila", "pipeline"]
+    if not v:
+        return pd.DataFrame(columns=cols)
+
+    if prefix:
+        # Rango sobre el índice: equivalente a LIKE 'v%' sin escanear la tabla
+        sql = "SELECT {} FROM valores WHERE valor >= ? AND valor < ? ORDER BY archivo, fila LIMIT ?"
+        params = (v, v + "\uffff", limit)
+    else:
+        sql = "SELECT {} FROM valores WHERE valor = ? ORDER BY archivo, fila LIMIT ?"
+        params = (v, limit)
+
+    with _LOCK:
+        con = _connect()
+        try:
+            rows = con.execute(sql.format(", ".join(cols)), params).fetchall()
+        finally:
+            con.close()
+    return pd.DataFrame(rows, columns=cols)
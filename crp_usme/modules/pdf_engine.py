@@ -0,0 +1,313 @@
+# modules/pdf_engine.py
+# Motor común de extracción de PDFs para las apps CRP, CDP y pagos y el script de Extracción.
+# Cada tipo de documento registra su extractor de campos (register_extractor):
+#   crp   -> modules/pdf_parser.py (filas de la tabla del MEMO)
+#   cdp   -> modules/cdp_parser.py (campos de la solicitud de CDP)
+#   pagos -> INTERFAZ_PLANILLA PAGOS/extraccion_pagos.py (campos del certificado de pago)
+# y el motor aporta lo común a todos:
+#  - un solo pool de procesos, creado al primer lote y reutilizado entre lotes
+#  - caché de resultados (LRU en memoria) por SHA-256 del PDF + tipo + versión del extractor
+#  - tiempo máximo por documento en los lotes
+#  - métricas por extractor: documentos, aciertos de caché, errores, timeouts y segundos
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from dataclasses import dataclass, replace
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple, Union
+
+import pandas as pd
+
+from modules.text_store import document_hash
+
+# Extractor de campos: (nombre, bytes del PDF) -> (datos, confianza 0 a 1)
+FuncionExtractor = Callable[[str, bytes], Tuple[object, float]]
+# Origen de un PDF en un lote: bytes, o ruta (el proceso del pool lee el archivo)
+OrigenPDF = Union[bytes, str]
+
+TIMEOUT_DOCUMENTO = 120.0
+
+
+class ErrorExtraccion(Exception):
+    """Error de un extractor con la etapa donde falló (texto, campos, tablas, ...)."""
+
+    def __init__(self, mensaje: str, etapa: str = ""):
+        super().__init__(mensaje)
+        self.etapa = etapa
+
+
+@dataclass(frozen=True)
+class Extractor:
+    tipo: str
+    funcion: FuncionExtractor
+    version: str = "1"
+    # False para extractores cuyo resultado depende de algo más que el PDF (p. ej. la fecha del día)
+    cacheable: bool = True
+
+
+@dataclass
+class Resultado:
+    nombre: str
+    tipo: str
+    datos: object = None
+    confianza: float = 0.0
+    error: str = ""
+    # Etapa del error: la del extractor (ErrorExtraccion), "proceso" o "timeout"
+    etapa: str = ""
+    segundos: float = 0.0
+    desde_cache: bool = False
+    sha256: str = ""
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+
+@dataclass
+class _Metricas:
+    documentos: int = 0
+    aciertos_cache: int = 0
+    errores: int = 0
+    timeouts: int = 0
+    segundos: float = 0.0
+    confianza: float = 0.0
+
+
+def _hash_path(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for parte in iter(lambda: f.read(1 << 20), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+def _run(funcion: FuncionExtractor, nombre: str, origen: OrigenPDF) -> Tuple[object, float, str, str, float]:
+    """Trabajo de un proceso del pool (o del proceso actual): nunca propaga el error."""
+    inicio = time.perf_counter()
+    try:
+        if isinstance(origen, str):
+            with open(origen, "rb") as f:
+                origen = f.read()
+        datos, confianza = funcion(nombre, origen)
+        return datos, confianza, "", "", time.perf_counter() - inicio
+    except ErrorExtraccion as e:
+        return None, 0.0, str(e), e.etapa, time.perf_counter() - inicio
+    except Exception as e:
+        return None, 0.0, f"{type(e).__name__}: {e}", "", time.perf_counter() - inicio
+
+
+def _desde_cache(guardado: Resultado, nombre: str) -> Resultado:
+    # El mismo contenido puede llegar con otro nombre (PDF copiado o renombrado)
+    return replace(guardado, nombre=nombre, desde_cache=True, segundos=0.0)
+
+
+class PdfEngine:
+    def __init__(self, workers: Optional[int] = None, cache_size: int = 256, timeout: float = TIMEOUT_DOCUMENTO):
+        self.workers = workers or os.cpu_count() or 1
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self._extractores: Dict[str, Extractor] = {}
+        self._cache: "OrderedDict[Tuple[str, str, str], Resultado]" = OrderedDict()
+        self._metricas: Dict[str, _Metricas] = defaultdict(_Metricas)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_size = 0
+        self._lock = threading.Lock()
+
+    # ---------- registro ----------
+    def register(self, tipo: str, funcion: FuncionExtractor, version: str = "1", cacheable: bool = True) -> None:
+        self._extractores[tipo] = Extractor(tipo, funcion, version, cacheable)
+
+    def extractor(self, tipo: str) -> Extractor:
+        if tipo not in self._extractores:
+            raise KeyError(f"No hay extractor registrado para '{tipo}'")
+        return self._extractores[tipo]
+
+    # ---------- caché ----------
+    def _cache_get(self, extractor: Extractor, sha256: str) -> Optional[Resultado]:
+        if not extractor.cacheable:
+            return None
+        clave = (sha256, extractor.tipo, extractor.version)
+        with self._lock:
+            resultado = self._cache.get(clave)
+            if resultado is not None:
+                self._cache.move_to_end(clave)
+        return resultado
+
+    def _cache_put(self, extractor: Extractor, resultado: Resultado) -> None:
+        # Solo resultados sin error: un PDF que falló se vuelve a intentar
+        if not extractor.cacheable or resultado.error or not resultado.sha256:
+            return
+        with self._lock:
+            self._cache[(resultado.sha256, extractor.tipo, extractor.version)] = resultado
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear_cache(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    # ---------- métricas ----------
+    def _registrar(self, resultado: Resultado, timeout: bool = False) -> None:
+        with self._lock:
+            m = self._metricas[resultado.tipo]
+            m.documentos += 1
+            m.aciertos_cache += resultado.desde_cache
+            m.errores += bool(resultado.error)
+            m.timeouts += timeout
+            m.segundos += resultado.segundos
+            m.confianza += resultado.confianza
+
+    def metrics(self) -> pd.DataFrame:
+        """Una fila por extractor: documentos, aciertos de caché, errores, timeouts, tiempo y confianza media."""
+        with self._lock:
+            filas = [{
+                "Tipo": tipo,
+                "Documentos": m.documentos,
+                "Aciertos caché": m.aciertos_cache,
+                "Errores": m.errores,
+                "Timeouts": m.timeouts,
+                "Segundos": round(m.segundos, 2),
+                "Docs/s": round(m.documentos / m.segundos, 1) if m.segundos else 0.0,
+                "Confianza media": round(m.confianza / m.documentos, 2) if m.documentos else 0.0,
+            } for tipo, m in sorted(self._metricas.items())]
+        return pd.DataFrame(filas)
+
+    # ---------- extracción ----------
+    def _resultado(self, extractor: Extractor, nombre: str, sha256: str, salida) -> Resultado:
+        datos, confianza, error, etapa, segundos = salida
+        return Resultado(nombre, extractor.tipo, datos, confianza, error, etapa, segundos, False, sha256)
+
+    def extract(self, tipo: str, nombre: str, pdf_bytes: bytes) -> Resultado:
+        """Extrae un PDF en el proceso actual (con caché)."""
+        extractor = self.extractor(tipo)
+        sha256 = document_hash(pdf_bytes)
+        guardado = self._cache_get(extractor, sha256)
+        if guardado is not None:
+            resultado = _desde_cache(guardado, nombre)
+        else:
+            resultado = self._resultado(extractor, nombre, sha256, _run(extractor.funcion, nombre, pdf_bytes))
+            self._cache_put(extractor, resultado)
+        self._registrar(resultado)
+        return resultado
+
+    def _get_pool(self, workers: int) -> ProcessPoolExecutor:
+        # Se reutiliza el pool si tiene al menos `workers` procesos; si no, se reemplaza
+        with self._lock:
+            anterior = None
+            if self._pool is not None and self._pool_size < workers:
+                anterior, self._pool = self._pool, None
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=workers)
+                self._pool_size = workers
+            pool = self._pool
+        if anterior is not None:
+            anterior.shutdown(wait=False)
+        return pool
+
+    def _discard_pool(self) -> None:
+        # Un proceso colgado (timeout) no se puede interrumpir: el pool se descarta y el
+        # siguiente lote crea uno nuevo
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def extract_many(
+        self,
+        tipo: str,
+        archivos: Iterable[Tuple[str, OrigenPDF]],
+        workers: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Iterator[Resultado]:
+        """
+        Extrae un lote de (nombre, bytes o ruta) en el pool compartido, en orden de
+        terminación. Los PDFs en caché no pasan por el pool. `workers` <= 1 extrae en
+        el proceso actual (sin pool ni timeout); si no, hay a lo sumo `workers`
+        (por defecto `self.workers`) PDFs en proceso a la vez. Un PDF que lleva más de
+        `timeout` segundos en ejecución (sin contar la espera en cola) se entrega como
+        error con etapa "timeout"; el pool con el proceso colgado se reemplaza y los
+        PDFs que seguían en él se reenvían al nuevo.
+        """
+        extractor = self.extractor(tipo)
+        timeout = timeout or self.timeout
+        workers = workers or self.workers
+        pendientes = []
+        for nombre, origen in archivos:
+            sha256 = _hash_path(origen) if isinstance(origen, str) else document_hash(origen)
+            guardado = self._cache_get(extractor, sha256)
+            if guardado is not None:
+                resultado = _desde_cache(guardado, nombre)
+                self._registrar(resultado)
+                yield resultado
+            else:
+                pendientes.append((nombre, origen, sha256))
+
+        if workers <= 1 or len(pendientes) <= 1:
+            for nombre, origen, sha256 in pendientes:
+                resultado = self._resultado(extractor, nombre, sha256, _run(extractor.funcion, nombre, origen))
+                self._cache_put(extractor, resultado)
+                self._registrar(resultado)
+                yield resultado
+            return
+
+        pool = self._get_pool(workers)
+        cola = list(reversed(pendientes))
+        # futuro -> [nombre, sha256, inicio de la ejecución (None mientras espera en cola), origen]
+        futuros: Dict[object, list] = {}
+        while cola or futuros:
+            # Solo `workers` PDFs enviados a la vez: el tiempo en cola no cuenta para el timeout
+            while cola and len(futuros) < workers:
+                nombre, origen, sha256 = cola.pop()
+                futuros[pool.submit(_run, extractor.funcion, nombre, origen)] = [nombre, sha256, None, origen]
+            listos, _ = wait(list(futuros), timeout=min(1.0, timeout / 4), return_when=FIRST_COMPLETED)
+            for futuro in listos:
+                nombre, sha256, _inicio, _origen = futuros.pop(futuro)
+                try:
+                    resultado = self._resultado(extractor, nombre, sha256, futuro.result())
+                except Exception as e:
+                    # Falla del proceso (no del PDF): se aísla en su archivo
+                    resultado = Resultado(nombre, tipo, error=f"{type(e).__name__}: {e}", etapa="proceso", sha256=sha256)
+                self._cache_put(extractor, resultado)
+                self._registrar(resultado)
+                yield resultado
+            ahora = time.monotonic()
+            hubo_timeout = False
+            for futuro, estado in list(futuros.items()):
+                if not futuro.running():
+                    continue
+                if estado[2] is None:
+                    # Primera vez que se ve en ejecución: desde aquí corre su tiempo
+                    estado[2] = ahora
+                elif ahora - estado[2] > timeout:
+                    futuros.pop(futuro)
+                    hubo_timeout = True
+                    nombre, sha256, inicio, _origen = estado
+                    resultado = Resultado(
+                        nombre, tipo, error=f"Timeout: más de {timeout:g} s", etapa="timeout",
+                        segundos=ahora - inicio, sha256=sha256,
+                    )
+                    self._registrar(resultado, timeout=True)
+                    yield resultado
+            if hubo_timeout:
+                # El proceso colgado conserva su lugar en el pool y los PDFs enviados detrás
+                # de él (marcados "en ejecución" desde la cola de llamadas) darían timeout sin
+                # correr: se reemplaza el pool y se reenvían los que no han terminado
+                self._discard_pool()
+                pool = self._get_pool(workers)
+                for futuro, (nombre, sha256, _inicio, origen) in list(futuros.items()):
+                    if not futuro.done():
+                        futuros.pop(futuro)
+                        cola.append((nombre, origen, sha256))
+
+    def shutdown(self) -> None:
+        self._discard_pool()
+
+
+# Motor compartido por todas las apps del proceso (el mismo pool, caché y métricas)
+ENGINE = PdfEngine()
+
+
+def register_extractor(tipo: str, funcion: FuncionExtractor, version: str = "1", cacheable: bool = True) -> None:
+    ENGINE.register(tipo, funcion, version, cacheable)
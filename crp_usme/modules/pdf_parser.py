@@ -1,7 +1,29 @@
 # modules/pdf_parser.py
 import io
+import logging
 import pdfplumber
 
+import modules.ocr as ocr
+from modules.pdf_engine import register_extractor
+from modules.text_store import document_hash, load_tables, store_document
+from modules.transform import is_probable_cdp, limpiar_numero
+
+# Versión del parser guardada con las tablas: si cambia la extracción, las tablas
+# guardadas con otra versión no se reutilizan
+PARSER_VERSION = "pdfplumber-tables-2"
+
+# Por debajo de esta confianza el PDF se vuelve a leer con SLOW_TABLE_SETTINGS
+MIN_CONFIDENCE = 0.8
+# Lectura lenta: columnas y filas por alineación del texto (tablas sin líneas dibujadas
+# o con bordes incompletos), con tolerancias más amplias
+SLOW_TABLE_SETTINGS = {
+    "vertical_strategy": "text",
+    "horizontal_strategy": "text",
+    "snap_tolerance": 4,
+    "join_tolerance": 4,
+    "intersection_tolerance": 5,
+}
+
 def extract_rows_from_pdf(pdf_bytes: bytes):
     rows = []
     with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
@@ -11,4 +33,110 @@ def extract_rows_from_pdf(pdf_bytes: bytes):
                 for row in table:
                     if row and isinstance(row, list):
                         rows.append(row)
-    return rows
\ No newline at end of file
+    return rows
+
+def extract_document(pdf_bytes: bytes, table_settings=None):
+    """(filas, texto por página, filas por página): mismas filas que extract_rows_from_pdf."""
+    rows, textos, por_pagina = [], [], []
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            pagina = []
+            for table in page.extract_tables(table_settings) or []:
+                for row in table:
+                    if row and isinstance(row, list):
+                        # La estrategia por texto deja filas vacías entre renglones
+                        if table_settings and not any(c and str(c).strip() for c in row):
+                            continue
+                        pagina.append(row)
+            rows.extend(pagina)
+            por_pagina.append(pagina)
+            # El texto reutiliza los caracteres ya leídos para las tablas
+            textos.append(page.extract_text() or "")
+    return rows, textos, por_pagina
+
+def apply_ocr(pdf_bytes: bytes, textos, por_pagina):
+    """
+    Páginas escaneadas (sin capa de texto): texto por OCR (modules/ocr.py) y filas
+    de tabla a partir de ese texto. (filas, texto por página, filas por página, páginas reconocidas).
+    """
+    reconocidos = ocr.ocr_pages(pdf_bytes, ocr.pages_without_text(textos))
+    for n, texto in reconocidos.items():
+        textos[n] = texto
+        por_pagina[n] = ocr.rows_from_text(texto)
+    rows = [row for pagina in por_pagina for row in pagina]
+    return rows, textos, por_pagina, len(reconocidos)
+
+def rows_confidence(rows) -> float:
+    """
+    0 a 1 según la forma de las filas de la tabla de compromisos (>= 10 columnas):
+    0.8 por la fracción de filas con CDP (col. 8) e importe (col. 10) válidos y
+    0.2 si la fila TOTAL (cuando existe) cuadra con la suma de los importes.
+    Sin filas de datos, 0. Las filas sin ningún dígito (encabezados) no cuentan.
+    """
+    datos, total = [], None
+    for row in rows:
+        if not row or len(row) < 10 or not any(c and any(ch.isdigit() for ch in str(c)) for c in row):
+            continue
+        if any(c and "TOTAL" in str(c).upper() for c in row[:9]):
+            total = limpiar_numero(row[9])
+            continue
+        datos.append(row)
+    if not datos:
+        return 0.0
+    validas = [r for r in datos if is_probable_cdp((r[7] or "").strip()) and limpiar_numero(r[9]) > 0]
+    cuadra = total is None or total == sum(limpiar_numero(r[9]) for r in validas)
+    return round(0.8 * len(validas) / len(datos) + 0.2 * cuadra, 2)
+
+def extract_rows_stored(pdf_bytes: bytes, nombre: str, logger=None):
+    """
+    Filas del PDF desde el almacén de textos si ya se procesó (mismo SHA-256 y versión
+    del parser); si no, las extrae (con OCR de las páginas escaneadas si está habilitado
+    y relectura lenta si la confianza es baja) y guarda texto y tablas por página.
+    Un fallo del almacén no interrumpe la extracción.
+    """
+    sha256 = document_hash(pdf_bytes)
+    # Las tablas leídas con OCR no se reutilizan sin OCR (ni al revés)
+    version = PARSER_VERSION + ("+ocr" if ocr.ocr_active() else "")
+    try:
+        guardadas = load_tables(sha256, extractor=version)
+    except Exception as e:
+        guardadas = None
+        if logger:
+            logger.error(f"No se pudo leer el almacén de textos: {e}")
+    if guardadas is not None:
+        return guardadas
+
+    rows, textos, por_pagina = extract_document(pdf_bytes)
+    escaneadas = set()
+    if ocr.ocr_active() and ocr.pages_without_text(textos):
+        escaneadas = set(ocr.pages_without_text(textos))
+        rows, textos, por_pagina, reconocidas = apply_ocr(pdf_bytes, textos, por_pagina)
+        if logger:
+            logger.info(f"OCR: {nombre} {reconocidas} página(s) escaneadas")
+    # Dos niveles: solo los PDFs con confianza baja pagan la lectura lenta
+    confianza = rows_confidence(rows)
+    if confianza < MIN_CONFIDENCE:
+        # La relectura solo cambia las tablas: se conservan el texto y las páginas del OCR
+        por_pagina_lenta = [
+            por_pagina[n] if n in escaneadas else pagina
+            for n, pagina in enumerate(extract_document(pdf_bytes, SLOW_TABLE_SETTINGS)[2])
+        ]
+        rows_lentas = [row for pagina in por_pagina_lenta for row in pagina]
+        confianza_lenta = rows_confidence(rows_lentas)
+        if logger:
+            logger.info(f"Relectura lenta: {nombre} confianza {confianza} -> {confianza_lenta}")
+        if confianza_lenta > confianza:
+            rows, por_pagina = rows_lentas, por_pagina_lenta
+    try:
+        store_document(sha256, nombre, "crp", textos, tablas=por_pagina, extractor=version)
+    except Exception as e:
+        if logger:
+            logger.error(f"No se pudo guardar el texto de {nombre}: {e}")
+    return rows
+
+def extract_crp(nombre: str, pdf_bytes: bytes):
+    """Extractor "crp" del motor común (modules/pdf_engine.py): (filas, confianza)."""
+    rows = extract_rows_stored(pdf_bytes, nombre, logging.getLogger("crp_usme"))
+    return rows, rows_confidence(rows)
+
+register_extractor("crp", extract_crp, PARSER_VERSION)
@@ -1,8 +1,21 @@
 # modules/reports.py
 import io
+import os
 import re
+import threading
 import pandas as pd
 
+_LOG_LINE_RE = re.compile(r"^(\d{4}-\d{2}-\d{2}[^-]+)\s-\s(.+)$")
+
+# Caché por ruta de log: firma (size, mtime, inodo), offset ya parseado, primeros
+# bytes leídos, filas y texto.
+_LOG_CACHE = {}
+# Bytes del comienzo del log que se comparan para detectar una rotación por copia y truncado
+_LOG_HEAD_BYTES = 256
+# Caché del libro de auditoría: firma de ambos logs -> bytes del xlsx.
+_AUDIT_CACHE = {}
+_CACHE_LOCK = threading.Lock()
+
 def build_output_excel(df_plantilla: pd.DataFrame, df_issues: pd.DataFrame) -> io.BytesIO:
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine="openpyxl") as writer:
@@ -11,27 +24,112 @@ def build_output_excel(df_plantilla: pd.DataFrame, df_issues: pd.DataFrame) -> i
     output.seek(0)
     return output
 
-def parse_log_text(text: str) -> pd.DataFrame:
-    # Formato esperado: "YYYY-MM-DD HH:MM:SS,ms - mensaje"
+def _parse_log_lines(text: str) -> list:
     rows = []
     for line in (text or "").splitlines():
         line = line.strip()
         if not line:
             continue
-        m = re.match(r"^(\d{4}-\d{2}-\d{2}[^-]+)\s-\s(.+)$", line)
+        m = _LOG_LINE_RE.match(line)
         if m:
             rows.append({"timestamp": m.group(1).strip(), "mensaje": m.group(2).strip()})
         else:
             rows.append({"timestamp": "", "mensaje": line})
-    return pd.DataFrame(rows)
+    return rows
 
-def build_audit_excel(accesos_text: str, alerts_text: str) -> io.BytesIO:
-    df_acc = parse_log_text(accesos_text)
-    df_alr = parse_log_text(alerts_text)
+def parse_log_text(text: str) -> pd.DataFrame:
+    # Formato esperado: "YYYY-MM-DD HH:MM:SS,ms - mensaje"
+    return pd.DataFrame(_parse_log_lines(text), columns=["timestamp", "mensaje"])
+
+def _log_signature(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+def _new_entry() -> dict:
+    return {"sig": None, "offset": 0, "head": b"", "rows": [], "text": ""}
+
+def _refresh_log(path: str) -> dict:
+    """
+    Actualiza la entrada de caché de un log.
+    - Si (size, mtime, inodo) no cambió, no lee nada.
+    - Si el archivo creció, solo lee y parsea la cola nueva.
+    - Si se truncó, rotó (otro inodo) o cambió su comienzo (rotación por copia
+      y truncado), vuelve a parsear completo.
+    """
+    sig = _log_signature(path)
+    if sig is None:
+        _LOG_CACHE.pop(path, None)
+        return _new_entry()
+
+    entry = _LOG_CACHE.get(path)
+    if entry and entry["sig"] == sig:
+        return entry
 
+    with open(path, "rb") as f:
+        if (
+            not entry
+            or sig[0] < entry["offset"]
+            or sig[2] != entry["sig"][2]
+            or f.read(len(entry["head"])) != entry["head"]
+        ):
+            entry = _new_entry()
+        f.seek(entry["offset"])
+        data = f.read()
+
+    # Solo se consumen líneas completas; una línea a medio escribir queda para la próxima lectura
+    cut = data.rfind(b"\n") + 1
+    tail = data[:cut].decode("utf-8", errors="replace")
+
+    entry = {
+        "sig": sig,
+        "offset": entry["offset"] + cut,
+        "head": (entry["head"] + data[:cut])[:_LOG_HEAD_BYTES],
+        "rows": entry["rows"] + _parse_log_lines(tail),
+        "text": entry["text"] + tail,
+    }
+    _LOG_CACHE[path] = entry
+    return entry
+
+def read_log_cached(path: str) -> str:
+    """Texto del log, leyendo del disco solo lo agregado desde la última llamada."""
+    with _CACHE_LOCK:
+        return _refresh_log(path)["text"]
+
+def _audit_workbook(df_acc: pd.DataFrame, df_alr: pd.DataFrame) -> io.BytesIO:
     output = io.BytesIO()
     with pd.ExcelWriter(output, engine="openpyxl") as writer:
         df_acc.to_excel(writer, index=False, sheet_name="Accesos")
         df_alr.to_excel(writer, index=False, sheet_name="Alertas")
     output.seek(0)
-    return output
\ No newline at end of file
+    return output
+
+def build_audit_excel(accesos_text: str, alerts_text: str) -> io.BytesIO:
+    df_acc = parse_log_text(accesos_text)
+    df_alr = parse_log_text(alerts_text)
+    return _audit_workbook(df_acc, df_alr)
+
+def build_audit_excel_cached(accesos_path: str, alerts_path: str) -> bytes:
+    """
+    Libro de auditoría cacheado por la firma (size, mtime, inodo) de ambos logs.
+    Si los logs no cambiaron devuelve los mismos bytes sin reconstruir nada.
+    """
+    with _CACHE_LOCK:
+        acc = _refresh_log(accesos_path)
+        alr = _refresh_log(alerts_path)
+        key = (accesos_path, acc["sig"], alerts_path, alr["sig"])
+        if _AUDIT_CACHE.get("key") == key:
+            return _AUDIT_CACHE["data"]
+        acc_rows, alr_rows = list(acc["rows"]), list(alr["rows"])
+
+    data = _audit_workbook(
+        pd.DataFrame(acc_rows, columns=["timestamp", "mensaje"]),
+        pd.DataFrame(alr_rows, columns=["timestamp", "mensaje"]),
+    ).getvalue()
+
+    with _CACHE_LOCK:
+        _AUDIT_CACHE["key"] = key
+        _AUDIT_CACHE["data"] = data
+    return data
@@ -0,0 +1,198 @@
+# modules/text_store.py
+# Almacén persistente (SQLite) del texto por página y de las tablas extraídas de cada
+# PDF procesado por las apps CRP, CDP y pagos, por SHA-256 del documento.
+#  - Las reglas de extracción se pueden volver a aplicar sobre el texto/tablas guardados
+#    sin abrir los PDFs (iter_documents, load_tables).
+#  - Índice de texto completo (FTS5) para buscar desde la pestaña Auditoría
+#    ("¿qué memo menciona el contrato CPS 054-2025?").
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import pandas as pd
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "data")
+STORE_PATH = os.path.join(DATA_DIR, "textos_pdf.sqlite")
+
+_LOCK = threading.Lock()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documentos (
+    sha256         TEXT PRIMARY KEY,
+    nombre         TEXT NOT NULL,
+    pipeline       TEXT NOT NULL DEFAULT '',
+    paginas_leidas INTEGER NOT NULL,
+    paginas_total  INTEGER,
+    extractor      TEXT NOT NULL DEFAULT '',
+    guardado       TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tablas (
+    sha256 TEXT NOT NULL,
+    pagina INTEGER NOT NULL,
+    filas  TEXT NOT NULL,
+    PRIMARY KEY (sha256, pagina)
+);
+"""
+
+# Texto por página con índice de texto completo; sin FTS5 (SQLite compilado sin él)
+# se usa una tabla normal y la búsqueda pasa a LIKE
+_SCHEMA_FTS = "CREATE VIRTUAL TABLE IF NOT EXISTS paginas USING fts5(sha256 UNINDEXED, pagina UNINDEXED, texto)"
+_SCHEMA_PLANO = """
+CREATE TABLE IF NOT EXISTS paginas (sha256 TEXT NOT NULL, pagina INTEGER NOT NULL, texto TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS ix_paginas_sha ON paginas(sha256);
+"""
+
+
+def document_hash(pdf_bytes: bytes) -> str:
+    return hashlib.sha256(pdf_bytes).hexdigest()
+
+
+def _connect(path: Optional[str] = None) -> sqlite3.Connection:
+    path = path or STORE_PATH
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    con = sqlite3.connect(path, timeout=30)
+    con.execute("PRAGMA journal_mode=WAL")
+    con.executescript(_SCHEMA)
+    try:
+        con.execute(_SCHEMA_FTS)
+    except sqlite3.OperationalError:
+        con.executescript(_SCHEMA_PLANO)
+    return con
+
+
+def _has_fts(con: sqlite3.Connection) -> bool:
+    sql = con.execute("SELECT sql FROM sqlite_master WHERE name = 'paginas'").fetchone()
+    return bool(sql and "fts5" in sql[0].lower())
+
+
+def store_document(
+    sha256: str,
+    nombre: str,
+    pipeline: str,
+    paginas: Sequence[str],
+    tablas: Optional[Sequence[list]] = None,
+    paginas_total: Optional[int] = None,
+    extractor: str = "",
+) -> None:
+    """
+    Guarda el texto de cada página (y las tablas de cada página, si las hay).
+    Reemplaza lo guardado antes para el mismo documento. `paginas_total` distingue
+    los documentos leídos solo en parte (lectura temprana de la app CDP).
+    """
+    with _LOCK:
+        con = _connect()
+        try:
+            with con:
+                con.execute("DELETE FROM paginas WHERE sha256 = ?", (sha256,))
+                con.execute("DELETE FROM tablas WHERE sha256 = ?", (sha256,))
+                con.executemany(
+                    "INSERT INTO paginas (sha256, pagina, texto) VALUES (?, ?, ?)",
+                    [(sha256, n, texto or "") for n, texto in enumerate(paginas, start=1)],
+                )
+                if tablas is not None:
+                    con.executemany(
+                        "INSERT INTO tablas (sha256, pagina, filas) VALUES (?, ?, ?)",
+                        [(sha256, n, json.dumps(t, ensure_ascii=False)) for n, t in enumerate(tablas, start=1)],
+                    )
+                con.execute(
+                    "INSERT OR REPLACE INTO documentos "
+                    "(sha256, nombre, pipeline, paginas_leidas, paginas_total, extractor, guardado) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        sha256, nombre, pipeline, len(paginas),
+                        paginas_total if paginas_total is not None else len(paginas),
+                        extractor, datetime.now().isoformat(timespec="seconds"),
+                    ),
+                )
+        finally:
+            con.close()
+
+
+def load_pages(sha256: str) -> Optional[List[str]]:
+    """Texto de cada página guardada, en orden; None si el documento no está."""
+    with _LOCK:
+        con = _connect()
+        try:
+            if not con.execute("SELECT 1 FROM documentos WHERE sha256 = ?", (sha256,)).fetchone():
+                return None
+            rows = con.execute(
+                "SELECT texto FROM paginas WHERE sha256 = ? ORDER BY CAST(pagina AS INTEGER)", (sha256,)
+            ).fetchall()
+        finally:
+            con.close()
+    return [r[0] for r in rows]
+
+
+def load_tables(sha256: str, extractor: str = "") -> Optional[list]:
+    """
+    Filas de todas las tablas del documento (mismo formato que extract_rows_from_pdf);
+    None si no está guardado o se guardó con otro `extractor` (otra versión del parser).
+    """
+    with _LOCK:
+        con = _connect()
+        try:
+            doc = con.execute("SELECT extractor FROM documentos WHERE sha256 = ?", (sha256,)).fetchone()
+            if not doc or doc[0] != extractor:
+                return None
+            rows = con.execute("SELECT filas FROM tablas WHERE sha256 = ? ORDER BY pagina", (sha256,)).fetchall()
+        finally:
+            con.close()
+    filas = []
+    for (pagina,) in rows:
+        filas.extend(json.loads(pagina))
+    return filas
+
+
+def iter_documents(pipeline: Optional[str] = None) -> Iterator[Tuple[str, str, List[str]]]:
+    """(sha256, nombre, páginas) de cada documento guardado, para re-aplicar reglas de extracción."""
+    with _LOCK:
+        con = _connect()
+        try:
+            sql = "SELECT sha256, nombre FROM documentos"
+            docs = con.execute(sql + " WHERE pipeline = ?" if pipeline else sql, (pipeline,) if pipeline else ()).fetchall()
+        finally:
+            con.close()
+    for sha256, nombre in docs:
+        paginas = load_pages(sha256)
+        if paginas is not None:
+            yield sha256, nombre, paginas
+
+
+def _fts_query(texto: str) -> str:
+    # Frase exacta: el texto del usuario no se interpreta como sintaxis FTS5 (AND, -, *, ...)
+    return '"' + texto.replace('"', '""') + '"'
+
+
+def search_text(texto: str, pipeline: Optional[str] = None, limit: int = 200) -> pd.DataFrame:
+    """Páginas que contienen el texto (frase), con un fragmento alrededor de la coincidencia."""
+    cols = ["nombre", "pipeline", "pagina", "fragmento", "guardado", "sha256"]
+    texto = (texto or "").strip()
+    if not texto:
+        return pd.DataFrame(columns=cols)
+
+    filtro = " AND d.pipeline = ?" if pipeline else ""
+    with _LOCK:
+        con = _connect()
+        try:
+            if _has_fts(con):
+                sql = (
+                    "SELECT d.nombre, d.pipeline, paginas.pagina, snippet(paginas, 2, '[', ']', '…', 12), d.guardado, d.sha256 "
+                    "FROM paginas JOIN documentos d ON d.sha256 = paginas.sha256 "
+                    f"WHERE paginas MATCH ?{filtro} ORDER BY rank LIMIT ?"
+                )
+                params = (_fts_query(texto), *((pipeline,) if pipeline else ()), limit)
+            else:
+                sql = (
+                    "SELECT d.nombre, d.pipeline, paginas.pagina, substr(paginas.texto, 1, 120), d.guardado, d.sha256 "
+                    "FROM paginas JOIN documentos d ON d.sha256 = paginas.sha256 "
+                    f"WHERE paginas.texto LIKE ?{filtro} ORDER BY d.guardado DESC LIMIT ?"
+                )
+                params = (f"%{texto}%", *((pipeline,) if pipeline else ()), limit)
+            rows = con.execute(sql, params).fetchall()
+        finally:
+            con.close()
+    return pd.DataFrame(rows, columns=cols)
@@ -0,0 +1,35 @@
+# tests/test_archive.py
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import archive
+
+
+@pytest.fixture(autouse=True)
+def archivo_temporal(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive, "ARCHIVE_DIR", str(tmp_path / "archivo"))
+
+
+def test_corridas_con_tipos_distintos():
+    # Entero en la primera corrida, float con NaN en la segunda (sin declararlo numérico)
+    archive.archive_run("pagos", pd.DataFrame({"x": [1, 2]}))
+    archive.archive_run("pagos", pd.DataFrame({"x": [1.5, np.nan]}))
+    df = archive.read_archive("registros", "pagos")
+    assert sorted(df["x"].dropna().tolist()) == [1.0, 1.5, 2.0]
+    assert df["x"].isna().sum() == 1
+
+
+def test_columnas_que_solo_existen_en_corridas_posteriores():
+    archive.archive_run("pagos", pd.DataFrame({"Pago": [1], "Contrato": ["054-2025"]}))
+    archive.archive_run("pagos", pd.DataFrame({"Pago": [1], "Contrato": ["055-2025"], "Fila PDF": [7]}))
+    df = archive.read_archive("registros", "pagos")
+    df = df.assign(Contrato=df["Contrato"].astype(str)).sort_values("Contrato")
+    assert df["Contrato"].tolist() == ["054-2025", "055-2025"]
+    assert df["Fila PDF"].isna().tolist() == [True, False]
+    assert archive.read_archive("registros", columns=["Contrato", "Fila PDF"]).shape == (2, 2)
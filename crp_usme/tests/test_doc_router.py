@@ -0,0 +1,33 @@
+# tests/test_doc_router.py
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.doc_router import DESCONOCIDO, route_pdfs
+
+# PyMuPDF es opcional en el proyecto; aquí solo se usa para armar los PDFs de prueba
+fitz = pytest.importorskip("fitz")
+
+
+def _pdf(texto):
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), texto)
+        return doc.tobytes()
+
+
+def test_lote_mezclado_se_informa_por_tipo():
+    pago = _pdf("CERTIFICADO DE PAGO\nVALOR BRUTO $ 1.000\nTOTAL DESCUENTOS\nNETO A PAGAR")
+    cdp = _pdf("SOLICITUD No 12\nCERTIFICADO DE DISPONIBILIDAD\nCDP DE FECHA 2026-01-10")
+    enrutado = route_pdfs([("pago_1.pdf", pago), ("cdp_1.pdf", cdp), ("pago_2.pdf", pago), ("vacio.pdf", _pdf(""))])
+
+    # Una clasificación por PDF, en el orden de entrada
+    assert [c.tipo for c in enrutado.clasificaciones] == ["pagos", "cdp", "pagos", DESCONOCIDO]
+    assert enrutado.grupos()["pagos"] == ["pago_1.pdf", "pago_2.pdf"]
+    assert enrutado.resumen() == "0 CRP • 1 CDP • 2 PAGOS • 1 sin clasificar"
+
+    avisos = enrutado.avisos("pagos")
+    assert len(avisos) == 1 and "cdp_1.pdf" in avisos[0] and "app CDP" in avisos[0]
+    assert len(enrutado.avisos("cdp")) == 1 and "app de pagos" in enrutado.avisos("cdp")[0]
@@ -0,0 +1,69 @@
+# tests/test_pdf_engine.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.pdf_engine import PdfEngine
+
+
+def _lento(nombre, data):
+    # (pid, inicio, fin): para medir cuántos documentos corren a la vez
+    inicio = time.time()
+    time.sleep(3.0 if nombre.startswith("cuelga") else 0.4)
+    return (os.getpid(), inicio, time.time()), 1.0
+
+
+def _max_simultaneos(intervalos):
+    eventos = sorted([(i, 1) for i, _ in intervalos] + [(f, -1) for _, f in intervalos])
+    actual = maximo = 0
+    for _, delta in eventos:
+        actual += delta
+        maximo = max(maximo, actual)
+    return maximo
+
+
+def test_mas_documentos_que_workers_sin_falsos_timeouts():
+    engine = PdfEngine(workers=2, timeout=1.0)
+    engine.register("x", _lento, cacheable=False)
+    archivos = [(f"doc_{i}.pdf", str(i).encode()) for i in range(12)]
+    resultados = list(engine.extract_many("x", archivos, workers=2))
+    engine.shutdown()
+
+    assert len(resultados) == 12
+    assert [r.error for r in resultados if r.error] == []
+    assert engine.metrics()["Timeouts"].sum() == 0
+
+
+def test_workers_limita_los_documentos_simultaneos():
+    engine = PdfEngine(workers=4, timeout=10.0)
+    engine.register("x", _lento, cacheable=False)
+    archivos = [(f"doc_{i}.pdf", str(i).encode()) for i in range(6)]
+    resultados = list(engine.extract_many("x", archivos, workers=2))
+    engine.shutdown()
+
+    assert all(r.ok for r in resultados)
+    assert _max_simultaneos([(r.datos[1], r.datos[2]) for r in resultados]) <= 2
+
+
+def test_documento_colgado_da_timeout():
+    engine = PdfEngine(workers=2, timeout=1.0)
+    engine.register("x", _lento, cacheable=False)
+    resultados = {r.nombre: r for r in engine.extract_many("x", [("a", b"1"), ("cuelga", b"2"), ("b", b"3")])}
+    engine.shutdown()
+
+    assert resultados["a"].ok and resultados["b"].ok
+    assert resultados["cuelga"].etapa == "timeout"
+
+
+def test_los_documentos_tras_un_colgado_no_dan_timeout():
+    # Los dos procesos quedan colgados: los siguientes PDFs se envían a un pool nuevo
+    engine = PdfEngine(workers=2, timeout=1.0)
+    engine.register("x", _lento, cacheable=False)
+    archivos = [("cuelga_1", b"1"), ("cuelga_2", b"2")] + [(f"doc_{i}.pdf", str(i).encode()) for i in range(4)]
+    resultados = {r.nombre: r for r in engine.extract_many("x", archivos)}
+    engine.shutdown()
+
+    assert {n for n, r in resultados.items() if r.etapa == "timeout"} == {"cuelga_1", "cuelga_2"}
+    assert all(resultados[f"doc_{i}.pdf"].ok for i in range(4))
@@ -0,0 +1,38 @@
+# tests/test_pdf_parser.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import modules.pdf_parser as pdf_parser
+
+FILA_RAPIDA = ["mal", "leida"]
+FILA_LENTA = ["1", "x", "x", "x", "x", "x", "x", "CDP 123", "x", "1.000"]
+FILA_OCR = ["2", "x", "x", "x", "x", "x", "x", "CDP 456", "x", "2.000"]
+
+
+def _documento(table_settings=None):
+    # Página 0 con texto (tabla mal leída en la lectura rápida); página 1 escaneada
+    fila = FILA_LENTA if table_settings else FILA_RAPIDA
+    return [fila], ["texto de la página con capa de texto", ""], [[fila], []]
+
+
+def test_relectura_lenta_conserva_el_texto_y_las_filas_del_ocr(monkeypatch):
+    guardado = {}
+
+    def _guardar(sha256, nombre, tipo, textos, tablas, extractor):
+        guardado.update(textos=textos, tablas=tablas)
+
+    monkeypatch.setattr(pdf_parser, "load_tables", lambda sha256, extractor: None)
+    monkeypatch.setattr(pdf_parser, "store_document", _guardar)
+    monkeypatch.setattr(pdf_parser, "extract_document", lambda pdf_bytes, table_settings=None: _documento(table_settings))
+    monkeypatch.setattr(pdf_parser.ocr, "ocr_active", lambda: True)
+    monkeypatch.setattr(pdf_parser.ocr, "ocr_pages", lambda pdf_bytes, paginas: {1: "texto reconocido por OCR"})
+    monkeypatch.setattr(pdf_parser.ocr, "rows_from_text", lambda texto: [FILA_OCR])
+    monkeypatch.setattr(pdf_parser, "rows_confidence", lambda rows: 0.9 if FILA_LENTA in rows else 0.1)
+
+    rows = pdf_parser.extract_rows_stored(b"%PDF", "escaneado.pdf")
+
+    assert rows == [FILA_LENTA, FILA_OCR]
+    assert guardado["textos"] == ["texto de la página con capa de texto", "texto reconocido por OCR"]
+    assert guardado["tablas"] == [[FILA_LENTA], [FILA_OCR]]
@@ -0,0 +1,44 @@
+# tests/test_reports.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.reports import read_log_cached
+
+
+def _escribir(path, lineas, modo="w"):
+    with open(path, modo, encoding="utf-8") as f:
+        f.writelines(f"2026-01-0{n} 08:00:00,000 - {texto}\n" for n, texto in lineas)
+
+
+def test_lee_solo_lo_agregado(tmp_path):
+    log = str(tmp_path / "accesos.log")
+    _escribir(log, [(1, "login ana")])
+    assert "login ana" in read_log_cached(log)
+    _escribir(log, [(2, "login luis")], modo="a")
+    texto = read_log_cached(log)
+    assert texto.count("login ana") == 1 and "login luis" in texto
+
+
+def test_rotacion_con_archivo_nuevo_mas_grande(tmp_path):
+    log = str(tmp_path / "accesos.log")
+    _escribir(log, [(1, "antes")])
+    read_log_cached(log)
+    # Rotación por renombrado: otro archivo (otro inodo) ya más grande que el anterior
+    nuevo = str(tmp_path / "accesos.log.nuevo")
+    _escribir(nuevo, [(2, "despues de rotar"), (3, "segunda linea del log nuevo")])
+    os.replace(log, str(tmp_path / "accesos.log.1"))
+    os.replace(nuevo, log)
+    texto = read_log_cached(log)
+    assert "antes" not in texto and texto.startswith("2026-01-02")
+
+
+def test_rotacion_por_copia_y_truncado(tmp_path):
+    log = str(tmp_path / "accesos.log")
+    _escribir(log, [(1, "antes")])
+    read_log_cached(log)
+    # Mismo archivo (mismo inodo) truncado y vuelto a escribir más allá del offset anterior
+    _escribir(log, [(2, "despues de truncar"), (3, "segunda linea del log nuevo")])
+    texto = read_log_cached(log)
+    assert "antes" not in texto and texto.startswith("2026-01-02")
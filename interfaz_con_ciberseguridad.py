@@ -1,6 +1,6 @@
 ﻿import streamlit as st
 import os
-import pdfplumber
+import sys
 import pandas as pd
 import re
 from datetime import datetime
@@ -9,6 +9,13 @@ from time import sleep
 import shutil
 import io
 
+# Módulos compartidos del proyecto (crp_usme/modules): motor común de extracción
+CRP_USME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crp_usme")
+if CRP_USME_DIR not in sys.path:
+    sys.path.insert(0, CRP_USME_DIR)
+import modules.pdf_parser  # registra el extractor "crp" en el motor común
+from modules.pdf_engine import ENGINE
+
 # -----------------------
 # Configuración general
 # -----------------------
@@ -413,23 +420,24 @@ with col_main:
                         for i, archivo in enumerate(pdfs, start=1):
                             try:
                                 archivo_bytes = archivo.read()
-                                with pdfplumber.open(io.BytesIO(archivo_bytes)) as pdf:
-                                    for page in pdf.pages:
-                                        for tabla in page.extract_tables() or []:
-                                            for fila in tabla:
-                                                if fila and len(fila) >= 10:
-                                                    cdp_valor = str(fila[7]).strip()
-                                                    datos_cdp = mapa_cdp.get(cdp_valor, {"NoInterno": "NO ENCONTRADO", "Objeto": "NO ENCONTRADO"})
-                                                    datos.append({
-                                                        "Importe": limpiar_numero(fila[9]),
-                                                        "CDP": datos_cdp["NoInterno"],
-                                                        "Posición del CDP": "1",
-                                                        "Objeto": normalizar_texto(datos_cdp["Objeto"]),
-                                                        "Tipo de compromiso": tipo_compromiso(datos_cdp["Objeto"]),
-                                                        "No. Compromiso": normalizar_texto(fila[0]),
-                                                        "Identificación Beneficiario": normalizar_texto(fila[4]),
-                                                        **fijos
-                                                    })
+                                # Filas de las tablas del PDF con el motor común (extractor "crp")
+                                resultado = ENGINE.extract("crp", archivo.name, archivo_bytes)
+                                if resultado.error:
+                                    raise RuntimeError(resultado.error)
+                                for fila in resultado.datos:
+                                    if fila and len(fila) >= 10:
+                                        cdp_valor = str(fila[7]).strip()
+                                        datos_cdp = mapa_cdp.get(cdp_valor, {"NoInterno": "NO ENCONTRADO", "Objeto": "NO ENCONTRADO"})
+                                        datos.append({
+                                            "Importe": limpiar_numero(fila[9]),
+                                            "CDP": datos_cdp["NoInterno"],
+                                            "Posición del CDP": "1",
+                                            "Objeto": normalizar_texto(datos_cdp["Objeto"]),
+                                            "Tipo de compromiso": tipo_compromiso(datos_cdp["Objeto"]),
+                                            "No. Compromiso": normalizar_texto(fila[0]),
+                                            "Identificación Beneficiario": normalizar_texto(fila[4]),
+                                            **fijos
+                                        })
                                 logging.info(f"Procesado PDF: {archivo.name}")
                             except Exception as e:
                                 st.warning(f"⚠️ Error procesando {getattr(archivo, 'name', str(i))}: {e}")
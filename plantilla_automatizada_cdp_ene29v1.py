@@ -1,15 +1,24 @@
 import streamlit as st
 import os
-import fitz  # PyMuPDF
 import pandas as pd
-import re
 from datetime import datetime
 import logging
 from time import sleep
 import shutil
 import io
+import sys
 from openpyxl import load_workbook
 
+# Módulos compartidos del proyecto (crp_usme/modules)
+CRP_USME_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crp_usme")
+if CRP_USME_DIR not in sys.path:
+    sys.path.insert(0, CRP_USME_DIR)
+from modules.archive import archive_run
+from modules.doc_router import route_pdfs
+import modules.cdp_parser  # registra el extractor "cdp" en el motor común
+from modules.pdf_engine import ENGINE
+from modules.output_index import index_dataframe
+
 # -----------------------
 # Configuración general
 # -----------------------
@@ -79,106 +88,6 @@ if "ROLES" not in st.session_state:
 if "show_main" not in st.session_state:
     st.session_state["show_main"] = False
 
-# -----------------------
-# Utilidades específicas de extracción (basadas en tu script con fitz)
-# -----------------------
-def limpiar_numero(s: str) -> int:
-    if not s or s in ["-", ""]:
-        return 0
-    s = str(s).replace("$", "").replace(" ", "").strip()
-    # eliminar separadores de miles y decimales indiferenciado (heurística)
-    s = s.replace(".", "").replace(",", "")
-    return int(s) if s.isdigit() else 0
-
-def normalizar_texto(texto: str) -> str:
-    if not texto:
-        return ""
-    texto = str(texto).strip()
-    texto = re.sub(r"\s+", " ", texto)
-    return texto
-
-def convertir_pep(numero: str) -> str:
-    numero = str(numero).zfill(5)
-    return f"PM/0005/0101/4599000{numero}"
-
-def extraer_cdps_from_bytes(pdf_bytes: bytes, filename: str, log_lines: list) -> list:
-    """
-    Extrae la información esperada desde un PDF en bytes utilizando PyMuPDF (fitz).
-    Devuelve una lista con un único diccionario por archivo (misma estructura que el script original).
-    """
-    try:
-        # fitz.open puede abrir desde stream de bytes
-        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    except Exception as e:
-        log_lines.append({"Archivo": filename, "Estado": f"❌ Error abriendo PDF: {e}"})
-        return []
-
-    lineas = []
-    for page in doc:
-        try:
-            page_text = page.get_text("text") or ""
-        except Exception:
-            page_text = ""
-        lineas.extend(page_text.splitlines())
-
-    valor = 0
-    objeto = ""
-    numero_proyecto = None
-    numero_oficio = "No encontrado"
-    fecha_oficio = datetime.today().strftime("%d/%m/%Y")
-
-    for idx, line in enumerate(lineas):
-        upper = line.upper() if line else ""
-        # VALOR: número en la siguiente línea (heurística del script original)
-        if "VALOR" in upper:
-            if idx + 1 < len(lineas):
-                valor_line = lineas[idx + 1]
-                valor_match = re.search(r"([\d\.,]+)", valor_line)
-                if valor_match:
-                    valor = limpiar_numero(valor_match.group(1))
-
-        # OBJETO: concatenar hasta encontrar VALOR
-        if "OBJETO" in upper:
-            objeto_lines = []
-            for j in range(idx + 1, len(lineas)):
-                if "VALOR" in (lineas[j].upper() if lineas[j] else ""):
-                    break
-                objeto_lines.append(lineas[j])
-            objeto = normalizar_texto(" ".join(objeto_lines))
-
-        # Proyecto: buscar número de 4 dígitos en línea con USME
-        if "USME" in upper:
-            match = re.search(r"\b(\d{4})\b", line)
-            if match:
-                numero_proyecto = match.group(1)
-
-        # Solicitud No.
-        if "SOLICITUD NO" in upper or "SOLICITUD N°" in upper or "SOLICITUD Nº" in upper:
-            num_match = re.search(r"(\d+)", line)
-            if num_match:
-                numero_oficio = num_match.group(1)
-
-        # Fecha CDP (formato YYYY/MM/DD en tu script original)
-        if "CDP DE FECHA" in upper:
-            fecha_match = re.search(r"(\d{4})/(\d{2})/(\d{2})", line)
-            if fecha_match:
-                fecha_oficio = f"{fecha_match.group(3)}/{fecha_match.group(2)}/{fecha_match.group(1)}"
-
-    pep_convertido = convertir_pep(numero_proyecto if numero_proyecto else "0000")
-
-    registro = {
-        "Archivo": filename,
-        "importe Original": valor,
-        "Posición Presupuestal": "10",
-        "Elemento PEP": pep_convertido,
-        "Objeto": objeto,
-        "Número Oficio": numero_oficio,
-        "Fecha Oficio": fecha_oficio
-    }
-
-    log_lines.append({"Archivo": filename, "Estado": f"✔️ Proyecto {numero_proyecto if numero_proyecto else 'NO'} → {pep_convertido}, Valor {valor}"})
-    return [registro]
-
 # -----------------------
 # Funciones de soporte (credenciales, reportes, alertas)
 # -----------------------
@@ -436,15 +345,33 @@ with col_main:
                     registros = []
                     log_lines = []
                     total_pdfs = len(pdfs)
+
+                    # Lote mezclado: se clasifica completo y cada grupo de otro tipo se informa con su app
+                    archivos = [(uploaded.name, uploaded.getvalue()) for uploaded in pdfs]
+                    enrutado = route_pdfs(archivos)
+                    st.caption(f"📂 Tipos detectados: {enrutado.resumen()}")
+                    for aviso in enrutado.avisos("cdp"):
+                        st.warning(f"⛔ {aviso}")
                     progress = st.progress(0)
 
                     for i, uploaded in enumerate(pdfs, start=1):
                         try:
-                            uploaded.seek(0)
-                            pdf_bytes = uploaded.read()
-                            # extraer registros desde bytes
-                            regs = extraer_cdps_from_bytes(pdf_bytes, uploaded.name, log_lines)
-                            registros.extend(regs)
+                            pdf_bytes = archivos[i - 1][1]
+                            # Otro tipo de documento (MEMO CRP, pagos): se rechaza sin leerlo completo
+                            clasificacion = enrutado.clasificaciones[i - 1]
+                            if not clasificacion.acepta("cdp"):
+                                log_lines.append({"Archivo": uploaded.name, "Estado": f"⛔ {clasificacion.motivo('cdp')}"})
+                                logging.warning(f"PDF rechazado: {uploaded.name} tipo={clasificacion.tipo}")
+                                progress.progress(int(i / total_pdfs * 100))
+                                continue
+                            # extraer registros desde bytes (motor común, extractor "cdp")
+                            resultado = ENGINE.extract("cdp", uploaded.name, pdf_bytes)
+                            if resultado.error:
+                                log_lines.append({"Archivo": uploaded.name, "Estado": f"❌ {resultado.error}"})
+                            else:
+                                registro, estado = resultado.datos
+                                registros.append(registro)
+                                log_lines.append({"Archivo": uploaded.name, "Estado": estado})
                             logging.info(f"Procesado PDF: {uploaded.name}")
                         except Exception as e:
                             msg = f"Error procesando {getattr(uploaded, 'name', str(i))}: {e}"
@@ -520,6 +447,25 @@ with col_main:
                             if st.session_state.get("auto_alerts"):
                                 send_alert(f"No se pudo añadir hoja de auditoría: {e}", level="error")
 
+                        # Índice de búsqueda (la columna CDP aquí es solo el consecutivo)
+                        try:
+                            index_dataframe(salida_path, "Sheet1", df_final.drop(columns=["CDP"]), "cdp")
+                        except Exception as e:
+                            logging.error(f"No se pudo indexar la plantilla: {e}")
+
+                        # Archivo histórico Parquet (no interrumpe la corrida si falla)
+                        try:
+                            archive_run(
+                                "cdp", df_final,
+                                [l for l in log_lines if not str(l.get("Estado", "")).startswith("✔")],
+                                vigencia=int(fijos["Periodo Presupuestario"]),
+                                salida=salida_path,
+                                usuario=st.session_state.get("usuario") or "",
+                                numeric_cols=["importe Original"],
+                            )
+                        except Exception as e:
+                            logging.error(f"No se pudo archivar la corrida: {e}")
+
                         # Preparar descarga en memoria
                         towrite = io.BytesIO()
                         df_final.to_excel(towrite, index=False, engine="openpyxl")